@@ -9,8 +9,14 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 from app.core.database import Base
+from app.models.balance_shard import BalanceShard
+from app.models.idempotency import IdempotencyKey
+from app.models.ledger import BalanceSnapshot, LedgerEntry
+from app.models.outbox import OutboxEvent
 from app.models.payment import Payment
+from app.models.payment_stats import PaymentStat, PaymentStatDelta
 from app.models.user import User
+from app.models.webhook import WebhookDeadLetter, WebhookDelivery, WebhookEndpoint
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
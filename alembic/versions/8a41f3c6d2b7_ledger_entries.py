@@ -0,0 +1,95 @@
+"""Ledger entries and balance snapshots
+
+Revision ID: 8a41f3c6d2b7
+Revises: 5d2c8e1a9f40
+Create Date: 2026-10-17 07:00:00.000000+00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "8a41f3c6d2b7"
+down_revision = "5d2c8e1a9f40"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ledger_entries",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("account_id", sa.Integer(), nullable=True),
+        sa.Column("payment_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("side", sa.String(length=6), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["account_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["payment_id"],
+            ["payments.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("payment_id", "side", name="uq_ledger_entries_payment_side"),
+    )
+    op.create_index(
+        "ix_ledger_entries_account_created_id",
+        "ledger_entries",
+        ["account_id", "created_at", "id"],
+        unique=False,
+    )
+    op.create_table(
+        "balance_snapshots",
+        sa.Column("account_id", sa.Integer(), nullable=False),
+        sa.Column("taken_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("balance", sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["account_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("account_id", "taken_at"),
+    )
+
+    # Проводки по уже подтверждённым платежам
+    op.execute(
+        """
+        INSERT INTO ledger_entries (account_id, payment_id, side, amount, created_at)
+        SELECT sender_id, id, 'debit', -amount, COALESCE(paid_at, created_at)
+        FROM payments WHERE status = 'PAID'
+        UNION ALL
+        SELECT receiver_id, id, 'credit', amount, COALESCE(paid_at, created_at)
+        FROM payments WHERE status = 'PAID'
+        """
+    )
+    # Пополнения в журнал не попадали: остаток фиксируется вступительной проводкой
+    op.execute(
+        """
+        INSERT INTO ledger_entries (account_id, payment_id, side, amount)
+        SELECT users.id, NULL,
+               CASE WHEN users.balance - COALESCE(moved.total, 0) >= 0
+                    THEN 'credit' ELSE 'debit' END,
+               users.balance - COALESCE(moved.total, 0)
+        FROM users
+        LEFT JOIN (
+            SELECT account_id, SUM(amount) AS total FROM ledger_entries GROUP BY account_id
+        ) AS moved ON moved.account_id = users.id
+        WHERE users.balance - COALESCE(moved.total, 0) <> 0
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("balance_snapshots")
+    op.drop_index("ix_ledger_entries_account_created_id", table_name="ledger_entries")
+    op.drop_table("ledger_entries")
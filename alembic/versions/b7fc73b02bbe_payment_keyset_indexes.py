@@ -0,0 +1,36 @@
+"""Payment keyset indexes
+
+Revision ID: b7fc73b02bbe
+Revises: 9ee28d51383d
+Create Date: 2026-10-17 06:00:00.000000+00:00
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "b7fc73b02bbe"
+down_revision = "9ee28d51383d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_payments_sender_created_id",
+        "payments",
+        ["sender_id", "created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_payments_receiver_created_id",
+        "payments",
+        ["receiver_id", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_payments_receiver_created_id", table_name="payments")
+    op.drop_index("ix_payments_sender_created_id", table_name="payments")
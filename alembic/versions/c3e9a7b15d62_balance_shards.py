@@ -0,0 +1,42 @@
+"""Balance shards for hot accounts
+
+Revision ID: c3e9a7b15d62
+Revises: 8a41f3c6d2b7
+Create Date: 2026-10-17 07:30:00.000000+00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c3e9a7b15d62"
+down_revision = "8a41f3c6d2b7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "balance_shards",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("balance", sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "shard"),
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        UPDATE users SET balance = balance + COALESCE(
+            (SELECT SUM(balance) FROM balance_shards WHERE balance_shards.user_id = users.id), 0
+        )
+        """
+    )
+    op.drop_table("balance_shards")
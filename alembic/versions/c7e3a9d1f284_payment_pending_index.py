@@ -0,0 +1,39 @@
+"""Partial index on created_at of pending payments
+
+Revision ID: c7e3a9d1f284
+Revises: a4d8e2f6b139
+Create Date: 2026-10-17 13:00:00.000000+00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c7e3a9d1f284"
+down_revision = "a4d8e2f6b139"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в payments, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_payments_pending_created_at",
+            "payments",
+            ["created_at"],
+            unique=False,
+            postgresql_where=sa.text("status = 'CREATED'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_payments_pending_created_at",
+            table_name="payments",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,46 @@
+"""Append-only deltas for payment statistics
+
+Revision ID: d2f6b8a4c915
+Revises: c7e3a9d1f284
+Create Date: 2026-10-17 15:00:00.000000+00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "d2f6b8a4c915"
+down_revision = "c7e3a9d1f284"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "payment_stat_deltas",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("direction", sa.String(length=8), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(
+                "CREATED", "PAID", "CANCELLED", name="paymentstatus", create_type=False
+            ),
+            nullable=False,
+        ),
+        sa.Column("month", sa.String(length=7), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_payment_stat_deltas_user_id", "payment_stat_deltas", ["user_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_payment_stat_deltas_user_id", table_name="payment_stat_deltas")
+    op.drop_table("payment_stat_deltas")
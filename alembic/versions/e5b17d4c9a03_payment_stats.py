@@ -0,0 +1,48 @@
+"""Per-user payment statistics
+
+Revision ID: e5b17d4c9a03
+Revises: c3e9a7b15d62
+Create Date: 2026-10-17 10:00:00.000000+00:00
+
+Aggregates for existing payments are filled by
+``python -m app.commands.payment_stats`` after the upgrade.
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "e5b17d4c9a03"
+down_revision = "c3e9a7b15d62"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "payment_stats",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("direction", sa.String(length=8), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(
+                "CREATED", "PAID", "CANCELLED", name="paymentstatus", create_type=False
+            ),
+            nullable=False,
+        ),
+        sa.Column("month", sa.String(length=7), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "direction", "status", "month"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("payment_stats")
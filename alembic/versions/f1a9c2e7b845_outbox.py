@@ -0,0 +1,43 @@
+"""Transactional outbox for payment events
+
+Revision ID: f1a9c2e7b845
+Revises: e5b17d4c9a03
+Create Date: 2026-10-17 11:00:00.000000+00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "f1a9c2e7b845"
+down_revision = "e5b17d4c9a03"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("aggregate_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("event_type", sa.String(length=32), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("available_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_outbox_aggregate_id", "outbox", ["aggregate_id", "id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_aggregate_id", table_name="outbox")
+    op.drop_table("outbox")
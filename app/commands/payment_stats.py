@@ -0,0 +1,49 @@
+"""Пересчёт и проверка статистики платежей ``payment_stats``.
+
+Запуск::
+
+    python -m app.commands.payment_stats --chunk-size 1000
+    python -m app.commands.payment_stats --check
+"""
+
+import argparse
+import asyncio
+import sys
+
+from ..core.config import settings
+from ..core.database import async_session_maker, engine
+from ..services.payment_stats_service import PaymentStatsService
+
+
+async def run(chunk_size: int, check: bool) -> int:
+    try:
+        async with async_session_maker() as session:
+            service = PaymentStatsService(session)
+            if check:
+                mismatched = await service.check(chunk_size)
+                print(f"Пользователей с расхождениями: {len(mismatched)}")
+                if mismatched:
+                    print("ID: " + ", ".join(map(str, mismatched[:100])))
+                return 1 if mismatched else 0
+
+            stats = await service.backfill(chunk_size)
+            print(f"Пользователей: {stats['users']}, строк статистики: {stats['rows']}")
+            return 0
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=settings.payment_stats_chunk_size)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Только сравнить агрегаты с платежами; код выхода 1 при расхождениях",
+    )
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.chunk_size, args.check)))
+
+
+if __name__ == "__main__":
+    main()
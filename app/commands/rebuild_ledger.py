@@ -0,0 +1,42 @@
+"""Пересчёт снимков балансов и кеша ``users.balance`` по журналу проводок.
+
+Запуск::
+
+    python -m app.commands.rebuild_ledger --chunk-size 10000
+    python -m app.commands.rebuild_ledger --dry-run
+"""
+
+import argparse
+import asyncio
+from typing import Dict
+
+from ..core.config import settings
+from ..core.database import async_session_maker, engine
+from ..services.ledger_service import LedgerService
+
+
+async def rebuild(chunk_size: int, dry_run: bool) -> Dict[str, int]:
+    try:
+        async with async_session_maker() as session:
+            return await LedgerService(session).rebuild(chunk_size, dry_run=dry_run)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=settings.ledger_rebuild_chunk_size)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Только посчитать расхождения кеша с журналом"
+    )
+    args = parser.parse_args()
+
+    stats = asyncio.run(rebuild(args.chunk_size, args.dry_run))
+    print(
+        f"Проводок: {stats['entries']}, счетов: {stats['accounts']}, "
+        f"расхождений кеша: {stats['mismatched']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Отдельный процесс доставки webhook.
+
+Запуск::
+
+    python -m app.commands.webhook_worker
+
+Несколько процессов можно запускать параллельно: доставки захватываются
+``FOR UPDATE SKIP LOCKED``. По умолчанию API доставки не отправляет
+(``WEBHOOK_DELIVERY_ENABLED=false``), чтобы отправка не делила event loop с
+обработкой запросов, а только ставит их в очередь из диспетчера outbox
+(``WEBHOOKS_ENABLED``).
+"""
+
+import asyncio
+import logging
+import signal
+
+from ..core.database import engine
+from ..services.webhook_engine import webhook_engine
+from ..utils.logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+async def run() -> None:
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+
+    webhook_engine.start()
+    try:
+        await stopped.wait()
+    finally:
+        logger.info("Остановка доставки webhook...")
+        await webhook_engine.stop()
+        await engine.dispose()
+
+
+def main() -> None:
+    setup_logging()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,234 @@
-from typing import AsyncGenerator
+import time
+from typing import Any, AsyncGenerator, Dict, Optional
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Connection, ExecutionContext, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
 
-from .config import settings
+from .config import Settings, settings
+from .metrics import (
+    Counter,
+    Histogram,
+    db_query_duration_seconds,
+    db_transaction_duration_seconds,
+    registry,
+)
+from .profiler import current_profile
+from .replicas import ReplicaSet, register_replica_metrics, track_writes
 
-engine = create_async_engine(settings.database_url, echo=settings.debug, future=True)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class PoolMetrics:
+    """Счётчики пула соединений"""
+
+    def __init__(self) -> None:
+        self.wait_time = Histogram(POOL_WAIT_BUCKETS)
+        self.connect_errors = Counter()
+        self.timeouts = Counter()
+        self.connections_created = Counter()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул соединений, измеряющий ожидание соединения и ошибки подключения"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self) -> "InstrumentedPool":
+        pool = super().recreate()
+        pool.metrics = self.metrics  # type: ignore[attr-defined]
+        return pool  # type: ignore[return-value]
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts.inc()
+            raise
+        finally:
+            self.metrics.wait_time.observe(time.perf_counter() - started)
+
+    def _create_connection(self) -> ConnectionPoolEntry:
+        try:
+            record = super()._create_connection()
+        except Exception:
+            self.metrics.connect_errors.inc()
+            raise
+        self.metrics.connections_created.inc()
+        return record
+
+
+def engine_options(config: Settings, url: Optional[str] = None) -> Dict[str, Any]:
+    """Параметры движка и пула для URL с учётом профиля окружения"""
+    parsed = make_url(url or config.database_url)
+    options: Dict[str, Any] = {"echo": config.db_echo, "future": True}
+
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite живёт в одном соединении, пул ему не нужен
+        return options
+
+    options.update(
+        poolclass=InstrumentedPool,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_timeout=config.db_pool_timeout,
+        pool_recycle=config.db_pool_recycle,
+        pool_pre_ping=config.db_pool_pre_ping,
+    )
+    if parsed.get_driver_name() == "asyncpg":
+        connect_args: Dict[str, Any] = {
+            "prepared_statement_cache_size": config.db_statement_cache_size,
+        }
+        if config.db_command_timeout is not None:
+            connect_args["command_timeout"] = config.db_command_timeout
+        options["connect_args"] = connect_args
+    return options
+
+
+_QUERY_TIMERS = {
+    operation: db_query_duration_seconds.labels(operation)
+    for operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "OTHER")
+}
+_TRANSACTION_TIMERS = {
+    outcome: db_transaction_duration_seconds.labels(outcome) for outcome in ("commit", "rollback")
+}
+
+
+def _before_cursor_execute(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: ExecutionContext,
+    executemany: bool,
+) -> None:
+    context._query_started = time.perf_counter()  # type: ignore[attr-defined]
+
+
+def _after_cursor_execute(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: ExecutionContext,
+    executemany: bool,
+) -> None:
+    elapsed = time.perf_counter() - context._query_started  # type: ignore[attr-defined]
+    operation = statement.lstrip()[:6].upper()
+    (_QUERY_TIMERS.get(operation) or _QUERY_TIMERS["OTHER"]).observe(elapsed)
+
+    profile = current_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+
+
+def _on_begin(conn: Connection) -> None:
+    conn.info["transaction_started"] = time.perf_counter()
+
+
+def _transaction_finished(outcome: str) -> Any:
+    timer = _TRANSACTION_TIMERS[outcome]
+
+    def listener(conn: Connection) -> None:
+        started = conn.info.pop("transaction_started", None)
+        if started is not None:
+            timer.observe(time.perf_counter() - started)
+
+    return listener
+
+
+def instrument_engine(async_engine: AsyncEngine) -> None:
+    """Подключение метрик длительности SQL-выражений и транзакций к движку"""
+    sync_engine = async_engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "begin", _on_begin)
+    event.listen(sync_engine, "commit", _transaction_finished("commit"))
+    event.listen(sync_engine, "rollback", _transaction_finished("rollback"))
+
+
+def build_engine(url: Optional[str] = None, config: Settings = settings) -> AsyncEngine:
+    """Создание движка с настройками пула из конфигурации"""
+    async_engine = create_async_engine(url or config.database_url, **engine_options(config, url))
+    instrument_engine(async_engine)
+    return async_engine
+
+
+def pool_status(engine: AsyncEngine) -> Dict[str, Any]:
+    """Текущее состояние пула движка и накопленные метрики"""
+    pool = engine.pool
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if not isinstance(pool, InstrumentedPool):
+        return status
+
+    status.update(
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        checked_in=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        max_overflow=pool._max_overflow,
+        timeout=pool.timeout(),
+        connections_created=pool.metrics.connections_created.value,
+        connect_errors=pool.metrics.connect_errors.value,
+        timeouts=pool.metrics.timeouts.value,
+        wait_seconds=pool.metrics.wait_time.snapshot(),
+    )
+    return status
+
+
+def register_pool_metrics(async_engine: AsyncEngine) -> None:
+    """Выгрузка состояния пула движка в реестр метрик"""
+
+    def sample(key: str) -> Any:
+        def collect() -> Any:
+            status = pool_status(async_engine)
+            return [((), status[key])] if key in status else []
+
+        return collect
+
+    for name, kind, key, documentation in (
+        ("db_pool_size", "gauge", "size", "Размер пула соединений"),
+        ("db_pool_checked_out", "gauge", "checked_out", "Соединения, выданные из пула"),
+        ("db_pool_overflow", "gauge", "overflow", "Соединения сверх размера пула"),
+        ("db_pool_connect_errors_total", "counter", "connect_errors", "Ошибки подключения к БД"),
+        ("db_pool_timeouts_total", "counter", "timeouts", "Таймауты ожидания соединения"),
+    ):
+        registry.collector(name, documentation, kind, (), sample(key))
+
+    def wait_time() -> Any:
+        pool = async_engine.pool
+        return [((), pool.metrics.wait_time)] if isinstance(pool, InstrumentedPool) else []
+
+    registry.collector(
+        "db_pool_wait_seconds", "Время ожидания соединения из пула", "histogram", (), wait_time
+    )
+
+
+engine = build_engine()
+register_pool_metrics(engine)
 
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Движки реплик только для чтения; без DATABASE_REPLICA_URLS все чтения идут на основную базу
+read_engines = [build_engine(url) for url in settings.database_replica_urls]
+replicas = ReplicaSet(
+    read_engines, settings.replica_max_lag_seconds, settings.replica_sticky_seconds
+)
+track_writes(replicas)
+register_replica_metrics(replicas)
+
 
 class Base(DeclarativeBase):
     """Базовый класс для всех моделей"""
@@ -1,22 +1,26 @@
-from typing import Annotated, Optional
+import hmac
+from typing import Annotated, AsyncGenerator, Awaitable, Callable, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.user import User
-from .database import get_async_session
-from .security import verify_token
+from .config import settings
+from .database import get_async_session, replicas
+from .principal import Principal, principal_cache
+from .replicas import current_writer
+from .security import verify_token_cached
 
 security = HTTPBearer()
+service_security = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
+async def get_current_principal(
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
     db: Annotated[AsyncSession, Depends(get_async_session)],
-) -> User:
-    """Получение текущего пользователя из JWT токена"""
+) -> Principal:
+    """Получение снимка текущего пользователя из JWT токена"""
 
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -24,7 +28,7 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    payload = verify_token(credentials.credentials)
+    payload = verify_token_cached(credentials.credentials)
     if payload is None:
         raise credentials_exception
 
@@ -37,10 +41,76 @@ async def get_current_user(
     except ValueError:
         raise credentials_exception
 
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    principal = await principal_cache.get(db, user_id)
 
-    if user is None:
+    if principal is None:
         raise credentials_exception
 
-    return user
+    current_writer.set(principal.id)
+    return principal
+
+
+async def get_read_session(
+    principal: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_async_session)],
+) -> AsyncGenerator[AsyncSession, None]:
+    """Сессия для чтения: реплика, если она догнала записи пользователя, иначе основная база"""
+    replica = replicas.choose(principal.id)
+    if replica is None:
+        yield db
+        return
+
+    async with replica.session_maker() as session:
+        yield session
+
+
+async def get_current_user(
+    principal: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_async_session)],
+) -> User:
+    """Получение полной строки текущего пользователя"""
+    return await _load_user(principal, db)
+
+
+async def get_current_user_for_read(
+    principal: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_read_session)],
+) -> User:
+    """Строка текущего пользователя из сессии для чтения"""
+    return await _load_user(principal, db)
+
+
+async def _load_user(principal: Principal, db: AsyncSession) -> User:
+    try:
+        return await principal.load_user(db)
+    except ValueError:
+        await principal_cache.invalidate([principal.id])
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def require_service_token(setting: str) -> Callable[..., Awaitable[None]]:
+    """Проверка Bearer-токена служебных эндпоинтов из настройки ``setting``.
+
+    Токен читается при каждом запросе; если он не задан, доступ не ограничен.
+    """
+
+    async def check(
+        credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(service_security)],
+    ) -> None:
+        expected: Optional[str] = getattr(settings, setting)
+        if expected is None:
+            return
+        if credentials is None or not hmac.compare_digest(
+            credentials.credentials.encode(), expected.encode()
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Неверный служебный токен",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+    return check
@@ -0,0 +1,103 @@
+"""Условные GET-запросы к платежам.
+
+Ответ на платеж получает сильный ETag по ``id``, ``status`` и ``updated_at``,
+страница списка — слабый ETag по последнему ``updated_at`` её строк. Платежи в
+конечном статусе больше не меняются, поэтому готовые байты их ответов
+хранятся в памяти процесса и отдаются без обращения к БД.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Any, Optional, Sequence
+from uuid import UUID
+
+from ..models.payment import PaymentStatus
+from ..utils.cache import TTLCache
+from .config import settings
+from .metrics import registry
+
+TERMINAL_STATUSES = frozenset({PaymentStatus.PAID, PaymentStatus.CANCELLED})
+
+# Ответы пользовательские, поэтому кешировать их могут только клиенты
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+
+def payment_etag(payment_id: UUID, status: PaymentStatus, updated_at: Optional[datetime]) -> str:
+    """Сильный ETag версии платежа"""
+    return f'"{_digest(payment_id.hex, status.value, updated_at and updated_at.isoformat())}"'
+
+
+def page_etag(rows: Sequence[Any]) -> str:
+    """Слабый ETag страницы по последнему изменению её строк и их статусам.
+
+    Статусы учитываются, потому что ``updated_at`` в SQLite хранится с
+    точностью до секунды и может не отличить изменения внутри одной секунды.
+    """
+    if not rows:
+        return 'W/"empty"'
+    changed = max(row.updated_at or row.created_at for row in rows)
+    return f'W/"{_digest(changed.isoformat(), *(row.id.hex + row.status.value for row in rows))}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадение If-None-Match с ETag по слабому сравнению (RFC 9110, 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(",")
+    )
+
+
+class CachedPayment:
+    """Готовый ответ на платеж в конечном статусе и его участники"""
+
+    __slots__ = ("etag", "body", "sender_id", "receiver_id")
+
+    def __init__(self, etag: str, body: bytes, sender_id: int, receiver_id: Optional[int]) -> None:
+        self.etag = etag
+        self.body = body
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+
+    def visible_to(self, user_id: int) -> bool:
+        return user_id in (self.sender_id, self.receiver_id)
+
+
+def _cached_size(value: Any) -> int:
+    if isinstance(value, CachedPayment):
+        return len(value.body) + len(value.etag) + 128
+    return 64
+
+
+payment_response_cache: TTLCache[UUID, CachedPayment] = TTLCache(
+    max_entries=settings.payment_response_cache_max_entries,
+    max_bytes=settings.payment_response_cache_max_bytes,
+    sizeof=_cached_size,
+)
+
+
+def register_response_cache_metrics(cache: TTLCache[UUID, CachedPayment]) -> None:
+    """Выгрузка счётчиков кеша ответов в реестр метрик"""
+
+    def sample(key: str) -> Any:
+        return lambda: [((), cache.stats()[key])]
+
+    for name, kind, key, documentation in (
+        ("payment_response_cache_entries", "gauge", "entries", "Ответы в кеше платежей"),
+        ("payment_response_cache_bytes", "gauge", "bytes", "Объём кеша ответов платежей"),
+        ("payment_response_cache_hits_total", "counter", "hits", "Попадания в кеш платежей"),
+        ("payment_response_cache_misses_total", "counter", "misses", "Промахи кеша платежей"),
+        ("payment_response_cache_evictions_total", "counter", "evictions", "Вытеснения из кеша"),
+    ):
+        registry.collector(name, documentation, kind, (), sample(key))
+
+
+register_response_cache_metrics(payment_response_cache)
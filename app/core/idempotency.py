@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from pydantic import BaseModel
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.idempotency import IdempotencyKey
+from ..utils.cache import TTLCache
+from ..utils.serialization import PydanticJSONResponse
+from .config import settings
+from .database import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[int, str]
+
+
+class StoredResponse:
+    """Сохранённый ответ на запрос с Idempotency-Key"""
+
+    __slots__ = ("request_hash", "status_code", "body")
+
+    def __init__(self, request_hash: str, status_code: int, body: str) -> None:
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.body = body
+
+
+idempotency_cache: TTLCache[CacheKey, StoredResponse] = TTLCache(
+    max_entries=settings.idempotency_cache_max_entries,
+    default_ttl=settings.idempotency_cache_ttl_seconds,
+)
+_in_flight: Dict[CacheKey, asyncio.Event] = {}
+
+
+def request_fingerprint(request: Request, body: Optional[BaseModel] = None) -> str:
+    """Отпечаток запроса: метод, путь и тело"""
+    digest = hashlib.sha256(f"{request.method} {request.url.path}".encode())
+    if body is not None:
+        digest.update(body.model_dump_json().encode())
+    return digest.hexdigest()
+
+
+async def run_idempotent(
+    db: AsyncSession,
+    user_id: int,
+    key: Optional[str],
+    request_hash: str,
+    handler: Callable[[AsyncSession], Awaitable[BaseModel]],
+) -> Response:
+    """Выполнение обработчика не больше одного раза на Idempotency-Key.
+
+    Ключ, изменения обработчика и ответ фиксируются одной транзакцией: если
+    процесс упадёт до коммита, не останется ни платежа, ни ключа. Повторный
+    запрос получает сохранённый ответ без обращения к таблицам платежей.
+    Одновременные дубликаты в процессе ждут первое выполнение, дубликаты с
+    других воркеров ждут на уникальном ключе и получают его ответ.
+    """
+    if key is None:
+        return PydanticJSONResponse(await handler(db))
+
+    cache_key = (user_id, key)
+    while True:
+        stored = idempotency_cache.get(cache_key)
+        if stored is not None:
+            return _replay(stored, request_hash, replayed=True)
+
+        in_flight = _in_flight.get(cache_key)
+        if in_flight is None:
+            break
+        await in_flight.wait()
+
+    done = _in_flight[cache_key] = asyncio.Event()
+    try:
+        stored, replayed = await _execute(db, user_id, key, request_hash, handler)
+    finally:
+        del _in_flight[cache_key]
+        done.set()
+
+    idempotency_cache.set(cache_key, stored)
+    return _replay(stored, request_hash, replayed=replayed)
+
+
+async def _execute(
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    request_hash: str,
+    handler: Callable[[AsyncSession], Awaitable[BaseModel]],
+) -> Tuple[StoredResponse, bool]:
+    stored = await _load(db, user_id, key)
+    if stored is not None:
+        return stored, True
+
+    now = datetime.now(timezone.utc)
+    try:
+        # Строка ключа не фиксируется до конца обработчика: дубликат с другого
+        # воркера ждёт на уникальном индексе, пока эта транзакция не завершится
+        await db.execute(
+            insert(IdempotencyKey).values(
+                user_id=user_id,
+                key=key,
+                request_hash=request_hash,
+                expires_at=now + timedelta(seconds=settings.idempotency_ttl_seconds),
+            )
+        )
+    except IntegrityError:
+        await db.rollback()
+        stored = await _load(db, user_id, key)
+        if stored is None:
+            raise _in_progress_exception()
+        return stored, True
+
+    # Коммиты и откаты сервисов внутри обработчика работают с точкой сохранения,
+    # настоящий коммит выполняется вместе с записью ответа
+    nested = AsyncSession(
+        bind=await db.connection(),
+        join_transaction_mode="create_savepoint",
+        expire_on_commit=False,
+    )
+    try:
+        response = await handler(nested)
+        status_code, body = status.HTTP_200_OK, response.model_dump_json()
+    except HTTPException as e:
+        await nested.rollback()
+        if e.status_code >= 500:
+            await db.rollback()
+            raise
+        status_code, body = e.status_code, json.dumps({"detail": e.detail}, ensure_ascii=False)
+    except BaseException:
+        await nested.rollback()
+        await db.rollback()
+        raise
+    finally:
+        await nested.close()
+
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(status_code=status_code, response_body=body)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return StoredResponse(request_hash, status_code, body), False
+
+
+async def _load(db: AsyncSession, user_id: int, key: str) -> Optional[StoredResponse]:
+    """Сохранённый ответ по живому ключу; истёкший ключ удаляется"""
+    now = datetime.now(timezone.utc)
+    pk = (IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    result = await db.execute(
+        select(
+            IdempotencyKey.request_hash,
+            IdempotencyKey.status_code,
+            IdempotencyKey.response_body,
+            (IdempotencyKey.expires_at > now).label("alive"),
+        ).where(*pk)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    if row.alive and row.status_code is not None:
+        return StoredResponse(row.request_hash, row.status_code, row.response_body or "")
+    await db.execute(delete(IdempotencyKey).where(*pk).execution_options(synchronize_session=False))
+    return None
+
+
+def _replay(stored: StoredResponse, request_hash: str, replayed: bool) -> Response:
+    if stored.request_hash != request_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key уже использован для другого запроса",
+        )
+
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+def _in_progress_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Запрос с таким Idempotency-Key ещё выполняется",
+    )
+
+
+async def purge_expired_keys(db: AsyncSession, batch_size: int) -> int:
+    """Удаление истёкших ключей пачками ограниченного размера"""
+    total = 0
+    while True:
+        expired = (
+            select(IdempotencyKey.user_id, IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at < datetime.now(timezone.utc))
+            .limit(batch_size)
+        )
+        result = await db.execute(
+            delete(IdempotencyKey)
+            .where(tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(expired))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            break
+
+    if total:
+        logger.info("Удалено истёкших ключей идемпотентности: %d", total)
+    return total
+
+
+async def purge_expired_keys_job() -> None:
+    """Фоновая очистка истёкших ключей идемпотентности"""
+    async with async_session_maker() as session:
+        await purge_expired_keys(session, settings.idempotency_purge_batch_size)
@@ -0,0 +1,241 @@
+"""Метрики в формате Prometheus без внешних зависимостей.
+
+Значения меняются только из потока event loop (или под GIL из фоновых
+потоков), поэтому счётчики и гистограммы обходятся без блокировок.
+Дочерние метрики с метками создаются один раз и кешируются: на горячем
+пути остаётся поиск в словаре и сложение.
+"""
+
+import bisect
+import math
+import threading
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+T = TypeVar("T")
+
+
+class Counter:
+    """Монотонно растущий счётчик"""
+
+    __slots__ = ("_value",)
+
+    def __init__(self) -> None:
+        self._value = 0
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def inc(self, amount: int = 1) -> None:
+        self._value += amount
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин (в секундах)"""
+
+    __slots__ = ("buckets", "_counts", "_sum", "_count")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._counts: List[int] = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sum += value
+        self._count += 1
+
+    def cumulative(self) -> Dict[str, int]:
+        """Накопленные количества наблюдений по верхним границам корзин"""
+        result: Dict[str, int] = {}
+        total = 0
+        for bound, count in zip(self.buckets, self._counts):
+            total += count
+            result[repr(bound)] = total
+        result["+Inf"] = total + self._counts[-1]
+        return result
+
+    def snapshot(self) -> Dict[str, object]:
+        return {"count": self._count, "sum": self._sum, "buckets": self.cumulative()}
+
+
+class MetricFamily(Generic[T]):
+    """Метрика с набором меток и дочерними значениями для каждой комбинации"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        labelnames: Sequence[str] = (),
+        factory: Optional[Callable[[], T]] = None,
+        collect: Optional[Callable[[], Iterable[Tuple[LabelValues, T]]]] = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._collect = collect
+        self._children: Dict[LabelValues, T] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> T:
+        """Дочерняя метрика для значений меток; сохраните её, чтобы не искать повторно"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames) or self._factory is None:
+                raise ValueError(f"Некорректные метки метрики {self.name}: {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def samples(self) -> Iterator[Tuple[LabelValues, T]]:
+        if self._collect is not None:
+            yield from self._collect()
+        else:
+            yield from list(self._children.items())
+
+
+class MetricsRegistry:
+    """Реестр метрик и их вывод в текстовом формате Prometheus"""
+
+    def __init__(self) -> None:
+        self._families: Dict[str, MetricFamily[Any]] = {}
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> MetricFamily[Counter]:
+        return self._register(MetricFamily(name, documentation, "counter", labelnames, Counter))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> MetricFamily[Histogram]:
+        family = MetricFamily(
+            name, documentation, "histogram", labelnames, lambda: Histogram(buckets)
+        )
+        return self._register(family)
+
+    def collector(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[LabelValues, object]]],
+    ) -> MetricFamily[object]:
+        """Метрика, значения которой вычисляются в момент выгрузки"""
+        return self._register(MetricFamily(name, documentation, kind, labelnames, collect=collect))
+
+    def unregister(self, name: str) -> None:
+        self._families.pop(name, None)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in list(self._families.values()):
+            lines.append(f"# HELP {family.name} {_escape_help(family.documentation)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in family.samples():
+                labels = list(zip(family.labelnames, values))
+                if isinstance(child, Histogram):
+                    lines.extend(_render_histogram(family.name, labels, child))
+                elif isinstance(child, Counter):
+                    lines.append(f"{family.name}{_labels(labels)} {child.value}")
+                else:
+                    lines.append(f"{family.name}{_labels(labels)} {_number(child)}")
+        lines.append("")
+        return "\n".join(lines)
+
+    def _register(self, family: MetricFamily[T]) -> MetricFamily[T]:
+        if family.name in self._families:
+            raise ValueError(f"Метрика {family.name} уже зарегистрирована")
+        self._families[family.name] = family
+        return family
+
+
+def _render_histogram(
+    name: str, labels: List[Tuple[str, str]], histogram: Histogram
+) -> Iterator[str]:
+    for bound, count in histogram.cumulative().items():
+        yield f"{name}_bucket{_labels(labels + [('le', bound)])} {count}"
+    yield f"{name}_sum{_labels(labels)} {_number(histogram.sum)}"
+    yield f"{name}_count{_labels(labels)} {histogram.count}"
+
+
+def _labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    body = ",".join(f'{name}="{_escape_label(str(value))}"' for name, value in labels)
+    return "{" + body + "}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _number(value: object) -> str:
+    number = float(value)  # type: ignore[arg-type]
+    if math.isinf(number):
+        return "+Inf" if number > 0 else "-Inf"
+    return repr(int(number)) if number.is_integer() else repr(number)
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "http_requests_total",
+    "Количество HTTP-запросов",
+    ("router", "method", "route", "status"),
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "Длительность обработки HTTP-запроса",
+    ("router", "method", "route"),
+)
+db_query_duration_seconds = registry.histogram(
+    "db_query_duration_seconds",
+    "Длительность выполнения SQL-выражения",
+    ("operation",),
+)
+db_transaction_duration_seconds = registry.histogram(
+    "db_transaction_duration_seconds",
+    "Длительность транзакции БД",
+    ("outcome",),
+)
+payment_transitions_total = registry.counter(
+    "payment_transitions_total",
+    "Переходы платежей между статусами",
+    ("from_status", "to_status"),
+)
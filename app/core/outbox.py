@@ -0,0 +1,124 @@
+"""Получатели событий из outbox.
+
+Диспетчер передаёт получателю пачку событий, упорядоченную по id, и
+удаляет её из outbox, только если публикация завершилась без исключения.
+Доставка «хотя бы один раз»: получатель должен отбрасывать повторы по ``id``.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Protocol
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+Event = Dict[str, Any]
+
+
+class EventSink(Protocol):
+    async def publish(self, events: List[Event]) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class LogEventSink:
+    """Запись событий в лог приложения: ротацию и хранение берёт на себя сбор логов"""
+
+    def __init__(self, logger_name: str = "app.outbox.events") -> None:
+        self._logger = logging.getLogger(logger_name)
+
+    async def publish(self, events: List[Event]) -> None:
+        for event in events:
+            self._logger.info("Событие %s %s", event["type"], event["id"], extra={"event": event})
+
+    async def close(self) -> None:
+        pass
+
+
+class FileEventSink:
+    """Дописывание событий в файл NDJSON — локальная замена брокера.
+
+    Файл больше ``max_bytes`` переименовывается в ``<path>.1`` (старые
+    копии сдвигаются), хранится не больше ``backups`` копий.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0, backups: int = 0) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = asyncio.Lock()
+
+    async def publish(self, events: List[Event]) -> None:
+        lines = "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+        async with self._lock:
+            await asyncio.to_thread(self._append, lines)
+
+    def _append(self, lines: str) -> None:
+        if self.max_bytes and os.path.exists(self.path):
+            if os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+            file.flush()
+
+    def _rotate(self) -> None:
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    async def close(self) -> None:
+        pass
+
+
+class HttpEventSink:
+    """Отправка пачки событий одним POST с JSON-массивом"""
+
+    def __init__(
+        self, url: str, timeout: float, transport: Optional[httpx.AsyncBaseTransport] = None
+    ) -> None:
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout, transport=transport)
+
+    async def publish(self, events: List[Event]) -> None:
+        response = await self._client.post(self.url, json=events)
+        response.raise_for_status()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class NullEventSink:
+    """Отбрасывание событий, когда они нужны только для webhook"""
+
+    async def publish(self, events: List[Event]) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+def build_sink() -> EventSink:
+    if settings.outbox_sink == "none":
+        return NullEventSink()
+    if settings.outbox_sink == "http":
+        return HttpEventSink(settings.outbox_http_url, settings.outbox_http_timeout_seconds)
+    if settings.outbox_sink == "file":
+        return FileEventSink(
+            settings.outbox_file_path,
+            settings.outbox_file_max_bytes,
+            settings.outbox_file_backups,
+        )
+    return LogEventSink()
+
+
+event_sink = build_sink()
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Protocol
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.user import User
+from ..utils.cache import TTLCache
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+InvalidationCallback = Callable[[List[int]], None]
+
+
+class Principal:
+    """Снимок аутентифицированного пользователя.
+
+    Хранит только то, что нужно большинству обработчиков. Полная ORM-строка
+    загружается через ``load_user`` там, где нужен баланс или изменение данных.
+    """
+
+    __slots__ = ("id", "username", "balance_version")
+
+    def __init__(self, id: int, username: str, balance_version: Optional[datetime]) -> None:
+        self.id = id
+        self.username = username
+        self.balance_version = balance_version
+
+    def __repr__(self) -> str:
+        return f"Principal(id={self.id}, username={self.username!r})"
+
+    async def load_user(self, db: AsyncSession) -> User:
+        """Загрузка полной строки пользователя"""
+        user = await db.get(User, self.id)
+        if user is None:
+            raise ValueError(f"Пользователь с ID {self.id} не найден")
+        return user
+
+
+class InvalidationBroker(Protocol):
+    async def start(self, callback: InvalidationCallback) -> None: ...
+
+    async def publish(self, user_ids: List[int]) -> None: ...
+
+    async def stop(self) -> None: ...
+
+
+class LocalInvalidationBroker:
+    """Брокер внутри процесса: доставляет инвалидации всем подписанным кешам"""
+
+    def __init__(self) -> None:
+        self._callbacks: List[InvalidationCallback] = []
+
+    async def start(self, callback: InvalidationCallback) -> None:
+        self._callbacks.append(callback)
+
+    async def publish(self, user_ids: List[int]) -> None:
+        for callback in self._callbacks:
+            callback(user_ids)
+
+    async def stop(self) -> None:
+        self._callbacks.clear()
+
+
+class PostgresInvalidationBroker:
+    """Брокер поверх Postgres LISTEN/NOTIFY для инвалидации между воркерами"""
+
+    def __init__(self, database_url: str, channel: str) -> None:
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(False)
+        self.channel = channel
+        self._listener: Any = None
+        self._publisher: Any = None
+        self._publish_lock = asyncio.Lock()
+
+    async def start(self, callback: InvalidationCallback) -> None:
+        import asyncpg
+
+        def on_notify(connection: Any, pid: int, channel: str, payload: str) -> None:
+            callback([int(user_id) for user_id in payload.split(",") if user_id])
+
+        self._listener = await asyncpg.connect(self.dsn)
+        await self._listener.add_listener(self.channel, on_notify)
+        self._publisher = await asyncpg.connect(self.dsn)
+
+    async def publish(self, user_ids: List[int]) -> None:
+        if self._publisher is None:
+            return
+        async with self._publish_lock:
+            await self._publisher.execute(
+                "SELECT pg_notify($1, $2)", self.channel, ",".join(map(str, user_ids))
+            )
+
+    async def stop(self) -> None:
+        for connection in (self._listener, self._publisher):
+            if connection is not None:
+                await connection.close()
+        self._listener = None
+        self._publisher = None
+
+
+class PrincipalCache:
+    """Кеш снимков пользователей с TTL и явной инвалидацией"""
+
+    def __init__(self, ttl: float, max_entries: int, broker: InvalidationBroker) -> None:
+        self.broker = broker
+        self._cache: TTLCache[int, Principal] = TTLCache(max_entries=max_entries, default_ttl=ttl)
+
+    async def start(self) -> None:
+        await self.broker.start(self._drop)
+
+    async def stop(self) -> None:
+        await self.broker.stop()
+
+    async def get(self, db: AsyncSession, user_id: int) -> Optional[Principal]:
+        """Снимок пользователя из кеша или одним узким запросом из БД"""
+        principal: Optional[Principal] = self._cache.get(user_id)
+        if principal is not None:
+            return principal
+
+        result = await db.execute(
+            select(User.id, User.username, User.updated_at).where(User.id == user_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+
+        principal = Principal(id=row.id, username=row.username, balance_version=row.updated_at)
+        self._cache.set(user_id, principal)
+        return principal
+
+    async def invalidate(self, user_ids: Iterable[Optional[int]]) -> None:
+        """Сброс снимков локально и на остальных воркерах"""
+        ids = sorted({int(user_id) for user_id in user_ids if user_id is not None})
+        if not ids:
+            return
+        self._drop(ids)
+        try:
+            await self.broker.publish(ids)
+        except Exception:
+            logger.exception("Не удалось разослать инвалидацию пользователей %s", ids)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+    def _drop(self, user_ids: List[int]) -> None:
+        for user_id in user_ids:
+            self._cache.pop(user_id)
+
+
+def _build_broker() -> InvalidationBroker:
+    if settings.principal_invalidation_backend == "postgres":
+        return PostgresInvalidationBroker(
+            settings.database_url, settings.principal_invalidation_channel
+        )
+    return LocalInvalidationBroker()
+
+
+principal_cache = PrincipalCache(
+    ttl=settings.principal_cache_ttl_seconds,
+    max_entries=settings.principal_cache_max_entries,
+    broker=_build_broker(),
+)
@@ -0,0 +1,48 @@
+import re
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+_PLACEHOLDER = r"(?:\?|\$\d+|%\(\w+\)s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Форма SQL-выражения: списки параметров IN (...) и пробелы схлопываются"""
+    return _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryProfile:
+    """Число и длительность SQL-выражений, выполненных в рамках одного запроса"""
+
+    __slots__ = ("count", "total_seconds", "statements")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_seconds = 0.0
+        self.statements: Dict[str, Tuple[int, float]] = {}
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.total_seconds += elapsed
+        count, total = self.statements.get(statement, (0, 0.0))
+        self.statements[statement] = (count + 1, total + elapsed)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int, float]]:
+        """Формы выражений, выполненные больше ``threshold`` раз"""
+        shapes: Dict[str, Tuple[int, float]] = {}
+        for statement, (count, total) in self.statements.items():
+            shape = statement_shape(statement)
+            shape_count, shape_total = shapes.get(shape, (0, 0.0))
+            shapes[shape] = (shape_count + count, shape_total + total)
+        return sorted(
+            (
+                (shape, count, total)
+                for shape, (count, total) in shapes.items()
+                if count > threshold
+            ),
+            key=lambda item: -item[1],
+        )
+
+
+current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
@@ -0,0 +1,191 @@
+"""Ограничение частоты запросов алгоритмом token bucket.
+
+Корзина ключа (IP или имя пользователя) пополняется со скоростью
+``rate`` токенов в секунду до ``burst``; каждый запрос забирает токен.
+Хранилище корзин подключаемое: в памяти процесса с LRU-вытеснением или
+общий файл SQLite для воркеров на одной машине.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Protocol, Tuple
+
+from .config import settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+rate_limit_rejections_total = registry.counter(
+    "rate_limit_rejections_total",
+    "Запросы, отклонённые ограничением частоты",
+    ("rule",),
+)
+
+
+class RateRule:
+    """Параметры корзины: скорость пополнения и ёмкость"""
+
+    __slots__ = ("name", "rate", "burst")
+
+    def __init__(self, name: str, per_minute: float, burst: int) -> None:
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = float(burst)
+
+
+def refill(tokens: float, updated: float, now: float, rule: RateRule) -> Tuple[float, float]:
+    """Списание токена; возвращает остаток и время до разрешения (0, если разрешено)"""
+    tokens = min(rule.burst, tokens + max(now - updated, 0.0) * rule.rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rule.rate
+
+
+class RateLimitBackend(Protocol):
+    async def take(self, key: str, rule: RateRule) -> float: ...
+
+    def clear(self) -> None: ...
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens = tokens
+        self.updated = updated
+
+
+class MemoryRateLimitBackend:
+    """Корзины в памяти процесса с вытеснением давно не использованных ключей"""
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def take(self, key: str, rule: RateRule) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(rule.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        bucket.tokens, retry_after = refill(bucket.tokens, bucket.updated, now, rule)
+        bucket.updated = now
+        return retry_after
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class SQLiteRateLimitBackend:
+    """Корзины в файле SQLite, общие для воркеров на одной машине.
+
+    Списание выполняется в транзакции ``BEGIN IMMEDIATE`` в отдельном
+    потоке. Время берётся по часам системы, общим для процессов; корзины,
+    не тронутые ``ttl`` секунд, периодически удаляются.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, ttl: float = 3600.0) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    async def take(self, key: str, rule: RateRule) -> float:
+        return await asyncio.to_thread(self._take, key, rule)
+
+    def _take(self, key: str, rule: RateRule) -> float:
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated = row if row is not None else (rule.burst, now)
+                tokens, retry_after = refill(tokens, updated, now, rule)
+                self._conn.execute(
+                    "INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, "
+                    "updated = excluded.updated",
+                    (key, tokens, now),
+                )
+                self._calls += 1
+                if self._calls % self.PRUNE_EVERY == 0:
+                    self._conn.execute(
+                        "DELETE FROM rate_limit_buckets WHERE updated < ?", (now - self.ttl,)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limit_buckets")
+
+
+class RateLimiter:
+    """Проверка запроса по корзинам IP и имени пользователя"""
+
+    def __init__(self, backend: RateLimitBackend, ip_rule: RateRule, username_rule: RateRule):
+        self.backend = backend
+        self.ip_rule = ip_rule
+        self.username_rule = username_rule
+        self._rejections = {
+            rule.name: rate_limit_rejections_total.labels(rule.name)
+            for rule in (ip_rule, username_rule)
+        }
+
+    async def check(self, ip: Optional[str], username: Optional[str]) -> float:
+        """Секунды до следующей разрешённой попытки или 0, если запрос разрешён"""
+        checks = []
+        if ip:
+            checks.append((f"ip:{ip}", self.ip_rule))
+        if username:
+            checks.append((f"user:{username.lower()}", self.username_rule))
+
+        for key, rule in checks:
+            retry_after = await self.backend.take(key, rule)
+            if retry_after:
+                self._rejections[rule.name].inc()
+                logger.warning("Превышен лимит запросов %s для %s", rule.name, key)
+                return retry_after
+        return 0.0
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+def _build_backend() -> RateLimitBackend:
+    if settings.rate_limit_backend == "sqlite":
+        return SQLiteRateLimitBackend(settings.rate_limit_sqlite_path)
+    return MemoryRateLimitBackend(settings.rate_limit_max_keys)
+
+
+rate_limiter = RateLimiter(
+    _build_backend(),
+    RateRule("ip", settings.rate_limit_ip_per_minute, settings.rate_limit_ip_burst),
+    RateRule(
+        "username", settings.rate_limit_username_per_minute, settings.rate_limit_username_burst
+    ),
+)
@@ -0,0 +1,177 @@
+"""Маршрутизация чтений на реплики БД.
+
+Чтение уходит на реплику, если она прошла последнюю проверку здоровья,
+её отставание не больше ``replica_max_lag_seconds`` и она уже догнала
+последнюю запись пользователя. Иначе используется основная база.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import ORMExecuteState, Session, SessionTransaction
+
+from ..utils.cache import TTLCache
+from .config import settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Пользователь текущего запроса: его записи включают чтение с основной базы
+current_writer: ContextVar[Optional[int]] = ContextVar("current_writer", default=None)
+
+_LAG_QUERIES = {
+    "postgresql": text(
+        "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+_PING = text("SELECT 0")
+
+
+class Replica:
+    """Реплика и результат её последней проверки"""
+
+    __slots__ = ("name", "engine", "session_maker", "healthy", "lag", "checked_at", "error")
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.name = engine.url.render_as_string(hide_password=True)
+        self.engine = engine
+        self.session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self.healthy = False
+        self.lag = 0.0
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    async def check(self, timeout: float) -> None:
+        query = _LAG_QUERIES.get(self.engine.dialect.name, _PING)
+        try:
+            async with self.engine.connect() as conn:
+                lag = await asyncio.wait_for(conn.scalar(query), timeout)
+        except Exception as e:
+            if self.healthy:
+                logger.warning("Реплика %s недоступна: %s", self.name, e)
+            self.healthy, self.error = False, f"{type(e).__name__}: {e}"
+        else:
+            if not self.healthy:
+                logger.info("Реплика %s доступна", self.name)
+            self.healthy, self.error, self.lag = True, None, float(lag or 0)
+        self.checked_at = time.monotonic()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "error": self.error,
+        }
+
+
+class ReplicaSet:
+    """Реплики с проверкой здоровья и привязкой чтений после записи"""
+
+    def __init__(
+        self,
+        engines: Sequence[AsyncEngine],
+        max_lag: float,
+        sticky_seconds: float,
+        max_users: int = 100_000,
+    ) -> None:
+        self.replicas = [Replica(engine) for engine in engines]
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self._writes: TTLCache[int, float] = TTLCache(
+            max_entries=max_users, default_ttl=max(sticky_seconds, max_lag)
+        )
+        self._next = itertools.count()
+
+    def mark_write(self, user_id: int) -> None:
+        """Запись пользователя: его чтения идут на основную базу, пока реплики не догонят"""
+        self._writes.set(user_id, time.monotonic())
+
+    def choose(self, user_id: Optional[int] = None) -> Optional[Replica]:
+        """Реплика для чтения или None, если читать нужно с основной базы"""
+        if not self.replicas:
+            return None
+
+        since_write = None
+        if user_id is not None:
+            written_at = self._writes.get(user_id, count=False)
+            if written_at is not None:
+                since_write = time.monotonic() - written_at
+                if since_write < self.sticky_seconds:
+                    return None
+
+        candidates = [
+            replica
+            for replica in self.replicas
+            if replica.healthy
+            and replica.lag <= self.max_lag
+            and (since_write is None or replica.lag < since_write)
+        ]
+        if not candidates:
+            return None
+        return candidates[next(self._next) % len(candidates)]
+
+    async def check(self) -> None:
+        await asyncio.gather(
+            *(replica.check(settings.replica_health_timeout_seconds) for replica in self.replicas)
+        )
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [replica.status() for replica in self.replicas]
+
+    def clear(self) -> None:
+        self._writes.clear()
+
+
+def _mark_statement(state: ORMExecuteState) -> None:
+    if not state.is_select:
+        state.session.info["wrote"] = True
+
+
+def _mark_flush(session: Session, flush_context: Any) -> None:
+    session.info["wrote"] = True
+
+
+def _forget_write(session: Session, previous_transaction: SessionTransaction) -> None:
+    session.info.pop("wrote", None)
+
+
+def track_writes(replica_set: ReplicaSet) -> None:
+    """Отметка записей пользователя ``current_writer`` после успешного COMMIT"""
+
+    def after_commit(session: Session) -> None:
+        if session.info.pop("wrote", False):
+            user_id = current_writer.get()
+            if user_id is not None:
+                replica_set.mark_write(user_id)
+
+    event.listen(Session, "do_orm_execute", _mark_statement)
+    event.listen(Session, "after_flush", _mark_flush)
+    event.listen(Session, "after_commit", after_commit)
+    event.listen(Session, "after_soft_rollback", _forget_write)
+
+
+def register_replica_metrics(replica_set: ReplicaSet) -> None:
+    """Выгрузка здоровья и отставания реплик в реестр метрик"""
+    registry.collector(
+        "db_replica_healthy",
+        "Реплика прошла последнюю проверку",
+        "gauge",
+        ("replica",),
+        lambda: [((r.name,), int(r.healthy)) for r in replica_set.replicas],
+    )
+    registry.collector(
+        "db_replica_lag_seconds",
+        "Отставание реплики от основной базы",
+        "gauge",
+        ("replica",),
+        lambda: [((r.name,), r.lag) for r in replica_set.replicas],
+    )
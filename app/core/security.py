@@ -1,12 +1,22 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from ..utils.cache import MISSING, TTLCache
 from .config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds
+)
+
+T = TypeVar("T")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -19,6 +29,90 @@ def get_password_hash(password: str) -> str:
     return str(pwd_context.hash(password))
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Проверка пароля с перехешированием, если изменилась стоимость bcrypt"""
+    valid, new_hash = pwd_context.verify_and_update(plain_password, hashed_password)
+    return bool(valid), new_hash
+
+
+class PasswordHasherOverloaded(RuntimeError):
+    """Очередь на хеширование паролей переполнена"""
+
+
+class PasswordHasher:
+    """Асинхронное хеширование паролей в пуле потоков или процессов.
+
+    Одновременно выполняется не больше ``workers`` операций, ещё ``max_queue``
+    ждут в очереди пула. Остальные запросы сразу отклоняются с
+    ``PasswordHasherOverloaded``, чтобы всплеск логинов не копил бесконечную очередь.
+    """
+
+    def __init__(self, executor_kind: str, workers: int, max_queue: int) -> None:
+        if executor_kind not in ("thread", "process"):
+            raise ValueError(f"Неизвестный тип пула хеширования: {executor_kind}")
+
+        self.executor_kind = executor_kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.executor_kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="password-hasher"
+                    )
+            return self._executor
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                raise PasswordHasherOverloaded("Слишком много одновременных операций с паролями")
+            self._pending += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Хеширование пароля вне event loop"""
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Проверка пароля вне event loop.
+
+        Возвращает признак совпадения и новый хеш, если старый нужно обновить.
+        """
+        return await self._run(verify_and_update_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor_kind=settings.password_hash_executor,
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+)
+
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Создание JWT токена"""
     to_encode = data.copy()
@@ -43,3 +137,34 @@ def verify_token(token: str) -> Optional[Dict[str, Any]]:
         return payload
     except JWTError:
         return None
+
+
+token_cache: TTLCache[bytes, Optional[Dict[str, Any]]] = TTLCache(
+    max_entries=settings.token_cache_max_entries,
+    max_bytes=settings.token_cache_max_bytes,
+)
+
+
+def verify_token_cached(token: str) -> Optional[Dict[str, Any]]:
+    """Проверка JWT токена с кешированием результата по хешу токена.
+
+    Валидные токены живут в кеше не дольше своего ``exp``, невалидные —
+    ``token_cache_negative_ttl_seconds``, чтобы поток мусорных токенов
+    не заставлял каждый раз проверять подпись.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    cached = token_cache.get(key, MISSING)
+    if cached is not MISSING:
+        return cached
+
+    payload = verify_token(token)
+    if payload is None:
+        token_cache.set(key, None, ttl=settings.token_cache_negative_ttl_seconds)
+        return None
+
+    ttl = settings.token_cache_max_ttl_seconds
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        ttl = min(ttl, exp - time.time())
+    token_cache.set(key, payload, ttl=ttl)
+    return payload
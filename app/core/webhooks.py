@@ -0,0 +1,192 @@
+"""Подпись и расписание повторов webhook-доставок.
+
+Тело подписывается HMAC-SHA256 секретом endpoint: заголовок
+``X-Webhook-Signature: t=<unix-время>,v1=<hex>`` содержит подпись строки
+``<время>.<тело>``. Получатель проверяет подпись и отбрасывает старые
+метки времени, чтобы перехваченный запрос нельзя было повторить.
+
+Адрес endpoint проверяется при регистрации и при каждом новом соединении:
+все IP, в которые он разрешается, должны быть публичными. Иначе webhook
+стал бы способом обращаться от имени сервиса к внутренней сети и
+метаданным облака (SSRF). Соединение открывается с тем IP, который прошёл
+проверку, поэтому смена DNS между проверкой и запросом ничего не даёт.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import random
+import socket
+import time
+from typing import Dict, Iterable, List, Optional
+
+import httpcore
+import httpx
+
+from .config import settings
+
+SIGNATURE_HEADER = "X-Webhook-Signature"
+
+
+class Delivery:
+    """Захваченная доставка с готовым телом запроса"""
+
+    __slots__ = (
+        "id",
+        "endpoint_id",
+        "url",
+        "secret",
+        "event_id",
+        "event_type",
+        "body",
+        "attempts",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        endpoint_id: int,
+        url: str,
+        secret: str,
+        event_id: int,
+        event_type: str,
+        body: bytes,
+        attempts: int,
+    ) -> None:
+        self.id = id
+        self.endpoint_id = endpoint_id
+        self.url = url
+        self.secret = secret
+        self.event_id = event_id
+        self.event_type = event_type
+        self.body = body
+        self.attempts = attempts
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """Значение заголовка подписи для тела и метки времени"""
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256)
+    return f"t={timestamp},v1={digest.hexdigest()}"
+
+
+def verify(
+    secret: str, header: str, body: bytes, tolerance: float = 300.0, now: Optional[float] = None
+) -> bool:
+    """Проверка подписи на стороне получателя"""
+    try:
+        parts = dict(item.split("=", 1) for item in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs((time.time() if now is None else now) - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), header)
+
+
+def delivery_headers(delivery: Delivery, timestamp: int) -> Dict[str, str]:
+    return {
+        "Content-Type": "application/json",
+        "X-Webhook-Id": str(delivery.event_id),
+        "X-Webhook-Event": delivery.event_type,
+        SIGNATURE_HEADER: sign(delivery.secret, timestamp, delivery.body),
+    }
+
+
+async def _resolve(host: str, port: int) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [str(info[4][0]) for info in infos]
+
+
+async def _public_addresses(host: str, port: int) -> List[str]:
+    try:
+        addresses = await _resolve(host, port)
+    except OSError:
+        raise ValueError(f"Не удалось разрешить адрес {host}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"Адрес {host} ведёт во внутреннюю сеть ({ip})")
+    return addresses
+
+
+async def check_url(url: str) -> None:
+    """Проверка, что адрес ведёт только на публичные IP; иначе ``ValueError``"""
+    if settings.webhook_allow_private_urls:
+        return
+    parsed = httpx.URL(url)
+    await _public_addresses(parsed.host, parsed.port or (443 if parsed.scheme == "https" else 80))
+
+
+class PublicNetworkBackend(httpcore.AsyncNetworkBackend):
+    """Сетевой уровень httpcore, соединяющийся только с проверенными публичными IP.
+
+    Имя разрешается один раз на соединение, и подключение идёт к тому же
+    адресу. TLS по-прежнему проверяет сертификат и отправляет SNI по имени
+    хоста из URL, заголовок ``Host`` не меняется.
+    """
+
+    def __init__(self, backend: Optional[httpcore.AsyncNetworkBackend] = None) -> None:
+        self._backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Iterable[httpcore.SOCKET_OPTION]] = None,
+    ) -> httpcore.AsyncNetworkStream:
+        if settings.webhook_allow_private_urls:
+            addresses = [host]
+        else:
+            try:
+                addresses = await _public_addresses(host, port)
+            except ValueError as e:
+                raise httpcore.ConnectError(str(e))
+
+        for address in addresses[:-1]:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except httpcore.ConnectError:
+                continue
+        return await self._backend.connect_tcp(
+            addresses[-1], port, timeout, local_address, socket_options
+        )
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class PublicHTTPTransport(httpx.AsyncHTTPTransport):
+    """Транспорт httpx для webhook: соединения только с публичными адресами"""
+
+    def __init__(
+        self,
+        limits: httpx.Limits = httpx.Limits(),
+        network_backend: Optional[httpcore.AsyncNetworkBackend] = None,
+    ) -> None:
+        super().__init__(limits=limits)
+        # httpx не принимает свой сетевой уровень: пул собирается заново с теми же лимитами
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=PublicNetworkBackend(network_backend),
+        )
+
+
+def retry_delay(
+    attempt: int, base: float, cap: float, rng: Optional[random.Random] = None
+) -> float:
+    """Задержка перед попыткой ``attempt + 1``: экспонента с равномерным разбросом.
+
+    Половина задержки фиксирована, вторая половина случайна, поэтому
+    повторы упавших одновременно доставок расходятся во времени, но
+    задержка всё равно растёт с каждой попыткой.
+    """
+    ceiling = min(cap, base * 2 ** max(attempt - 1, 0))
+    return ceiling / 2 + (rng or random).uniform(0, ceiling / 2)
@@ -1,51 +1,206 @@
+"""Сборка приложения.
+
+``create_app()`` импортирует роутеры, сервисы и модели только при вызове,
+поэтому ``import app.main`` дёшев: для uvicorn приложение собирается фабрикой
+(``uvicorn --factory app.main:create_app``) или при первом обращении к
+``app.main.app``. Время импорта, сборки и прогрева пишется в лог и в
+``app.state.startup_timings``.
+"""
+
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Dict
+from typing import Any, AsyncGenerator, Dict
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import auth, payments
+from .core.config import settings
 from .utils.logger import setup_logging
 
-setup_logging()
 logger = logging.getLogger(__name__)
 
 
+async def _warm_up(app: FastAPI) -> None:
+    from .core.database import engine, read_engines
+    from .services.warmup import warm_pool
+
+    started = time.perf_counter()
+    connections = 0
+    try:
+        for db_engine in (engine, *read_engines):
+            connections += await warm_pool(db_engine, settings.db_warmup_connections)
+    except Exception:
+        # Прогрев только ускоряет первые запросы: без БД приложение всё равно стартует
+        logger.exception("Не удалось прогреть соединения с БД")
+    app.openapi()
+    app.state.startup_timings["warmup_seconds"] = time.perf_counter() - started
+    app.state.startup_timings["warm_connections"] = connections
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    from .core.database import replicas
+    from .core.idempotency import purge_expired_keys_job
+    from .core.outbox import event_sink
+    from .core.principal import principal_cache
+    from .core.security import password_hasher
+    from .services.balance_shard_service import compact_balance_shards_job
+    from .services.ledger_service import take_snapshots_job
+    from .services.outbox_service import dispatch_outbox_job
+    from .services.payment_service import expire_stale_payments_job
+    from .services.payment_stats_service import fold_payment_stats_job
+    from .services.webhook_engine import webhook_engine
+    from .utils.periodic import start_periodic
+
     logger.info("Запуск приложения...")
+    if settings.db_warmup_enabled:
+        await _warm_up(app)
     logger.info("База данных инициализирована")
+    await principal_cache.start()
+    background = [
+        start_periodic(
+            "idempotency-purge",
+            settings.idempotency_purge_interval_seconds,
+            purge_expired_keys_job,
+        ),
+        start_periodic(
+            "ledger-snapshots",
+            settings.ledger_snapshot_interval_seconds,
+            take_snapshots_job,
+        ),
+        start_periodic(
+            "balance-shards-compaction",
+            settings.balance_shard_compact_interval_seconds,
+            compact_balance_shards_job,
+        ),
+        start_periodic(
+            "payment-stats-fold",
+            settings.payment_stats_fold_interval_seconds,
+            fold_payment_stats_job,
+        ),
+    ]
+    if settings.outbox_enabled:
+        background.append(
+            start_periodic(
+                "outbox-dispatcher", settings.outbox_poll_interval_seconds, dispatch_outbox_job
+            )
+        )
+    if settings.payment_expiry_enabled:
+        background.append(
+            start_periodic(
+                "payment-expiry",
+                settings.payment_expiry_interval_seconds,
+                expire_stale_payments_job,
+            )
+        )
+    if settings.webhooks_enabled and settings.webhook_delivery_enabled:
+        webhook_engine.start()
+    if replicas.replicas:
+        background.append(
+            start_periodic(
+                "replica-health", settings.replica_health_interval_seconds, replicas.check
+            )
+        )
+    timings = app.state.startup_timings
+    timings["startup_seconds"] = time.perf_counter() - app.state.created_at
+    logger.info("Приложение готово к работе: %s", _format_timings(timings))
     yield
     logger.info("Завершение работы приложения...")
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await webhook_engine.stop()
+    await event_sink.close()
+    await principal_cache.stop()
+    password_hasher.shutdown()
+
+
+def _format_timings(timings: Dict[str, Any]) -> str:
+    return ", ".join(
+        f"{name}={value:.3f}" if isinstance(value, float) else f"{name}={value}"
+        for name, value in timings.items()
+    )
+
+
+def create_app() -> FastAPI:
+    """Сборка приложения с роутерами и middleware"""
+    started = time.perf_counter()
+    setup_logging()
+
+    from .core.rate_limit import rate_limiter
+    from .middleware.metrics import MetricsMiddleware
+    from .middleware.profiler import QueryProfilerMiddleware
+    from .middleware.rate_limit import RateLimitMiddleware
+    from .routers import auth, internal, metrics, payments, webhooks
+
+    imported = time.perf_counter()
 
+    app = FastAPI(
+        title="Payment Service API",
+        description="Сервис для создания и управления платежами",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
 
-app = FastAPI(
-    title="Payment Service API",
-    description="Сервис для создания и управления платежами",
-    version="1.0.0",
-    lifespan=lifespan,
-)
+    app.add_middleware(
+        RateLimitMiddleware, limiter=rate_limiter, paths=("/auth/login", "/auth/register")
+    )
+    app.add_middleware(MetricsMiddleware)
+    if settings.query_profiler_enabled:
+        app.add_middleware(
+            QueryProfilerMiddleware, threshold=settings.query_profiler_repeat_threshold
+        )
+    # Последний добавленный — внешний: CORS-заголовки получают и ответы других
+    # middleware, например 429 ограничителя частоты
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    app.include_router(auth.router, prefix="/auth", tags=["authentication"])
+    app.include_router(payments.router, prefix="/payments", tags=["payments"])
+    app.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
+    if settings.internal_api_enabled:
+        app.include_router(internal.router, prefix="/internal", tags=["internal"])
+    if settings.metrics_enabled:
+        app.include_router(metrics.router)
 
-app.include_router(auth.router, prefix="/auth", tags=["authentication"])
-app.include_router(payments.router, prefix="/payments", tags=["payments"])
+    @app.get("/")
+    async def root() -> Dict[str, str]:
+        """Корневой эндпоинт"""
+        return {
+            "message": "Payment Service API",
+            "version": "1.0.0",
+            "docs": "/docs",
+            "health": "OK",
+        }
 
+    @app.get("/health")
+    async def health_check() -> Dict[str, str]:
+        """Проверка здоровья приложения"""
+        return {"status": "healthy", "service": "payment-service"}
 
-@app.get("/")
-async def root() -> Dict[str, str]:
-    """Корневой эндпоинт"""
-    return {"message": "Payment Service API", "version": "1.0.0", "docs": "/docs", "health": "OK"}
+    built = time.perf_counter()
+    app.state.created_at = started
+    app.state.startup_timings = {
+        "import_seconds": imported - started,
+        "build_seconds": built - imported,
+    }
+    logger.info(
+        "Приложение собрано: импорт %.3f с, сборка %.3f с", imported - started, built - imported
+    )
+    return app
 
 
-@app.get("/health")
-async def health_check() -> Dict[str, str]:
-    """Проверка здоровья приложения"""
-    return {"status": "healthy", "service": "payment-service"}
+def __getattr__(name: str) -> Any:
+    # ``app.main:app`` для uvicorn без --factory и для тестов
+    if name == "app":
+        app = create_app()
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,53 @@
+import time
+from typing import Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..core.metrics import http_request_duration_seconds, http_requests_total
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_labels(scope: Scope) -> Tuple[str, str]:
+    """Имя роутера (первый сегмент пути) и шаблон маршрута запроса"""
+    route = scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if path is None:
+        return UNMATCHED_ROUTE, UNMATCHED_ROUTE
+    return path.strip("/").split("/", 1)[0] or "root", path
+
+
+class MetricsMiddleware:
+    """Счётчик запросов и гистограмма длительности по маршрутам.
+
+    Маршрут берётся из шаблона пути (``/payments/{payment_id}``), а не из
+    фактического URL, чтобы число комбинаций меток оставалось ограниченным.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._observe(scope, status_code, time.perf_counter() - started)
+
+    def _observe(self, scope: Scope, status_code: int, elapsed: float) -> None:
+        router, route = route_labels(scope)
+        method = scope["method"]
+        http_request_duration_seconds.labels(router, method, route).observe(elapsed)
+        http_requests_total.labels(router, method, route, str(status_code)).inc()
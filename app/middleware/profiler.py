@@ -0,0 +1,60 @@
+import logging
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..core.profiler import QueryProfile, current_profile
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfilerMiddleware:
+    """Профилирование SQL-выражений в рамках HTTP-запроса.
+
+    Добавляет заголовки ``X-DB-Queries`` и ``Server-Timing`` и пишет
+    предупреждение, если одна форма выражения повторяется больше
+    ``threshold`` раз (типичный признак N+1).
+    """
+
+    def __init__(self, app: ASGIApp, threshold: int = 5) -> None:
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append("X-DB-Queries", str(profile.count))
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={profile.total_seconds * 1000:.2f};desc="{profile.count} queries", '
+                    f"app;dur={elapsed_ms:.2f}",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            self._warn_repeated(scope, profile)
+
+    def _warn_repeated(self, scope: Scope, profile: QueryProfile) -> None:
+        for shape, count, total in profile.repeated(self.threshold):
+            logger.warning(
+                "Возможный N+1: %s %s выполнил %d одинаковых запросов за %.1f мс: %s",
+                scope["method"],
+                scope["path"],
+                count,
+                total * 1000,
+                shape,
+            )
@@ -0,0 +1,108 @@
+import json
+import math
+from typing import Collection, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..core.config import settings
+from ..core.rate_limit import RateLimiter
+
+# Тело больше этого размера не разбирается в поисках имени пользователя
+MAX_INSPECTED_BODY = 16 * 1024
+
+REJECTION_BODY = json.dumps(
+    {"detail": "Слишком много запросов, повторите попытку позже"}, ensure_ascii=False
+).encode()
+
+
+class RateLimitMiddleware:
+    """Ограничение частоты запросов к дорогим эндпоинтам.
+
+    Для ``POST`` на ``paths`` проверяются корзины IP клиента и поля
+    ``username`` из JSON-тела. Отказ возвращается ответом 429 с
+    ``Retry-After`` до маршрутизации, то есть без обращений к БД и bcrypt.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter, paths: Collection[str]) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+            or not settings.rate_limit_enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        chunks, complete = await _read_body(receive)
+        username = _username(b"".join(chunks)) if complete else None
+        client = scope.get("client")
+
+        retry_after = await self.limiter.check(client[0] if client else None, username)
+        if retry_after:
+            await _reject(send, retry_after)
+            return
+
+        await self.app(scope, _replay(chunks, complete, receive), send)
+
+
+async def _read_body(receive: Receive) -> Tuple[List[bytes], bool]:
+    """Чтение тела до MAX_INSPECTED_BODY; второй элемент — прочитано ли тело целиком"""
+    chunks: List[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return chunks, False
+        body = message.get("body", b"")
+        chunks.append(body)
+        size += len(body)
+        if not message.get("more_body", False):
+            return chunks, True
+        if size > MAX_INSPECTED_BODY:
+            return chunks, False
+
+
+def _username(body: bytes) -> Optional[str]:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    username = payload.get("username") if isinstance(payload, dict) else None
+    return username if isinstance(username, str) and username else None
+
+
+def _replay(chunks: List[bytes], complete: bool, receive: Receive) -> Receive:
+    """Повтор уже прочитанных частей тела, затем чтение оставшихся"""
+    pending = list(chunks)
+
+    async def replayed() -> Message:
+        if pending:
+            body = pending.pop(0)
+            return {
+                "type": "http.request",
+                "body": body,
+                "more_body": bool(pending) or not complete,
+            }
+        return await receive()
+
+    return replayed
+
+
+async def _reject(send: Send, retry_after: float) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(REJECTION_BODY)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": REJECTION_BODY})
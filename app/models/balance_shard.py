@@ -0,0 +1,19 @@
+from sqlalchemy import Column, ForeignKey, Integer, Numeric
+
+from ..core.database import Base
+
+
+class BalanceShard(Base):
+    """Часть баланса горячего счёта.
+
+    Зачисления на счёт из ``settings.balance_shard_accounts`` попадают в одну
+    из строк-шардов, а не в ``users.balance``, поэтому параллельные
+    подтверждения не ждут блокировку одной строки. Полный баланс — сумма
+    ``users.balance`` и всех шардов.
+    """
+
+    __tablename__ = "balance_shards"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    balance = Column(Numeric(12, 2), nullable=False, default=0)
@@ -0,0 +1,53 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from ..core.database import Base
+from .payment import CreatedAt
+
+# SQLite выдаёт автоинкремент только для INTEGER PRIMARY KEY
+EntryId = BigInteger().with_variant(Integer, "sqlite")
+
+DEBIT = "debit"
+CREDIT = "credit"
+
+
+class LedgerEntry(Base):
+    """Проводка по счёту пользователя.
+
+    Таблица только дополняется. Сумма хранится со знаком: списание
+    отрицательное, зачисление положительное. ``account_id`` равен NULL
+    для внешнего клирингового счёта (платежи без получателя).
+    """
+
+    __tablename__ = "ledger_entries"
+    __table_args__ = (
+        UniqueConstraint("payment_id", "side", name="uq_ledger_entries_payment_side"),
+        Index("ix_ledger_entries_account_created_id", "account_id", "created_at", "id"),
+    )
+
+    id = Column(EntryId, primary_key=True, autoincrement=True)
+    account_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    payment_id = Column(UUID(as_uuid=True), ForeignKey("payments.id"), nullable=True)
+    side = Column(String(6), nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
+    created_at = Column(CreatedAt, server_default=func.now(), nullable=False)
+
+
+class BalanceSnapshot(Base):
+    """Баланс счёта с учётом всех проводок по момент ``taken_at`` включительно"""
+
+    __tablename__ = "balance_snapshots"
+
+    account_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    taken_at = Column(CreatedAt, primary_key=True)
+    balance = Column(Numeric(12, 2), nullable=False)
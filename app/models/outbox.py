@@ -0,0 +1,27 @@
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from ..core.database import Base
+from .ledger import EntryId
+from .payment import CreatedAt
+
+
+class OutboxEvent(Base):
+    """Событие об изменении платежа, ожидающее доставки.
+
+    Пишется в транзакции, которая меняет платеж, и удаляется после
+    публикации. Порядок событий одного платежа задаёт ``id``.
+    """
+
+    __tablename__ = "outbox"
+    __table_args__ = (Index("ix_outbox_aggregate_id", "aggregate_id", "id"),)
+
+    id = Column(EntryId, primary_key=True, autoincrement=True)
+    aggregate_id = Column(UUID(as_uuid=True), nullable=False)
+    event_type = Column(String(32), nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(CreatedAt, server_default=func.now(), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Не раньше этого момента после неудачной публикации; NULL — сразу
+    available_at = Column(DateTime(timezone=True), nullable=True)
@@ -2,10 +2,11 @@ import uuid
 from enum import Enum as PyEnum
 from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, Numeric, String
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer, Numeric, String
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 
 from ..core.database import Base
 
@@ -19,8 +20,26 @@ class PaymentStatus(PyEnum):
     CANCELLED = "cancelled"
 
 
+# SQLite хранит CURRENT_TIMESTAMP без долей секунды; связанные параметры
+# должны быть в том же формате, иначе курсорная пагинация сравнивает строки неверно
+CreatedAt = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(truncate_microseconds=True), "sqlite"
+)
+
+
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_sender_created_id", "sender_id", "created_at", "id"),
+        Index("ix_payments_receiver_created_id", "receiver_id", "created_at", "id"),
+        # Только неподтверждённые платежи: индекс для очистки просроченных остаётся маленьким
+        Index(
+            "ix_payments_pending_created_at",
+            "created_at",
+            postgresql_where=text("status = 'CREATED'"),
+            sqlite_where=text("status = 'CREATED'"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -35,7 +54,7 @@ class Payment(Base):
         Enum(PaymentStatus), default=PaymentStatus.CREATED, nullable=False
     )
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(CreatedAt, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     paid_at = Column(DateTime(timezone=True), nullable=True)
 
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Enum, ForeignKey, Index, Integer, Numeric, String
+
+from ..core.database import Base
+from .ledger import EntryId
+from .payment import PaymentStatus
+
+SENT = "sent"
+RECEIVED = "received"
+
+
+class PaymentStat(Base):
+    """Число и сумма платежей пользователя по направлению, статусу и месяцу.
+
+    Месяц — ``YYYY-MM`` по времени создания платежа в UTC. Строки меняет
+    фоновое сворачивание ``PaymentStatDelta``; после смены статуса у прежнего
+    статуса может остаться строка с нулями.
+    """
+
+    __tablename__ = "payment_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    direction = Column(String(8), primary_key=True)
+    status: Column[PaymentStatus] = Column(Enum(PaymentStatus), primary_key=True)
+    month = Column(String(7), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class PaymentStatDelta(Base):
+    """Изменение агрегата ``payment_stats``, ещё не перенесённое в него.
+
+    Транзакция, которая создаёт платеж или меняет его статус, только
+    добавляет строки, поэтому параллельные платежи одного получателя не ждут
+    блокировку общей строки агрегата. Фоновая задача сворачивает их пачками.
+    """
+
+    __tablename__ = "payment_stat_deltas"
+    __table_args__ = (Index("ix_payment_stat_deltas_user_id", "user_id"),)
+
+    id = Column(EntryId, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    direction = Column(String(8), nullable=False)
+    status: Column[PaymentStatus] = Column(Enum(PaymentStatus), nullable=False)
+    month = Column(String(7), nullable=False)
+    count = Column(Integer, nullable=False)
+    amount = Column(Numeric(14, 2), nullable=False)
@@ -0,0 +1,64 @@
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
+from sqlalchemy.sql import func
+
+from ..core.database import Base
+from .ledger import EntryId
+from .payment import CreatedAt
+
+
+class WebhookEndpoint(Base):
+    """Адрес, на который пользователь получает события своих платежей"""
+
+    __tablename__ = "webhook_endpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    url = Column(String(2048), nullable=False)
+    secret = Column(String(64), nullable=False)
+    # Типы событий; NULL — все
+    event_types = Column(JSON, nullable=True)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(CreatedAt, server_default=func.now(), nullable=False)
+
+
+class WebhookDelivery(Base):
+    """Доставка события на endpoint, ожидающая отправки или повтора"""
+
+    __tablename__ = "webhook_deliveries"
+    __table_args__ = (Index("ix_webhook_deliveries_next_attempt", "next_attempt_at", "id"),)
+
+    id = Column(EntryId, primary_key=True, autoincrement=True)
+    endpoint_id = Column(Integer, ForeignKey("webhook_endpoints.id"), nullable=False)
+    event_id = Column(BigInteger, nullable=False)
+    event_type = Column(String(32), nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Срок следующей попытки; у захваченной доставки — окончание аренды
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(String(500), nullable=True)
+    created_at = Column(CreatedAt, server_default=func.now(), nullable=False)
+
+
+class WebhookDeadLetter(Base):
+    """Доставка, исчерпавшая попытки"""
+
+    __tablename__ = "webhook_dead_letters"
+
+    id = Column(EntryId, primary_key=True, autoincrement=True)
+    endpoint_id = Column(Integer, ForeignKey("webhook_endpoints.id"), nullable=False, index=True)
+    event_id = Column(BigInteger, nullable=False)
+    event_type = Column(String(32), nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(String(500), nullable=True)
+    failed_at = Column(CreatedAt, server_default=func.now(), nullable=False)
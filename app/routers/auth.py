@@ -1,57 +1,100 @@
-from typing import Annotated
+from datetime import datetime, timezone
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.security import HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..core.database import get_async_session
-from ..core.deps import get_current_user
+from ..core.database import get_async_session, replicas
+from ..core.deps import get_current_principal, get_current_user_for_read, get_read_session
+from ..core.principal import Principal
+from ..core.security import PasswordHasherOverloaded
 from ..models.user import User
-from ..schemas.user import TokenResponse, UserCreate, UserLogin, UserResponse
+from ..schemas.user import BalanceResponse, TokenResponse, UserCreate, UserLogin, UserResponse
 from ..services.auth_service import AuthService
+from ..services.balance_shard_service import BalanceShardService
+from ..services.ledger_service import LedgerService
+from ..utils.serialization import PydanticJSONResponse
 
-router = APIRouter()
+router = APIRouter(default_response_class=PydanticJSONResponse)
 security = HTTPBearer()
 
 
+def _overloaded_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервис перегружен, повторите попытку позже",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=TokenResponse)
 async def register(
     user_data: UserCreate, db: Annotated[AsyncSession, Depends(get_async_session)]
-) -> TokenResponse:
+) -> Response:
     """Регистрация нового пользователя"""
     auth_service = AuthService(db)
 
     try:
         user = await auth_service.create_user(user_data)
+        replicas.mark_write(int(user.id))
         token = auth_service.create_token(int(user.id))
 
-        return TokenResponse(access_token=token, user=UserResponse.model_validate(user))
+        return PydanticJSONResponse(
+            TokenResponse(access_token=token, user=UserResponse.model_validate(user))
+        )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PasswordHasherOverloaded:
+        raise _overloaded_exception()
 
 
 @router.post("/login", response_model=TokenResponse)
 async def login(
     credentials: UserLogin, db: Annotated[AsyncSession, Depends(get_async_session)]
-) -> TokenResponse:
+) -> Response:
     """Вход пользователя"""
     auth_service = AuthService(db)
 
-    user = await auth_service.authenticate_user(credentials.username, credentials.password)
+    try:
+        user = await auth_service.authenticate_user(credentials.username, credentials.password)
+    except PasswordHasherOverloaded:
+        raise _overloaded_exception()
 
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверные учетные данные"
         )
 
-    token = auth_service.create_token(user.id)
+    token = auth_service.create_token(int(user.id))
 
-    return TokenResponse(access_token=token, user=UserResponse.model_validate(user))
+    return PydanticJSONResponse(
+        TokenResponse(access_token=token, user=UserResponse.model_validate(user))
+    )
 
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user: Annotated[User, Depends(get_current_user)]
-) -> UserResponse:
+    current_user: Annotated[User, Depends(get_current_user_for_read)],
+    db: Annotated[AsyncSession, Depends(get_read_session)],
+) -> Response:
     """Получение информации о текущем пользователе"""
-    return UserResponse.model_validate(current_user)
+    response = UserResponse.model_validate(current_user)
+    response.balance = await BalanceShardService(db).available_balance(current_user)
+    return PydanticJSONResponse(response)
+
+
+@router.get("/me/balance", response_model=BalanceResponse)
+async def get_balance_as_of(
+    principal: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_async_session)],
+    at: Optional[datetime] = Query(None, description="Момент времени, по умолчанию сейчас"),
+) -> Response:
+    """Баланс текущего пользователя по журналу проводок на момент времени"""
+    if at is None:
+        at = datetime.now(timezone.utc)
+    elif at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+
+    balance = await LedgerService(db).balance_as_of(principal.id, at)
+    return PydanticJSONResponse(BalanceResponse(user_id=principal.id, balance=balance, as_of=at))
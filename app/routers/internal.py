@@ -0,0 +1,33 @@
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends, Request
+
+from ..core.database import engine, pool_status, replicas
+from ..core.deps import require_service_token
+from ..utils.logger import logging_stats
+
+router = APIRouter(dependencies=[Depends(require_service_token("internal_api_token"))])
+
+
+@router.get("/pool")
+async def get_pool_status() -> Dict[str, Any]:
+    """Состояние пула соединений с БД"""
+    return pool_status(engine)
+
+
+@router.get("/replicas")
+async def get_replicas_status() -> List[Dict[str, Any]]:
+    """Здоровье и отставание реплик для чтения"""
+    return replicas.status()
+
+
+@router.get("/logging")
+async def get_logging_status() -> Dict[str, int]:
+    """Состояние очереди логов"""
+    return logging_stats()
+
+
+@router.get("/startup")
+async def get_startup_timings(request: Request) -> Dict[str, Any]:
+    """Время импорта, сборки и прогрева при старте приложения"""
+    return dict(request.app.state.startup_timings)
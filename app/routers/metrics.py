@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from ..core.deps import require_service_token
+from ..core.metrics import registry
+
+router = APIRouter(dependencies=[Depends(require_service_token("metrics_token"))])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Метрики в текстовом формате Prometheus"""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -1,100 +1,304 @@
-from typing import Annotated, List
+from datetime import datetime
+from typing import Annotated, AsyncIterator, List, Literal, Optional, Tuple
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..core.config import settings
 from ..core.database import get_async_session
-from ..core.deps import get_current_user
-from ..models.user import User
-from ..schemas.payment import PaymentCreate, PaymentResponse
-from ..services.payment_service import PaymentService
+from ..core.deps import get_current_principal, get_read_session
+from ..core.http_cache import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    TERMINAL_STATUSES,
+    CachedPayment,
+    etag_matches,
+    page_etag,
+    payment_etag,
+    payment_response_cache,
+)
+from ..core.idempotency import request_fingerprint, run_idempotent
+from ..core.principal import Principal
+from ..models.payment import Payment
+from ..schemas.payment import (
+    PaymentBatchCreate,
+    PaymentBatchItemResult,
+    PaymentBatchResponse,
+    PaymentConfirmBatch,
+    PaymentCreate,
+    PaymentResponse,
+    PaymentStatsResponse,
+    dump_payment_rows,
+)
+from ..services.payment_service import PAYMENT_RESPONSE_COLUMNS, PaymentService
+from ..services.payment_stats_service import PaymentStatsService
+from ..utils.export import encode_csv, encode_ndjson
+from ..utils.pagination import decode_cursor, encode_cursor
+from ..utils.serialization import PydanticJSONResponse
 
-router = APIRouter()
+router = APIRouter(default_response_class=PydanticJSONResponse)
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+payment_adapter = TypeAdapter(PaymentResponse)
+
+IdempotencyKeyHeader = Annotated[
+    Optional[str], Header(alias="Idempotency-Key", min_length=1, max_length=255)
+]
+IfNoneMatchHeader = Annotated[Optional[str], Header(alias="If-None-Match")]
 
 
 @router.post("/", response_model=PaymentResponse)
 async def create_payment(
+    request: Request,
     payment_data: PaymentCreate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: Annotated[AsyncSession, Depends(get_async_session)],
-) -> PaymentResponse:
+    idempotency_key: IdempotencyKeyHeader = None,
+) -> Response:
     """Создание нового платежа"""
+
+    async def handler(session: AsyncSession) -> PaymentResponse:
+        try:
+            payment = await PaymentService(session).create_payment(payment_data, current_user.id)
+            return PaymentResponse.model_validate(payment)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return await run_idempotent(
+        db, current_user.id, idempotency_key, request_fingerprint(request, payment_data), handler
+    )
+
+
+def _batch_response(
+    outcomes: List[Tuple[Optional[Payment], Optional[str]]]
+) -> PaymentBatchResponse:
+    results = [
+        PaymentBatchItemResult(
+            index=index,
+            payment=PaymentResponse.model_validate(payment) if payment is not None else None,
+            error=error,
+        )
+        for index, (payment, error) in enumerate(outcomes)
+    ]
+    succeeded = sum(1 for result in results if result.payment is not None)
+    return PaymentBatchResponse(
+        results=results, succeeded=succeeded, failed=len(results) - succeeded
+    )
+
+
+@router.post("/batch", response_model=PaymentBatchResponse)
+async def create_payments_batch(
+    batch: PaymentBatchCreate,
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_async_session)],
+) -> Response:
+    """Создание пачки платежей"""
     payment_service = PaymentService(db)
 
     try:
-        payment = await payment_service.create_payment(payment_data, current_user.id)
-        return PaymentResponse.model_validate(payment)
+        outcomes = await payment_service.create_payments_batch(
+            batch.items, current_user.id, atomic=batch.atomic
+        )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+    result = _batch_response(outcomes)
+
+    if batch.atomic and result.failed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[item.model_dump(exclude={"payment"}) for item in result.results if item.error],
+        )
+
+    return PydanticJSONResponse(result)
+
 
 @router.get("/", response_model=List[PaymentResponse])
 async def get_payments(
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[AsyncSession, Depends(get_async_session)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_read_session)],
     limit: int = Query(default=50, le=100),
     offset: int = Query(default=0, ge=0),
-) -> List[PaymentResponse]:
+    cursor: Optional[str] = Query(default=None, description="Курсор из заголовка X-Next-Cursor"),
+    if_none_match: IfNoneMatchHeader = None,
+) -> Response:
     """Получение списка платежей пользователя"""
     payment_service = PaymentService(db)
 
-    payments = await payment_service.get_user_payments(current_user.id, limit=limit, offset=offset)
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    return [PaymentResponse.model_validate(payment) for payment in payments]
+    rows = await payment_service.get_user_payments(
+        current_user.id, limit=limit, offset=offset, cursor=position
+    )
 
+    headers = {"ETag": page_etag(rows), "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    if len(rows) == limit:
+        last = rows[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
 
-@router.put("/{payment_id}/confirm", response_model=PaymentResponse)
-async def confirm_payment(
-    payment_id: UUID,
-    current_user: Annotated[User, Depends(get_current_user)],
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return PydanticJSONResponse(dump_payment_rows(rows), headers=headers)
+
+
+@router.get("/export")
+async def export_payments(
+    request: Request,
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: Annotated[AsyncSession, Depends(get_async_session)],
-) -> PaymentResponse:
-    """Подтверждение платежа"""
+    export_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+    date_from: Optional[datetime] = Query(default=None, alias="from"),
+    date_to: Optional[datetime] = Query(default=None, alias="to"),
+) -> StreamingResponse:
+    """Потоковая выгрузка всей истории платежей пользователя в NDJSON или CSV"""
+    if date_from is not None and date_to is not None and date_from >= date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Начало периода должно быть раньше конца",
+        )
+
+    user_id = current_user.id
+    # Сессия из зависимости закрывается до отправки тела ответа,
+    # поэтому выгрузка открывает собственную на том же движке
+    bind = db.bind
+
+    async def body() -> AsyncIterator[bytes]:
+        async with AsyncSession(bind, expire_on_commit=False) as session:
+            batches = PaymentService(session).stream_user_payments(
+                user_id, date_from, date_to, batch_size=settings.payment_export_batch_size
+            )
+            if export_format == "csv":
+                chunks = encode_csv(batches, PAYMENT_RESPONSE_COLUMNS)
+            else:
+                chunks = encode_ndjson(batches, payment_adapter)
+            async for chunk in chunks:
+                if await request.is_disconnected():
+                    break
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="payments.{export_format}"'},
+    )
+
+
+@router.get("/stats", response_model=PaymentStatsResponse)
+async def get_payment_stats(
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_read_session)],
+    months: int = Query(default=12, ge=1, le=120, description="Сколько месяцев объёма вернуть"),
+) -> Response:
+    """Итоги платежей пользователя по направлениям, статусам и месяцам"""
+    stats = await PaymentStatsService(db).get_stats(current_user.id, months)
+    return PydanticJSONResponse(stats)
+
+
+@router.put("/confirm-batch", response_model=PaymentBatchResponse)
+async def confirm_payments_batch(
+    batch: PaymentConfirmBatch,
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_async_session)],
+) -> Response:
+    """Подтверждение пачки платежей"""
     payment_service = PaymentService(db)
 
     try:
-        payment = await payment_service.confirm_payment(payment_id, current_user.id)
-        return PaymentResponse.model_validate(payment)
+        outcomes = await payment_service.confirm_payments_batch(batch.payment_ids, current_user.id)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+    return PydanticJSONResponse(_batch_response(outcomes))
+
+
+@router.put("/{payment_id}/confirm", response_model=PaymentResponse)
+async def confirm_payment(
+    request: Request,
+    payment_id: UUID,
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_async_session)],
+    idempotency_key: IdempotencyKeyHeader = None,
+) -> Response:
+    """Подтверждение платежа"""
+
+    async def handler(session: AsyncSession) -> PaymentResponse:
+        try:
+            payment = await PaymentService(session).confirm_payment(payment_id, current_user.id)
+            return PaymentResponse.model_validate(payment)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return await run_idempotent(
+        db, current_user.id, idempotency_key, request_fingerprint(request), handler
+    )
+
 
 @router.put("/{payment_id}/cancel", response_model=PaymentResponse)
 async def cancel_payment(
+    request: Request,
     payment_id: UUID,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: Annotated[AsyncSession, Depends(get_async_session)],
-) -> PaymentResponse:
+    idempotency_key: IdempotencyKeyHeader = None,
+) -> Response:
     """Отмена платежа"""
-    payment_service = PaymentService(db)
 
-    try:
-        payment = await payment_service.cancel_payment(payment_id, current_user.id)
-        return PaymentResponse.model_validate(payment)
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    async def handler(session: AsyncSession) -> PaymentResponse:
+        try:
+            payment = await PaymentService(session).cancel_payment(payment_id, current_user.id)
+            return PaymentResponse.model_validate(payment)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return await run_idempotent(
+        db, current_user.id, idempotency_key, request_fingerprint(request), handler
+    )
 
 
 @router.get("/{payment_id}", response_model=PaymentResponse)
 async def get_payment(
     payment_id: UUID,
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[AsyncSession, Depends(get_async_session)],
-) -> PaymentResponse:
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_read_session)],
+    if_none_match: IfNoneMatchHeader = None,
+) -> Response:
     """Получение информации о конкретном платеже"""
-    payment_service = PaymentService(db)
+    cached = payment_response_cache.get(payment_id)
+    if cached is None:
+        payment_service = PaymentService(db)
+        try:
+            payment = await payment_service._get_payment_by_id(payment_id)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
-    try:
-        payment = await payment_service._get_payment_by_id(payment_id)
+        response = PaymentResponse.model_validate(payment)
+        cached = CachedPayment(
+            payment_etag(response.id, response.status, response.updated_at),
+            payment_adapter.dump_json(response),
+            response.sender_id,
+            response.receiver_id,
+        )
+        terminal = response.status in TERMINAL_STATUSES
+        if terminal:
+            payment_response_cache.set(payment_id, cached)
+    else:
+        terminal = True
 
-        if payment.sender_id != int(current_user.id) and payment.receiver_id != int(
-            current_user.id
-        ):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="У вас нет доступа к этому платежу"
-            )
+    if not cached.visible_to(int(current_user.id)):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="У вас нет доступа к этому платежу"
+        )
 
-        return PaymentResponse.model_validate(payment)
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if terminal else REVALIDATE_CACHE_CONTROL,
+    }
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return PydanticJSONResponse(cached.body, headers=headers)
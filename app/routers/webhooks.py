@@ -0,0 +1,52 @@
+from typing import Annotated, List
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.database import get_async_session
+from ..core.deps import get_current_principal
+from ..core.principal import Principal
+from ..schemas.webhook import WebhookEndpointCreate, WebhookEndpointCreated, WebhookEndpointResponse
+from ..services.webhook_service import WebhookService
+
+router = APIRouter()
+
+
+@router.post("/", response_model=WebhookEndpointCreated, status_code=status.HTTP_201_CREATED)
+async def create_webhook(
+    data: WebhookEndpointCreate,
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_async_session)],
+) -> WebhookEndpointCreated:
+    """Регистрация адреса для событий платежей пользователя"""
+    try:
+        endpoint = await WebhookService(db).create_endpoint(
+            current_user.id, str(data.url), data.event_types
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return WebhookEndpointCreated.model_validate(endpoint)
+
+
+@router.get("/", response_model=List[WebhookEndpointResponse])
+async def list_webhooks(
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_async_session)],
+) -> List[WebhookEndpointResponse]:
+    """Активные webhook пользователя"""
+    endpoints = await WebhookService(db).list_endpoints(current_user.id)
+    return [WebhookEndpointResponse.model_validate(endpoint) for endpoint in endpoints]
+
+
+@router.delete("/{endpoint_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_webhook(
+    endpoint_id: int,
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_async_session)],
+) -> Response:
+    """Отключение webhook и отмена его недоставленных событий"""
+    try:
+        await WebhookService(db).deactivate_endpoint(endpoint_id, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
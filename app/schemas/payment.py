@@ -1,10 +1,11 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import Any, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
 
+from ..core.config import settings
 from ..models.payment import PaymentStatus
 
 
@@ -48,8 +49,80 @@ class PaymentResponse(PaymentBase):
         from_attributes = True
 
 
+# Один проход валидации для всей страницы списка платежей
+payment_list_adapter = TypeAdapter(List[PaymentResponse])
+
+
+def dump_payment_rows(rows: Iterable[Any]) -> bytes:
+    """JSON страницы платежей из строк результата запроса.
+
+    Строки переводятся в словари: валидация словаря заметно быстрее, чем
+    чтение атрибутов ``Row`` через ``from_attributes``.
+    """
+    payments = payment_list_adapter.validate_python([row._asdict() for row in rows])
+    return payment_list_adapter.dump_json(payments)
+
+
+class StatTotals(BaseModel):
+    count: int = 0
+    amount: Decimal = Decimal("0")
+
+
+class DirectionStats(StatTotals):
+    by_status: Dict[PaymentStatus, StatTotals]
+
+
+class MonthlyVolume(BaseModel):
+    month: str = Field(..., description="Месяц создания платежей в UTC, YYYY-MM")
+    sent: StatTotals
+    received: StatTotals
+
+
+class PaymentStatsResponse(BaseModel):
+    sent: DirectionStats
+    received: DirectionStats
+    monthly: List[MonthlyVolume] = Field(
+        ..., description="Оплаченные платежи по месяцам, начиная с последнего"
+    )
+
+
 class PaymentListResponse(BaseModel):
     payments: List[PaymentResponse]
     total: int
     page: int
     per_page: int
+
+
+class PaymentBatchCreate(BaseModel):
+    items: List[PaymentCreate] = Field(..., min_length=1)
+    atomic: bool = Field(True, description="Создать все платежи или ни одного")
+
+    @field_validator("items")
+    @classmethod
+    def validate_batch_size(cls, v: List[PaymentCreate]) -> List[PaymentCreate]:
+        if len(v) > settings.payment_batch_max_items:
+            raise ValueError(f"Не больше {settings.payment_batch_max_items} платежей в пачке")
+        return v
+
+
+class PaymentConfirmBatch(BaseModel):
+    payment_ids: List[UUID] = Field(..., min_length=1)
+
+    @field_validator("payment_ids")
+    @classmethod
+    def validate_batch_size(cls, v: List[UUID]) -> List[UUID]:
+        if len(v) > settings.payment_batch_max_items:
+            raise ValueError(f"Не больше {settings.payment_batch_max_items} платежей в пачке")
+        return v
+
+
+class PaymentBatchItemResult(BaseModel):
+    index: int
+    payment: Optional[PaymentResponse] = None
+    error: Optional[str] = None
+
+
+class PaymentBatchResponse(BaseModel):
+    results: List[PaymentBatchItemResult]
+    succeeded: int
+    failed: int
@@ -33,3 +33,9 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
     user: UserResponse
+
+
+class BalanceResponse(BaseModel):
+    user_id: int
+    balance: Decimal
+    as_of: datetime
@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from pydantic import AnyHttpUrl, BaseModel, Field
+
+WebhookEventType = Literal["payment.created", "payment.paid", "payment.cancelled"]
+
+
+class WebhookEndpointCreate(BaseModel):
+    url: AnyHttpUrl = Field(..., description="Адрес для POST-запросов с событиями")
+    event_types: Optional[List[WebhookEventType]] = Field(
+        None, min_length=1, description="Типы событий; по умолчанию все"
+    )
+
+
+class WebhookEndpointResponse(BaseModel):
+    id: int
+    url: str
+    event_types: Optional[List[str]]
+    is_active: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class WebhookEndpointCreated(WebhookEndpointResponse):
+    secret: str = Field(..., description="Секрет подписи; показывается только при создании")
@@ -4,7 +4,8 @@ from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..core.security import create_access_token, get_password_hash, verify_password
+from ..core.principal import principal_cache
+from ..core.security import create_access_token, password_hasher
 from ..models.user import User
 from ..schemas.user import UserCreate
 
@@ -25,7 +26,7 @@ class AuthService:
         if existing_email:
             raise ValueError("Пользователь с таким email уже существует")
 
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await password_hasher.hash(user_data.password)
         db_user = User(
             email=user_data.email,
             username=user_data.username,
@@ -37,8 +38,9 @@ class AuthService:
         self.db.add(db_user)
         await self.db.commit()
         await self.db.refresh(db_user)
+        await principal_cache.invalidate([int(db_user.id)])
 
-        logger.info(f"Создан новый пользователь: {user_data.username}")
+        logger.info("Создан новый пользователь: %s", user_data.username)
         return db_user
 
     async def authenticate_user(self, username: str, password: str) -> Optional[User]:
@@ -47,10 +49,17 @@ class AuthService:
         if not user:
             return None
 
-        if not verify_password(password, str(user.hashed_password)):
+        valid, new_hash = await password_hasher.verify(password, str(user.hashed_password))
+        if not valid:
             return None
 
-        logger.info(f"Успешная аутентификация пользователя: {username}")
+        if new_hash is not None:
+            setattr(user, "hashed_password", new_hash)
+            await self.db.commit()
+            await principal_cache.invalidate([int(user.id)])
+            logger.info("Обновлен хеш пароля пользователя: %s", username)
+
+        logger.info("Успешная аутентификация пользователя: %s", username)
         return user
 
     async def get_user_by_username(self, username: str) -> Optional[User]:
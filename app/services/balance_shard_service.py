@@ -0,0 +1,155 @@
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from typing import AbstractSet, Any, Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.database import async_session_maker
+from ..models.balance_shard import BalanceShard
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceShardService:
+    """Шардированные балансы горячих счетов.
+
+    Зачисление блокирует только одну строку шарда, выбранную по хешу
+    платежа. Списание с горячего счёта сначала сворачивает шарды в
+    ``users.balance``: строка пользователя блокируется раньше шардов, а
+    шарды — по возрастанию номера, поэтому порядок блокировок везде один.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        accounts: Optional[AbstractSet[int]] = None,
+        shard_count: Optional[int] = None,
+    ) -> None:
+        self.db = db
+        self.accounts = settings.balance_shard_accounts if accounts is None else accounts
+        self.shard_count = shard_count or settings.balance_shard_count
+
+    def is_hot(self, user_id: Optional[int]) -> bool:
+        return user_id is not None and user_id in self.accounts
+
+    def shard_for(self, payment_id: UUID) -> int:
+        return payment_id.int % self.shard_count
+
+    async def credit(self, credits: Iterable[Tuple[int, Any, Any]]) -> Dict[int, Decimal]:
+        """Зачисление сумм (получатель, платеж, сумма) в шарды получателей.
+
+        Суммы для одного шарда сворачиваются в одно изменение. Возвращает
+        суммы по счетам, для которых строк шардов ещё нет: их нужно зачислить
+        в ``users.balance`` обычным образом.
+        """
+        deltas: Dict[Tuple[int, int], Decimal] = defaultdict(Decimal)
+        for user_id, payment_id, amount in credits:
+            deltas[(user_id, self.shard_for(payment_id))] += amount
+
+        missing: Dict[int, Decimal] = defaultdict(Decimal)
+        for (user_id, shard), amount in sorted(deltas.items()):
+            result = await self.db.execute(
+                update(BalanceShard)
+                .where(BalanceShard.user_id == user_id, BalanceShard.shard == shard)
+                .values(balance=BalanceShard.balance + amount)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                missing[user_id] += amount
+        return dict(missing)
+
+    async def fold(self, user_ids: Iterable[int]) -> None:
+        """Перенос шардов в ``users.balance``; строки пользователей уже заблокированы"""
+        ids = sorted(set(user_ids))
+        if not ids:
+            return
+
+        stmt = (
+            select(BalanceShard.user_id, BalanceShard.balance)
+            .where(BalanceShard.user_id.in_(ids))
+            .order_by(BalanceShard.user_id, BalanceShard.shard)
+        )
+        if self.db.get_bind().dialect.name != "sqlite":
+            stmt = stmt.with_for_update()
+        totals: Dict[int, Decimal] = defaultdict(Decimal)
+        for user_id, balance in await self.db.execute(stmt):
+            totals[user_id] += balance
+
+        for user_id, total in totals.items():
+            if total:
+                await self.db.execute(
+                    update(User)
+                    .where(User.id == user_id)
+                    .values(balance=User.balance + total)
+                    .execution_options(synchronize_session=False)
+                )
+        await self.db.execute(
+            update(BalanceShard)
+            .where(BalanceShard.user_id.in_(ids), BalanceShard.balance != 0)
+            .values(balance=0)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def available_balance(self, user: User) -> Decimal:
+        """Полный баланс пользователя с учётом шардов"""
+        balance: Decimal = user.balance  # type: ignore[assignment]
+        if not self.is_hot(int(user.id)):
+            return balance
+        result = await self.db.execute(
+            select(func.coalesce(func.sum(BalanceShard.balance), 0)).where(
+                BalanceShard.user_id == user.id
+            )
+        )
+        return balance + Decimal(result.scalar_one())
+
+    async def compact(self, user_id: int) -> None:
+        """Сворачивание шардов счёта и приведение их числа к ``shard_count``.
+
+        У счёта, исключённого из горячих, шарды сворачиваются и удаляются.
+        """
+        shard_count = self.shard_count if self.is_hot(user_id) else 0
+        lock = select(User.id).where(User.id == user_id)
+        if self.db.get_bind().dialect.name != "sqlite":
+            lock = lock.with_for_update()
+        if (await self.db.execute(lock)).scalar_one_or_none() is None:
+            await self.db.rollback()
+            return
+
+        await self.fold([user_id])
+        await self.db.execute(
+            delete(BalanceShard).where(
+                BalanceShard.user_id == user_id, BalanceShard.shard >= shard_count
+            )
+        )
+        existing = set(
+            (
+                await self.db.execute(
+                    select(BalanceShard.shard).where(BalanceShard.user_id == user_id)
+                )
+            ).scalars()
+        )
+        missing = [
+            {"user_id": user_id, "shard": shard, "balance": 0}
+            for shard in range(shard_count)
+            if shard not in existing
+        ]
+        if missing:
+            await self.db.execute(insert(BalanceShard), missing)
+        await self.db.commit()
+
+
+async def compact_balance_shards_job() -> None:
+    """Фоновое сворачивание шардов горячих счетов"""
+    async with async_session_maker() as session:
+        service = BalanceShardService(session)
+        sharded = await session.execute(select(BalanceShard.user_id).distinct())
+        accounts = sorted(set(service.accounts) | set(sharded.scalars()))
+        for user_id in accounts:
+            await service.compact(user_id)
+        if accounts:
+            logger.debug("Шарды балансов свернуты для %d счетов", len(accounts))
@@ -0,0 +1,305 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    Numeric,
+    and_,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.database import async_session_maker
+from ..models.balance_shard import BalanceShard
+from ..models.ledger import CREDIT, DEBIT, BalanceSnapshot, LedgerEntry
+from ..models.payment import CreatedAt
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Нижняя граница времени для счетов без снимка
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Порядок воспроизведения журнала, совпадает с индексом ix_ledger_entries_account_created_id
+REPLAY_KEY: Tuple[Any, ...] = (LedgerEntry.account_id, LedgerEntry.created_at, LedgerEntry.id)
+
+# (payment_id, sender_id, receiver_id, amount)
+PaymentMovement = Tuple[Any, Any, Any, Any]
+
+
+def payment_entries(movements: Iterable[PaymentMovement]) -> List[Dict[str, Any]]:
+    """Пара проводок (списание и зачисление) на каждый платеж"""
+    entries: List[Dict[str, Any]] = []
+    for payment_id, sender_id, receiver_id, amount in movements:
+        entries.append(
+            {"account_id": sender_id, "payment_id": payment_id, "side": DEBIT, "amount": -amount}
+        )
+        entries.append(
+            {"account_id": receiver_id, "payment_id": payment_id, "side": CREDIT, "amount": amount}
+        )
+    return entries
+
+
+def snapshot_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Момент, по который проводки считаются устоявшимися.
+
+    Проводка получает время начала своей транзакции, поэтому снимок
+    строится с отставанием: транзакции, начатые до границы, успевают
+    завершиться.
+    """
+    now = now or datetime.now(timezone.utc)
+    return now - timedelta(seconds=settings.ledger_snapshot_lag_seconds)
+
+
+class LedgerService:
+    """Журнал проводок и балансы, выведенные из него"""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def record_payments(self, movements: Iterable[PaymentMovement]) -> None:
+        """Запись проводок по платежам одним INSERT в текущей транзакции"""
+        entries = payment_entries(movements)
+        if entries:
+            # NULL счёта не выкидывает колонку: все строки уходят одним INSERT
+            await self.db.execute(insert(LedgerEntry).execution_options(render_nulls=True), entries)
+
+    async def balance_as_of(self, account_id: int, at: datetime) -> Decimal:
+        """Баланс счёта на момент ``at`` одним запросом.
+
+        Берётся последний снимок не позже ``at`` (поиск по первичному ключу)
+        и к нему прибавляется хвост проводок после снимка — диапазонное
+        чтение индекса (account_id, created_at, id).
+        """
+        snapshot = (
+            select(BalanceSnapshot.taken_at, BalanceSnapshot.balance)
+            .where(BalanceSnapshot.account_id == account_id, BalanceSnapshot.taken_at <= at)
+            .order_by(BalanceSnapshot.taken_at.desc())
+            .limit(1)
+            .cte("snapshot")
+        )
+        since = func.coalesce(
+            select(snapshot.c.taken_at).scalar_subquery(), literal(EPOCH, CreatedAt)
+        )
+        tail = select(func.coalesce(func.sum(LedgerEntry.amount), 0)).where(
+            LedgerEntry.account_id == account_id,
+            LedgerEntry.created_at > since,
+            LedgerEntry.created_at <= at,
+        )
+        balance = func.coalesce(select(snapshot.c.balance).scalar_subquery(), 0)
+        result = await self.db.execute(
+            select(cast(balance + tail.scalar_subquery(), Numeric(12, 2)))
+        )
+        return Decimal(result.scalar_one())
+
+    async def take_snapshots(self, cutoff: datetime) -> int:
+        """Снимки балансов на ``cutoff`` для счетов с новыми проводками.
+
+        Выполняется одним INSERT ... SELECT: к последнему снимку счёта
+        прибавляются проводки после него. Счета без движения не получают
+        новой строки — их прежний снимок остаётся актуальным.
+        """
+        latest = (
+            select(BalanceSnapshot.account_id, func.max(BalanceSnapshot.taken_at).label("taken_at"))
+            .group_by(BalanceSnapshot.account_id)
+            .subquery()
+        )
+        previous = (
+            select(BalanceSnapshot.account_id, BalanceSnapshot.taken_at, BalanceSnapshot.balance)
+            .join(
+                latest,
+                and_(
+                    BalanceSnapshot.account_id == latest.c.account_id,
+                    BalanceSnapshot.taken_at == latest.c.taken_at,
+                ),
+            )
+            .subquery()
+        )
+        tail = (
+            select(LedgerEntry.account_id, func.sum(LedgerEntry.amount).label("delta"))
+            .outerjoin(previous, previous.c.account_id == LedgerEntry.account_id)
+            .where(
+                LedgerEntry.account_id.is_not(None),
+                LedgerEntry.created_at <= cutoff,
+                or_(previous.c.taken_at.is_(None), LedgerEntry.created_at > previous.c.taken_at),
+            )
+            .group_by(LedgerEntry.account_id)
+            .subquery()
+        )
+        rows = select(
+            tail.c.account_id,
+            literal(cutoff, CreatedAt),
+            func.coalesce(previous.c.balance, 0) + tail.c.delta,
+        ).outerjoin(previous, previous.c.account_id == tail.c.account_id)
+
+        result = await self.db.execute(
+            insert(BalanceSnapshot).from_select(["account_id", "taken_at", "balance"], rows)
+        )
+        await self.db.commit()
+
+        if result.rowcount:
+            logger.info("Сохранено снимков балансов: %d", result.rowcount)
+        return int(result.rowcount)
+
+    async def rebuild(
+        self, chunk_size: int, cutoff: Optional[datetime] = None, dry_run: bool = False
+    ) -> Dict[str, int]:
+        """Пересчёт снимков и кеша ``users.balance`` воспроизведением журнала.
+
+        Проводки читаются пачками по ``chunk_size`` в порядке индекса
+        (account_id, created_at, id) с продолжением по ключу, поэтому память
+        не зависит от размера журнала. Каждый счёт получает один снимок на
+        ``cutoff`` и баланс по всем проводкам; пачка фиксируется отдельной
+        транзакцией, шарды горячих счетов обнуляются. Пользователи без
+        проводок получают нулевой баланс.
+        Запускать при остановленной записи платежей. С ``dry_run`` только
+        считает расхождения кеша с журналом.
+        """
+        cutoff = cutoff or snapshot_cutoff()
+        stats = {"entries": 0, "accounts": 0, "mismatched": 0}
+
+        last_key: Optional[Tuple[Any, ...]] = None
+        account_id: Optional[int] = None
+        settled = total = Decimal(0)
+        finished: List[Tuple[int, Decimal, Decimal]] = []
+
+        while True:
+            stmt = (
+                select(*REPLAY_KEY, LedgerEntry.amount)
+                .where(LedgerEntry.account_id.is_not(None))
+                .order_by(*REPLAY_KEY)
+                .limit(chunk_size)
+            )
+            if last_key is not None:
+                bound = (literal(value, key.type) for key, value in zip(REPLAY_KEY, last_key))
+                stmt = stmt.where(tuple_(*REPLAY_KEY) > tuple_(*bound))
+            rows = (await self.db.execute(stmt)).all()
+
+            for row in rows:
+                if row.account_id != account_id:
+                    if account_id is not None:
+                        finished.append((account_id, settled, total))
+                    account_id, settled, total = row.account_id, Decimal(0), Decimal(0)
+                total += row.amount
+                if _aware(row.created_at) <= cutoff:
+                    settled += row.amount
+            stats["entries"] += len(rows)
+
+            if len(rows) < chunk_size:
+                if account_id is not None:
+                    finished.append((account_id, settled, total))
+                await self._apply_rebuilt(finished, cutoff, stats, dry_run)
+                break
+
+            last_key = tuple(rows[-1][:3])
+            await self._apply_rebuilt(finished, cutoff, stats, dry_run)
+            finished = []
+
+        ledger_accounts = select(LedgerEntry.account_id).where(LedgerEntry.account_id.is_not(None))
+        orphaned = (User.id.not_in(ledger_accounts), _cached_balance() != 0)
+        if dry_run:
+            result = await self.db.execute(select(func.count()).select_from(User).where(*orphaned))
+            stats["mismatched"] += int(result.scalar_one())
+        else:
+            result = await self.db.execute(
+                update(User)
+                .where(*orphaned)
+                .values(balance=0)
+                .execution_options(synchronize_session=False)
+            )
+            stats["mismatched"] += int(result.rowcount)
+            await self.db.execute(
+                update(BalanceShard)
+                .where(BalanceShard.user_id.not_in(ledger_accounts))
+                .values(balance=0)
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+
+        logger.info(
+            "Журнал воспроизведён: проводок %d, счетов %d, расхождений кеша %d",
+            stats["entries"],
+            stats["accounts"],
+            stats["mismatched"],
+        )
+        return stats
+
+    async def _apply_rebuilt(
+        self,
+        accounts: List[Tuple[int, Decimal, Decimal]],
+        cutoff: datetime,
+        stats: Dict[str, int],
+        dry_run: bool,
+    ) -> None:
+        """Снимки и кеш балансов для полностью воспроизведённых счетов"""
+        if not accounts:
+            return
+        stats["accounts"] += len(accounts)
+        totals = {account_id: total for account_id, _, total in accounts}
+
+        result = await self.db.execute(
+            select(func.count())
+            .select_from(User)
+            .where(
+                User.id.in_(totals),
+                _cached_balance()
+                != case(*((User.id == key, value) for key, value in totals.items())),
+            )
+        )
+        stats["mismatched"] += int(result.scalar_one())
+        if dry_run:
+            return
+
+        await self.db.execute(delete(BalanceSnapshot).where(BalanceSnapshot.account_id.in_(totals)))
+        await self.db.execute(
+            insert(BalanceSnapshot),
+            [
+                {"account_id": account_id, "taken_at": cutoff, "balance": settled}
+                for account_id, settled, _ in accounts
+            ],
+        )
+        await self.db.execute(
+            update(User)
+            .where(User.id.in_(totals))
+            .values(balance=case(*((User.id == key, value) for key, value in totals.items())))
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.execute(
+            update(BalanceShard)
+            .where(BalanceShard.user_id.in_(totals))
+            .values(balance=0)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+
+
+def _cached_balance() -> Any:
+    """Кеш баланса пользователя вместе с шардами горячего счёта"""
+    shards = (
+        select(func.sum(BalanceShard.balance))
+        .where(BalanceShard.user_id == User.id)
+        .scalar_subquery()
+    )
+    return User.balance + func.coalesce(shards, 0)
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite возвращает время без часового пояса, оно хранится в UTC
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+async def take_snapshots_job() -> None:
+    """Фоновое создание снимков балансов"""
+    async with async_session_maker() as session:
+        await LedgerService(session).take_snapshots(snapshot_cutoff())
@@ -0,0 +1,136 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import delete, exists, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ..core.config import settings
+from ..core.database import async_session_maker
+from ..core.metrics import registry
+from ..core.outbox import Event, EventSink, event_sink
+from ..models.outbox import OutboxEvent
+from ..models.payment import Payment
+from .webhook_service import WebhookService
+
+logger = logging.getLogger(__name__)
+
+CENTS = Decimal("0.01")
+
+OUTBOX_PUBLISHED = registry.counter(
+    "outbox_events_published_total", "События outbox, переданные получателю"
+).labels()
+OUTBOX_FAILURES = registry.counter(
+    "outbox_publish_failures_total", "Неудачные публикации пачек событий outbox"
+).labels()
+
+
+def payment_event(payment: Payment) -> Dict[str, Any]:
+    """Строка outbox с текущим состоянием платежа; тип события — его статус"""
+    return {
+        "aggregate_id": payment.id,
+        "event_type": f"payment.{payment.status.value}",
+        "payload": {
+            "payment_id": str(payment.id),
+            "sender_id": payment.sender_id,
+            "receiver_id": payment.receiver_id,
+            "amount": str(Decimal(payment.amount).quantize(CENTS)),  # type: ignore[arg-type]
+            "status": payment.status.value,
+        },
+    }
+
+
+class OutboxService:
+    """Запись событий платежей в outbox и их доставка пачками"""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def record(self, payments: Iterable[Payment]) -> None:
+        """Событие о текущем статусе каждого платежа в транзакции изменения"""
+        rows = [payment_event(payment) for payment in payments]
+        if rows:
+            await self.db.execute(insert(OutboxEvent), rows)
+
+    async def dispatch(self, sink: EventSink, batch_size: int) -> int:
+        """Публикация одной пачки событий; возвращает число доставленных.
+
+        Строки захватываются ``FOR UPDATE SKIP LOCKED``, поэтому диспетчеры
+        на разных воркерах не делят одну пачку. Событие не берётся, пока у
+        его платежа есть более раннее недоставленное событие: так порядок по
+        платежу сохраняется и при нескольких диспетчерах, и после ошибок.
+        """
+        now = datetime.now(timezone.utc)
+        earlier = aliased(OutboxEvent)
+        result = await self.db.execute(
+            select(OutboxEvent)
+            .where(
+                or_(OutboxEvent.available_at.is_(None), OutboxEvent.available_at <= now),
+                ~exists().where(
+                    earlier.aggregate_id == OutboxEvent.aggregate_id, earlier.id < OutboxEvent.id
+                ),
+            )
+            .order_by(OutboxEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True, of=OutboxEvent)
+        )
+        rows = list(result.scalars().all())
+        if not rows:
+            await self.db.rollback()
+            return 0
+
+        ids = [row.id for row in rows]
+        events = [_envelope(row) for row in rows]
+        try:
+            await sink.publish(events)
+        except Exception as e:
+            await self._postpone(rows, now)
+            OUTBOX_FAILURES.inc()
+            logger.warning("Не удалось опубликовать %d событий outbox: %s", len(rows), e)
+            return 0
+
+        if settings.webhooks_enabled:
+            # В той же транзакции, что и удаление: повторная публикация пачки
+            # не создаст вторую доставку того же события
+            await WebhookService(self.db).enqueue(events)
+        await self.db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(ids)))
+        await self.db.commit()
+        OUTBOX_PUBLISHED.inc(len(rows))
+        return len(rows)
+
+    async def _postpone(self, rows: List[OutboxEvent], now: datetime) -> None:
+        """Повтор пачки позже с экспоненциальной задержкой по числу попыток"""
+        attempts = max(int(row.attempts) for row in rows)
+        delay = min(
+            settings.outbox_retry_base_seconds * 2**attempts, settings.outbox_retry_max_seconds
+        )
+        await self.db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_([row.id for row in rows]))
+            .values(attempts=OutboxEvent.attempts + 1, available_at=now + timedelta(seconds=delay))
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+
+
+def _envelope(row: OutboxEvent) -> Event:
+    return {
+        "id": row.id,
+        "type": row.event_type,
+        "aggregate_id": str(row.aggregate_id),
+        "occurred_at": row.created_at.isoformat() if row.created_at else None,
+        "data": row.payload,
+    }
+
+
+async def dispatch_outbox_job() -> None:
+    """Доставка outbox, пока есть полные пачки готовых событий"""
+    while True:
+        async with async_session_maker() as session:
+            delivered = await OutboxService(session).dispatch(
+                event_sink, settings.outbox_batch_size
+            )
+        if delivered < settings.outbox_batch_size:
+            return
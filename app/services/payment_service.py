@@ -1,17 +1,114 @@
 import logging
-from datetime import datetime
-from typing import List
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    NoReturn,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 from uuid import UUID
 
-from sqlalchemy import or_, select
+from sqlalchemy import (
+    Integer,
+    Numeric,
+    case,
+    column,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import Dialect, Row
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import Select, Update
 
+from ..core.config import settings
+from ..core.database import async_session_maker
+from ..core.metrics import payment_transitions_total, registry
+from ..core.principal import principal_cache
 from ..models.payment import Payment, PaymentStatus
 from ..models.user import User
 from ..schemas.payment import PaymentCreate
+from ..utils.pagination import Cursor
+from .balance_shard_service import BalanceShardService
+from .ledger_service import LedgerService
+from .outbox_service import OutboxService
+from .payment_stats_service import PaymentStatsService
 
 logger = logging.getLogger(__name__)
 
+# Столбцы платежа, из которых строится PaymentResponse
+PAYMENT_RESPONSE_COLUMNS = (
+    "id",
+    "sender_id",
+    "receiver_id",
+    "amount",
+    "description",
+    "card_last_four",
+    "card_holder_name",
+    "status",
+    "created_at",
+    "updated_at",
+    "paid_at",
+)
+
+CREATED_TRANSITIONS = payment_transitions_total.labels("new", PaymentStatus.CREATED.value)
+PAID_TRANSITIONS = payment_transitions_total.labels(
+    PaymentStatus.CREATED.value, PaymentStatus.PAID.value
+)
+CANCELLED_TRANSITIONS = payment_transitions_total.labels(
+    PaymentStatus.CREATED.value, PaymentStatus.CANCELLED.value
+)
+PAYMENTS_EXPIRED = registry.counter(
+    "payments_expired_total", "Платежи, отменённые по истечении срока подтверждения"
+).labels()
+EXPIRY_BATCH_DURATION = registry.histogram(
+    "payment_expiry_batch_duration_seconds", "Длительность транзакции одной пачки истечения"
+).labels()
+
+
+def balance_deltas_update(deltas: Dict[int, Decimal], dialect_name: str) -> Update:
+    """UPDATE балансов на суммы ``deltas`` с проверкой, что баланс не уходит в минус"""
+    if dialect_name == "postgresql":
+        # Массивы в двух параметрах: текст запроса не зависит от размера пачки,
+        # поэтому он берётся из кеша компиляции и prepared statements asyncpg
+        user_ids, amounts = zip(*sorted(deltas.items()))
+        changes = (
+            func.unnest(
+                literal(list(user_ids), ARRAY(Integer)),
+                literal(list(amounts), ARRAY(Numeric(10, 2))),
+            )
+            .table_valued(column("id", Integer), column("delta", Numeric(10, 2)))
+            .render_derived(name="deltas")
+        )
+        return (
+            update(User)
+            .where(User.id == changes.c.id, User.balance + changes.c.delta >= 0)
+            .values(balance=User.balance + changes.c.delta)
+        )
+
+    delta = case(*((User.id == user_id, amount) for user_id, amount in deltas.items()))
+    return (
+        update(User)
+        .where(User.id.in_(deltas), User.balance + delta >= 0)
+        .values(balance=User.balance + delta)
+    )
+
 
 class PaymentService:
     def __init__(self, db: AsyncSession) -> None:
@@ -20,97 +117,517 @@ class PaymentService:
     async def create_payment(self, payment_data: PaymentCreate, sender_id: int) -> Payment:
         """Создание нового платежа"""
         sender = await self._get_user_by_id(sender_id)
-        if sender.balance < payment_data.amount:
-            raise ValueError("Недостаточно средств на балансе")
 
+        known_receivers: Set[int] = set()
         if payment_data.receiver_id:
-            receiver = await self._get_user_by_id(payment_data.receiver_id)
-            if not receiver:
-                raise ValueError("Получатель не найден")
+            known_receivers = await self._existing_user_ids([payment_data.receiver_id])
 
-            if sender_id == payment_data.receiver_id:
-                raise ValueError("Нельзя переводить деньги самому себе")
+        available = await BalanceShardService(self.db).available_balance(sender)
+        error = self._validate_new_payment(payment_data, sender, available, known_receivers)
+        if error is not None:
+            raise ValueError(error)
 
-        payment = Payment(
-            sender_id=sender_id,
-            receiver_id=payment_data.receiver_id,
-            card_last_four=payment_data.card_last_four,
-            card_holder_name=payment_data.card_holder_name,
-            amount=payment_data.amount,
-            description=payment_data.description,
-            status=PaymentStatus.CREATED,
-        )
+        payment = Payment(**self._new_payment_values(payment_data, sender_id))
 
         self.db.add(payment)
+        await self.db.flush()
+        await PaymentStatsService(self.db).record_created([payment.id])
+        await OutboxService(self.db).record([payment])
         await self.db.commit()
         await self.db.refresh(payment)
+        CREATED_TRANSITIONS.inc()
 
         logger.info(
-            f"Создан платеж {payment.id} от пользователя {sender_id} на сумму {payment_data.amount}"
+            "Создан платеж %s от пользователя %s на сумму %s",
+            payment.id,
+            sender_id,
+            payment_data.amount,
         )
         return payment
 
+    async def create_payments_batch(
+        self, items: Sequence[PaymentCreate], sender_id: int, atomic: bool = True
+    ) -> List[Tuple[Optional[Payment], Optional[str]]]:
+        """Создание пачки платежей одним многострочным INSERT ... RETURNING.
+
+        Получатели проверяются одним запросом с IN. Возвращает пару
+        (платеж, ошибка) для каждого элемента в исходном порядке. При
+        ``atomic`` любая ошибка отменяет создание всей пачки.
+        """
+        sender = await self._get_user_by_id(sender_id)
+        known_receivers = await self._existing_user_ids(
+            [item.receiver_id for item in items if item.receiver_id]
+        )
+
+        available = await BalanceShardService(self.db).available_balance(sender)
+        errors = [
+            self._validate_new_payment(item, sender, available, known_receivers) for item in items
+        ]
+        valid = [i for i, error in enumerate(errors) if error is None]
+
+        if not valid or (atomic and len(valid) != len(items)):
+            return [(None, error) for error in errors]
+
+        result = await self.db.execute(
+            insert(Payment).returning(Payment, sort_by_parameter_order=True),
+            [self._new_payment_values(items[i], sender_id) for i in valid],
+        )
+        created = dict(zip(valid, result.scalars().all()))
+        await PaymentStatsService(self.db).record_created(
+            payment.id for payment in created.values()
+        )
+        await OutboxService(self.db).record(created.values())
+        await self.db.commit()
+        CREATED_TRANSITIONS.inc(len(created))
+
+        logger.info("Создано %d платежей пачкой от пользователя %s", len(created), sender_id)
+        return [(created.get(i), error) for i, error in enumerate(errors)]
+
+    def _validate_new_payment(
+        self,
+        payment_data: PaymentCreate,
+        sender: User,
+        available: Decimal,
+        known_receivers: Set[int],
+    ) -> Optional[str]:
+        """Проверка нового платежа; возвращает текст ошибки или None"""
+        if available < payment_data.amount:
+            return "Недостаточно средств на балансе"
+
+        if payment_data.receiver_id:
+            if payment_data.receiver_id not in known_receivers:
+                return "Получатель не найден"
+
+            if sender.id == payment_data.receiver_id:
+                return "Нельзя переводить деньги самому себе"
+
+        return None
+
+    def _new_payment_values(self, payment_data: PaymentCreate, sender_id: int) -> Dict[str, Any]:
+        return {
+            "sender_id": sender_id,
+            "receiver_id": payment_data.receiver_id,
+            "card_last_four": payment_data.card_last_four,
+            "card_holder_name": payment_data.card_holder_name,
+            "amount": payment_data.amount,
+            "description": payment_data.description,
+            "status": PaymentStatus.CREATED,
+        }
+
+    async def _existing_user_ids(self, user_ids: Iterable[int]) -> Set[int]:
+        """Какие из переданных ID пользователей существуют"""
+        ids = set(user_ids)
+        if not ids:
+            return set()
+        result = await self.db.execute(select(User.id).where(User.id.in_(ids)))
+        return set(result.scalars().all())
+
     async def confirm_payment(self, payment_id: UUID, user_id: int) -> Payment:
-        """Подтверждение платежа"""
-        payment = await self._get_payment_by_id(payment_id)
+        """Подтверждение платежа.
 
-        if int(payment.sender_id) != user_id:
-            raise ValueError("Вы можете подтверждать только свои платежи")
+        Выполняется в одной транзакции за два-три запроса: условный
+        UPDATE ... RETURNING статуса, блокировка строк пользователей в порядке
+        возрастания id и условное списание с проверкой баланса в самом UPDATE.
+        Проводки журнала пишутся в той же транзакции, ``users.balance``
+        остаётся кешем баланса для проверки средств. Зачисление на горячий
+        счёт уходит в один из его шардов и не блокирует строку получателя.
+        """
+        payment = await self._mark_paid(payment_id, user_id)
+        if payment is None:
+            await self.db.rollback()
+            await self._raise_not_processable(payment_id, user_id, "подтверждать")
 
-        if payment.status != PaymentStatus.CREATED:
-            raise ValueError(f"Платеж уже обработан, статус: {payment.status.value}")
+        sender_id = int(payment.sender_id)
+        receiver_id = int(payment.receiver_id) if payment.receiver_id is not None else None
 
-        sender = await self._get_user_by_id(int(payment.sender_id))
-        if sender.balance < payment.amount:
-            raise ValueError("Недостаточно средств на балансе")
+        shards = BalanceShardService(self.db)
+        sharded_credit = shards.is_hot(receiver_id)
+        direct_receiver = None if sharded_credit else receiver_id
 
-        sender.balance = sender.balance - payment.amount
+        if shards.is_hot(sender_id):
+            await self._lock_users([sender_id] + ([direct_receiver] if direct_receiver else []))
+            await shards.fold([sender_id])
+        elif direct_receiver is not None:
+            await self._lock_users([sender_id, direct_receiver])
 
-        if payment.receiver_id:
-            receiver = await self._get_user_by_id(payment.receiver_id)
-            receiver.balance = receiver.balance + payment.amount
+        if not await self._transfer(sender_id, direct_receiver, payment.amount):
+            await self.db.rollback()
+            raise ValueError("Недостаточно средств на балансе")
 
-        setattr(payment, "status", PaymentStatus.PAID)
-        setattr(payment, "paid_at", datetime.now())
+        if sharded_credit:
+            await self._credit_shards(shards, [(receiver_id, payment.id, payment.amount)])
 
+        await LedgerService(self.db).record_payments(
+            [(payment.id, sender_id, receiver_id, payment.amount)]
+        )
+        await PaymentStatsService(self.db).record_transition(
+            [payment.id], PaymentStatus.CREATED, PaymentStatus.PAID
+        )
+        await OutboxService(self.db).record([payment])
         await self.db.commit()
-        await self.db.refresh(payment)
+        PAID_TRANSITIONS.inc()
+        await principal_cache.invalidate([sender_id, receiver_id])
 
-        logger.info(f"Подтвержден платеж {payment_id}")
+        logger.info("Подтвержден платеж %s", payment_id)
         return payment
 
-    async def cancel_payment(self, payment_id: UUID, user_id: int) -> Payment:
-        """Отмена платежа"""
+    async def confirm_payments_batch(
+        self, payment_ids: Sequence[UUID], user_id: int
+    ) -> List[Tuple[Optional[Payment], Optional[str]]]:
+        """Подтверждение пачки платежей в одной транзакции.
+
+        Движения по счетам сворачиваются в одно изменение на пользователя,
+        поэтому каждая строка users обновляется ровно один раз. Строки
+        платежей и пользователей блокируются в порядке возрастания id.
+        Если отправителю не хватает средств на всю пачку, не подтверждается
+        ничего. Возвращает пару (платеж, ошибка) для каждого ID.
+        """
+        ids = list(dict.fromkeys(payment_ids))
+        result = await self.db.execute(
+            select(
+                Payment.id, Payment.sender_id, Payment.receiver_id, Payment.amount, Payment.status
+            )
+            .where(Payment.id.in_(ids))
+            .order_by(Payment.id)
+            .with_for_update()
+        )
+        rows = {row.id: row for row in result}
+
+        shards = BalanceShardService(self.db)
+        errors: Dict[UUID, str] = {}
+        deltas: Dict[int, Decimal] = defaultdict(Decimal)
+        shard_credits: List[Tuple[int, Any, Any]] = []
+        for payment_id in ids:
+            row = rows.get(payment_id)
+            if row is None:
+                errors[payment_id] = f"Платеж с ID {payment_id} не найден"
+            elif row.sender_id != user_id:
+                errors[payment_id] = "Вы можете подтверждать только свои платежи"
+            elif row.status != PaymentStatus.CREATED:
+                errors[payment_id] = f"Платеж уже обработан, статус: {row.status.value}"
+            else:
+                deltas[row.sender_id] -= row.amount
+                if shards.is_hot(row.receiver_id):
+                    shard_credits.append((row.receiver_id, row.id, row.amount))
+                elif row.receiver_id is not None:
+                    deltas[row.receiver_id] += row.amount
+
+        eligible = [payment_id for payment_id in ids if payment_id not in errors]
+        confirmed: Dict[UUID, Payment] = {}
+
+        if eligible:
+            await self._lock_users(list(deltas))
+            if shards.is_hot(user_id):
+                await shards.fold([user_id])
+
+            if not await self._apply_balance_deltas(deltas):
+                await self.db.rollback()
+                raise ValueError("Недостаточно средств на балансе")
+
+            result = await self.db.execute(
+                update(Payment)
+                .where(Payment.id.in_(eligible), Payment.status == PaymentStatus.CREATED)
+                .values(status=PaymentStatus.PAID, paid_at=func.now())
+                .returning(Payment)
+                .execution_options(synchronize_session=False)
+            )
+            confirmed = {payment.id: payment for payment in result.scalars().all()}
+            await self._credit_shards(shards, shard_credits)
+            await LedgerService(self.db).record_payments(
+                (payment.id, payment.sender_id, payment.receiver_id, payment.amount)
+                for payment in confirmed.values()
+            )
+            await PaymentStatsService(self.db).record_transition(
+                confirmed, PaymentStatus.CREATED, PaymentStatus.PAID
+            )
+            await OutboxService(self.db).record(confirmed.values())
+            await self.db.commit()
+            PAID_TRANSITIONS.inc(len(confirmed))
+            await principal_cache.invalidate([*deltas, *(credit[0] for credit in shard_credits)])
+
+            logger.info("Подтверждено %d платежей пачкой пользователем %s", len(confirmed), user_id)
+        else:
+            await self.db.rollback()
+
+        return [(confirmed.get(payment_id), errors.get(payment_id)) for payment_id in payment_ids]
+
+    async def _mark_paid(self, payment_id: UUID, user_id: int) -> Optional[Payment]:
+        """Перевод платежа в PAID, если он принадлежит пользователю и ещё не обработан"""
+        return await self._transition(
+            payment_id, user_id, status=PaymentStatus.PAID, paid_at=func.now()
+        )
+
+    async def _transition(self, payment_id: UUID, user_id: int, **values: Any) -> Optional[Payment]:
+        """Условный UPDATE платежа пользователя из CREATED.
+
+        Статус проверяется в самом UPDATE, а не по загруженному объекту: из
+        двух одновременных переходов (подтверждение, отмена, истечение срока)
+        строку изменит только первый. Возвращает платеж со свежими полями
+        или None, если он уже обработан или принадлежит другому пользователю.
+        """
+        stmt = (
+            update(Payment)
+            .where(
+                Payment.id == payment_id,
+                Payment.sender_id == user_id,
+                Payment.status == PaymentStatus.CREATED,
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+
+        if self._dialect.update_returning:
+            result = await self.db.execute(stmt.returning(Payment))
+            return result.scalar_one_or_none()
+
+        result = await self.db.execute(stmt)
+        if result.rowcount == 0:
+            return None
+        result = await self.db.execute(
+            select(Payment)
+            .where(Payment.id == payment_id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one()
+
+    async def _lock_users(self, user_ids: List[int]) -> None:
+        """Блокировка строк пользователей в порядке возрастания id против взаимоблокировок"""
+        if self._dialect.name == "sqlite":
+            return
+        await self.db.execute(
+            select(User.id)
+            .where(User.id.in_(sorted(set(user_ids))))
+            .order_by(User.id)
+            .with_for_update()
+        )
+
+    async def _transfer(self, sender_id: int, receiver_id: Optional[int], amount: Any) -> bool:
+        """Списание у отправителя и зачисление получателю одним условным UPDATE.
+
+        Возвращает False, если на балансе отправителя не хватает средств.
+        """
+        if receiver_id is None:
+            stmt = (
+                update(User)
+                .where(User.id == sender_id, User.balance >= amount)
+                .values(balance=User.balance - amount)
+            )
+            expected_rows = 1
+        else:
+            stmt = (
+                update(User)
+                .where(
+                    User.id.in_([sender_id, receiver_id]),
+                    or_(User.id != sender_id, User.balance >= amount),
+                )
+                .values(
+                    balance=case(
+                        (User.id == sender_id, User.balance - amount),
+                        else_=User.balance + amount,
+                    )
+                )
+            )
+            expected_rows = 2
+
+        result = await self.db.execute(stmt.execution_options(synchronize_session=False))
+        return bool(result.rowcount == expected_rows)
+
+    async def _apply_balance_deltas(self, deltas: Dict[int, Decimal]) -> bool:
+        """Применение свернутых изменений балансов одним UPDATE.
+
+        Ни один баланс не может уйти в минус: если условие не выполнено хотя
+        бы для одной строки, возвращается False и транзакцию нужно откатить.
+        """
+        stmt = balance_deltas_update(deltas, self._dialect.name)
+        result = await self.db.execute(stmt.execution_options(synchronize_session=False))
+        return bool(result.rowcount == len(deltas))
+
+    async def _credit_shards(
+        self, shards: BalanceShardService, credits: List[Tuple[int, Any, Any]]
+    ) -> None:
+        """Зачисление на горячие счета; без строк шардов — в ``users.balance``"""
+        missing = await shards.credit(credits)
+        if missing:
+            await self._apply_balance_deltas(missing)
+
+    async def _raise_not_processable(self, payment_id: UUID, user_id: int, action: str) -> NoReturn:
+        """Объяснение, почему платеж нельзя обработать"""
         payment = await self._get_payment_by_id(payment_id)
 
         if int(payment.sender_id) != user_id:
-            raise ValueError("Вы можете отменять только свои платежи")
+            raise ValueError(f"Вы можете {action} только свои платежи")
 
-        if payment.status != PaymentStatus.CREATED:
-            raise ValueError(f"Платеж уже обработан, статус: {payment.status.value}")
+        raise ValueError(f"Платеж уже обработан, статус: {payment.status.value}")
 
-        setattr(payment, "status", PaymentStatus.CANCELLED)
+    @property
+    def _dialect(self) -> Dialect:
+        return self.db.get_bind().dialect
+
+    async def cancel_payment(self, payment_id: UUID, user_id: int) -> Payment:
+        """Отмена платежа"""
+        payment = await self._transition(payment_id, user_id, status=PaymentStatus.CANCELLED)
+        if payment is None:
+            await self.db.rollback()
+            await self._raise_not_processable(payment_id, user_id, "отменять")
+
+        await PaymentStatsService(self.db).record_transition(
+            [payment.id], PaymentStatus.CREATED, PaymentStatus.CANCELLED
+        )
+        await OutboxService(self.db).record([payment])
 
         await self.db.commit()
-        await self.db.refresh(payment)
+        CANCELLED_TRANSITIONS.inc()
 
-        logger.info(f"Отменен платеж {payment_id}")
+        logger.info("Отменен платеж %s", payment_id)
         return payment
 
-    async def get_user_payments(
-        self, user_id: int, limit: int = 100, offset: int = 0
-    ) -> List[Payment]:
-        """Получение списка платежей пользователя"""
-        query = (
-            select(Payment)
-            .where(or_(Payment.sender_id == user_id, Payment.receiver_id == user_id))
-            .order_by(Payment.created_at.desc())
+    async def expire_stale_payments(self, cutoff: datetime, batch_size: int) -> int:
+        """Отмена платежей в статусе CREATED, созданных раньше ``cutoff``.
+
+        Каждая пачка — отдельная короткая транзакция не больше чем на
+        ``batch_size`` строк. Платежи, которые сейчас подтверждаются или
+        отменяются, пропускаются (``SKIP LOCKED``) и не ждут блокировку:
+        если они останутся в CREATED, их заберёт следующий проход.
+        """
+        total = 0
+        while True:
+            started = time.perf_counter()
+            stale = (
+                select(Payment.id)
+                .where(Payment.status == PaymentStatus.CREATED, Payment.created_at < cutoff)
+                .order_by(Payment.created_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            result = await self.db.execute(
+                update(Payment)
+                .where(Payment.id.in_(stale), Payment.status == PaymentStatus.CREATED)
+                .values(status=PaymentStatus.CANCELLED)
+                .returning(Payment)
+                .execution_options(synchronize_session=False)
+            )
+            expired = list(result.scalars().all())
+            if expired:
+                await PaymentStatsService(self.db).record_transition(
+                    [payment.id for payment in expired],
+                    PaymentStatus.CREATED,
+                    PaymentStatus.CANCELLED,
+                )
+                await OutboxService(self.db).record(expired)
+            await self.db.commit()
+            EXPIRY_BATCH_DURATION.observe(time.perf_counter() - started)
+
+            total += len(expired)
+            PAYMENTS_EXPIRED.inc(len(expired))
+            CANCELLED_TRANSITIONS.inc(len(expired))
+            if len(expired) < batch_size:
+                break
+
+        if total:
+            logger.info("Отменено просроченных платежей: %d", total)
+        return total
+
+    def user_payments_query(
+        self,
+        user_id: int,
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[Cursor] = None,
+    ) -> Select[Any]:
+        """Запрос страницы платежей пользователя (выбирает сущности Payment).
+
+        Исходящие и входящие платежи выбираются двумя сканами по индексам
+        (sender_id|receiver_id, created_at, id) и склеиваются через UNION ALL.
+        ``cursor`` продолжает выдачу после указанной позиции без OFFSET.
+        """
+        branch_limit = offset + limit
+
+        def branch(owner_column: Any) -> Any:
+            query = select(Payment).where(owner_column == user_id)
+            if cursor is not None:
+                created_at, payment_id = cursor
+                query = query.where(
+                    tuple_(Payment.created_at, Payment.id)
+                    < tuple_(
+                        literal(created_at, Payment.created_at.type),
+                        literal(payment_id, Payment.id.type),
+                    )
+                )
+            return (
+                query.order_by(Payment.created_at.desc(), Payment.id.desc())
+                .limit(branch_limit)
+                .subquery()
+            )
+
+        both = union_all(
+            select(branch(Payment.sender_id)), select(branch(Payment.receiver_id))
+        ).subquery()
+        page = aliased(Payment, both)
+        return (
+            select(page)
+            .order_by(page.created_at.desc(), page.id.desc())
             .offset(offset)
             .limit(limit)
         )
 
-        result = await self.db.execute(query)
-        return list(result.scalars().all())
+    async def get_user_payments(
+        self,
+        user_id: int,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[Cursor] = None,
+    ) -> List[Row[Any]]:
+        """Получение списка платежей пользователя.
+
+        Возвращает строки со столбцами ``PAYMENT_RESPONSE_COLUMNS`` без
+        создания ORM-объектов.
+        """
+        query = self.user_payments_query(user_id, limit, offset, cursor)
+        columns = query.selected_columns
+        result = await self.db.execute(
+            query.with_only_columns(*(columns[name] for name in PAYMENT_RESPONSE_COLUMNS))
+        )
+        return list(result.all())
+
+    async def stream_user_payments(
+        self,
+        user_id: int,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row[Any]]]:
+        """Вся история платежей пользователя пачками по ``batch_size`` строк.
+
+        Строки читаются через серверный курсор (``stream_results`` и
+        ``yield_per``), поэтому в памяти одновременно держится одна пачка.
+        Платежи упорядочены по (created_at, id); ``date_to`` не включается.
+        """
+
+        def branch(owner_column: Any) -> Any:
+            query = select(*(getattr(Payment, name) for name in PAYMENT_RESPONSE_COLUMNS)).where(
+                owner_column == user_id
+            )
+            if date_from is not None:
+                query = query.where(
+                    Payment.created_at >= literal(date_from, Payment.created_at.type)
+                )
+            if date_to is not None:
+                query = query.where(Payment.created_at < literal(date_to, Payment.created_at.type))
+            return query
+
+        both = union_all(branch(Payment.sender_id), branch(Payment.receiver_id)).subquery()
+        query = (
+            select(both)
+            .order_by(both.c.created_at, both.c.id)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+
+        result = await self.db.stream(query)
+        try:
+            async for partition in result.partitions():
+                yield partition
+        finally:
+            await result.close()
 
     async def _get_user_by_id(self, user_id: int) -> User:
         """Получение пользователя по ID"""
@@ -127,3 +644,12 @@ class PaymentService:
         if not payment:
             raise ValueError(f"Платеж с ID {payment_id} не найден")
         return payment
+
+
+async def expire_stale_payments_job() -> None:
+    """Фоновая отмена платежей, не подтверждённых за ``PAYMENT_TTL_SECONDS``"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.payment_ttl_seconds)
+    async with async_session_maker() as session:
+        await PaymentService(session).expire_stale_payments(
+            cutoff, settings.payment_expiry_batch_size
+        )
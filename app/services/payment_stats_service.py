@@ -0,0 +1,300 @@
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, cast, delete, func, insert, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.database import async_session_maker
+from ..models.payment import Payment, PaymentStatus
+from ..models.payment_stats import RECEIVED, SENT, PaymentStat, PaymentStatDelta
+from ..models.user import User
+from ..schemas.payment import DirectionStats, MonthlyVolume, PaymentStatsResponse, StatTotals
+
+logger = logging.getLogger(__name__)
+
+STAT_KEY = ("user_id", "direction", "status", "month")
+STAT_COLUMNS = (*STAT_KEY, "count", "amount")
+
+# Владелец строки агрегата для каждого направления
+OWNERS = ((SENT, Payment.sender_id), (RECEIVED, Payment.receiver_id))
+
+StatKey = Tuple[int, str, PaymentStatus, str]
+# UUID платежа; у ORM-объектов ``payment.id`` для mypy — Column
+PaymentId = Any
+
+
+def payment_month(dialect_name: str) -> Any:
+    """Месяц создания платежа в UTC строкой ``YYYY-MM``"""
+    if dialect_name == "postgresql":
+        return func.to_char(func.timezone("UTC", Payment.created_at), "YYYY-MM")
+    return func.strftime("%Y-%m", Payment.created_at)
+
+
+def recent_months(months: int, now: Optional[datetime] = None) -> List[str]:
+    """Последние ``months`` календарных месяцев по UTC, включая текущий, от новых к старым"""
+    now = now or datetime.now(timezone.utc)
+    current = now.year * 12 + now.month - 1
+    return [
+        f"{index // 12:04d}-{index % 12 + 1:02d}" for index in range(current, current - months, -1)
+    ]
+
+
+class PaymentStatsService:
+    """Агрегаты платежей пользователя в ``payment_stats``.
+
+    Транзакция, которая меняет платежи, только добавляет изменения в
+    ``payment_stat_deltas`` одним INSERT ... SELECT и не блокирует строки
+    агрегатов: подтверждения одного горячего получателя не выстраиваются в
+    очередь. ``fold`` переносит изменения в агрегаты пачками в фоне, а чтение
+    складывает агрегаты с ещё не перенесёнными изменениями.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def record_created(self, payment_ids: Iterable[PaymentId]) -> None:
+        """Учёт новых платежей; строки платежей уже записаны в транзакции"""
+        await self._apply(payment_ids, ((PaymentStatus.CREATED, 1),))
+
+    async def record_transition(
+        self, payment_ids: Iterable[PaymentId], previous: PaymentStatus, current: PaymentStatus
+    ) -> None:
+        """Перенос платежей из статуса ``previous`` в ``current``"""
+        await self._apply(payment_ids, ((previous, -1), (current, 1)))
+
+    async def get_stats(self, user_id: int, months: int) -> PaymentStatsResponse:
+        """Итоги по направлениям и статусам и оплаченный объём за ``months`` календарных месяцев"""
+        result = await self.db.execute(self._stored(user_id, user_id))
+        totals = {
+            direction: {status: StatTotals() for status in PaymentStatus}
+            for direction in (SENT, RECEIVED)
+        }
+        # Месяцы без платежей тоже попадают в ответ с нулями
+        monthly = {
+            month: {SENT: StatTotals(), RECEIVED: StatTotals()} for month in recent_months(months)
+        }
+        for _, direction, status, month, count, amount in result:
+            if not count:
+                continue
+            _add(totals[direction][status], count, amount)
+            if status == PaymentStatus.PAID and month in monthly:
+                _add(monthly[month][direction], count, amount)
+
+        def summary(by_status: Dict[PaymentStatus, StatTotals]) -> DirectionStats:
+            stats = DirectionStats(by_status=by_status)
+            for item in by_status.values():
+                _add(stats, item.count, item.amount)
+            return stats
+
+        return PaymentStatsResponse(
+            sent=summary(totals[SENT]),
+            received=summary(totals[RECEIVED]),
+            monthly=[MonthlyVolume(month=month, **volume) for month, volume in monthly.items()],
+        )
+
+    async def backfill(self, chunk_size: int) -> Dict[str, int]:
+        """Пересчёт агрегатов по таблице платежей порциями пользователей.
+
+        Каждая порция пересчитывается и фиксируется отдельной транзакцией;
+        повторный запуск безопасен.
+        """
+        stats = {"users": 0, "rows": 0}
+        async for ids in self._user_chunks(chunk_size):
+            first, last = ids[0], ids[-1]
+            for model in (PaymentStat, PaymentStatDelta):
+                await self.db.execute(delete(model).where(model.user_id.between(first, last)))
+            result = await self.db.execute(
+                self._upsert(self._recount(first, last), replace=True).execution_options(
+                    synchronize_session=False
+                )
+            )
+            await self.db.commit()
+            stats["users"] += len(ids)
+            stats["rows"] += max(result.rowcount, 0)
+
+        logger.info("Пересчитана статистика платежей: строк %d", stats["rows"])
+        return stats
+
+    async def check(self, chunk_size: int) -> List[int]:
+        """ID пользователей, чьи агрегаты расходятся с таблицей платежей"""
+        mismatched: List[int] = []
+        async for ids in self._user_chunks(chunk_size):
+            first, last = ids[0], ids[-1]
+            expected = await self._collect(self._recount(first, last))
+            stored = await self._collect(self._stored(first, last))
+            mismatched.extend(
+                sorted(
+                    {
+                        key[0]
+                        for key in expected.keys() | stored.keys()
+                        if expected.get(key) != stored.get(key)
+                    }
+                )
+            )
+        await self.db.rollback()
+
+        if mismatched:
+            logger.warning("Статистика платежей расходится у %d пользователей", len(mismatched))
+        return mismatched
+
+    async def _apply(
+        self, payment_ids: Iterable[PaymentId], changes: Sequence[Tuple[PaymentStatus, int]]
+    ) -> None:
+        ids = list(payment_ids)
+        if not ids:
+            return
+        selects = [
+            self._aggregate(direction, owner, status, sign).where(Payment.id.in_(ids))
+            for direction, owner in OWNERS
+            for status, sign in changes
+        ]
+        await self.db.execute(
+            insert(PaymentStatDelta).from_select(STAT_COLUMNS, union_all(*selects))
+        )
+
+    async def fold(self, batch_size: int) -> int:
+        """Перенос накопленных изменений в ``payment_stats`` пачками по ``batch_size``.
+
+        Каждая пачка — отдельная короткая транзакция: изменения выбираются
+        ``FOR UPDATE SKIP LOCKED``, суммируются по ключу агрегата, строки
+        агрегатов обновляются в порядке ключа. Возвращает число перенесённых
+        изменений.
+        """
+        total = 0
+        while True:
+            result = await self.db.execute(
+                select(PaymentStatDelta.id)
+                .order_by(PaymentStatDelta.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            ids = list(result.scalars())
+            if not ids:
+                await self.db.rollback()
+                break
+
+            columns = [getattr(PaymentStatDelta, name) for name in STAT_KEY]
+            rows = (
+                select(
+                    *columns,
+                    func.sum(PaymentStatDelta.count).label("count"),
+                    func.sum(PaymentStatDelta.amount).label("amount"),
+                )
+                .where(PaymentStatDelta.id.in_(ids))
+                .group_by(*columns)
+                .order_by(*columns)
+            )
+            await self.db.execute(self._upsert(rows).execution_options(synchronize_session=False))
+            await self.db.execute(delete(PaymentStatDelta).where(PaymentStatDelta.id.in_(ids)))
+            await self.db.commit()
+
+            total += len(ids)
+            if len(ids) < batch_size:
+                break
+
+        if total:
+            logger.debug("Перенесено изменений статистики платежей: %d", total)
+        return total
+
+    def _aggregate(
+        self, direction: str, owner: Any, status: Optional[PaymentStatus] = None, sign: int = 1
+    ) -> Any:
+        """Число и сумма платежей по владельцу и месяцу; без ``status`` — по статусам платежей"""
+        month = payment_month(self.db.get_bind().dialect.name)
+        status_column: Any = (
+            Payment.status
+            if status is None
+            else cast(literal(status, PaymentStat.status.type), PaymentStat.status.type)
+        )
+        count: Any = func.count()
+        amount: Any = func.sum(Payment.amount)
+        if sign < 0:
+            count, amount = -count, -amount
+        query = select(
+            owner.label("user_id"),
+            literal(direction, String).label("direction"),
+            status_column.label("status"),
+            month.label("month"),
+            count.label("count"),
+            amount.label("amount"),
+        ).where(owner.is_not(None))
+        if status is None:
+            return query.group_by(owner, Payment.status, month)
+        return query.group_by(owner, month)
+
+    def _recount(self, first: int, last: int) -> Any:
+        """Агрегаты пользователей с ID от ``first`` до ``last``, посчитанные по платежам"""
+        return union_all(
+            *(
+                self._aggregate(direction, owner).where(owner.between(first, last))
+                for direction, owner in OWNERS
+            )
+        ).order_by(*STAT_KEY)
+
+    def _stored(self, first: int, last: int) -> Any:
+        """Сохранённые агрегаты пользователей вместе с неперенесёнными изменениями"""
+        stored = union_all(
+            *(
+                select(*(getattr(model, name) for name in STAT_COLUMNS)).where(
+                    model.user_id.between(first, last)
+                )
+                for model in (PaymentStat, PaymentStatDelta)
+            )
+        ).subquery()
+        key = [stored.c[name] for name in STAT_KEY]
+        return select(
+            *key,
+            func.sum(stored.c.count).label("count"),
+            func.sum(stored.c.amount).label("amount"),
+        ).group_by(*key)
+
+    def _upsert(self, rows: Any, replace: bool = False) -> Any:
+        dialect_insert = (
+            postgresql.insert if self.db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        )
+        stmt = dialect_insert(PaymentStat).from_select(STAT_COLUMNS, rows)
+        values: Dict[str, Any]
+        if replace:
+            values = {"count": stmt.excluded.count, "amount": stmt.excluded.amount}
+        else:
+            values = {
+                "count": PaymentStat.count + stmt.excluded.count,
+                "amount": PaymentStat.amount + stmt.excluded.amount,
+            }
+        return stmt.on_conflict_do_update(index_elements=STAT_KEY, set_=values)
+
+    async def _user_chunks(self, chunk_size: int) -> AsyncIterator[Sequence[int]]:
+        """Порции ID пользователей по возрастанию"""
+        last = 0
+        while True:
+            result = await self.db.execute(
+                select(User.id).where(User.id > last).order_by(User.id).limit(chunk_size)
+            )
+            ids = result.scalars().all()
+            if not ids:
+                return
+            last = ids[-1]
+            yield ids
+
+    async def _collect(self, query: Any) -> Dict[StatKey, Tuple[int, Decimal]]:
+        result = await self.db.execute(query)
+        return {
+            (user_id, direction, status, month): (count, Decimal(amount).quantize(Decimal("0.01")))
+            for user_id, direction, status, month, count, amount in result
+            if count
+        }
+
+
+def _add(totals: StatTotals, count: int, amount: Any) -> None:
+    totals.count += count
+    totals.amount += amount
+
+
+async def fold_payment_stats_job() -> None:
+    """Фоновый перенос изменений статистики платежей в агрегаты"""
+    async with async_session_maker() as session:
+        await PaymentStatsService(session).fold(settings.payment_stats_fold_batch_size)
@@ -0,0 +1,111 @@
+"""Прогрев пула соединений и кеша скомпилированных запросов при старте.
+
+Без прогрева первые запросы после деплоя открывают соединения с БД и
+компилируют SQL горячих путей. Прогрев заранее открывает соединения пула и
+выполняет на каждом из них запросы чтения ``AuthService``/``PaymentService``
+с параметрами, которым ничего не соответствует, и запросы записи при
+подтверждении и отмене платежа в транзакции, которая откатывается: кеш
+ключей SQLAlchemy заполняется для тех же выражений, а у asyncpg готовятся
+prepared statements каждого соединения.
+"""
+
+import asyncio
+import logging
+import uuid
+from decimal import Decimal
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from ..core.database import InstrumentedPool
+from ..core.principal import principal_cache
+from ..models.payment import Payment, PaymentStatus
+from .auth_service import AuthService
+from .balance_shard_service import BalanceShardService
+from .ledger_service import LedgerService
+from .outbox_service import OutboxService
+from .payment_service import PaymentService
+from .payment_stats_service import PaymentStatsService
+
+logger = logging.getLogger(__name__)
+
+# Несуществующие значения: запросы прогрева ничего не находят и не кешируют
+_MISSING_USER_ID = 0
+_MISSING_NAME = "warmup@invalid"
+
+
+async def warm_statements(session: AsyncSession) -> None:
+    """Выполнение горячих запросов чтения и записи без изменения данных"""
+    auth = AuthService(session)
+    await auth.get_user_by_username(_MISSING_NAME)
+    await auth.get_user_by_email(_MISSING_NAME)
+    await principal_cache.get(session, _MISSING_USER_ID)
+
+    payments = PaymentService(session)
+    await payments.get_user_payments(_MISSING_USER_ID)
+    for lookup in (
+        payments._get_user_by_id(_MISSING_USER_ID),
+        payments._get_payment_by_id(uuid.uuid4()),
+    ):
+        try:
+            await lookup
+        except ValueError:
+            pass
+
+    # Запись: условные UPDATE не находят строк, вставки откатываются вместе с транзакцией
+    payment_id = uuid.uuid4()
+    await payments._mark_paid(payment_id, _MISSING_USER_ID)
+    await payments._transition(payment_id, _MISSING_USER_ID, status=PaymentStatus.CANCELLED)
+    # Подтверждение: списание при внешнем платеже и перевод пользователю
+    receiver_id = _MISSING_USER_ID - 1
+    await payments._lock_users([_MISSING_USER_ID, receiver_id])
+    await payments._transfer(_MISSING_USER_ID, None, Decimal(0))
+    await payments._transfer(_MISSING_USER_ID, receiver_id, Decimal(0))
+    await BalanceShardService(session).credit([(receiver_id, payment_id, Decimal(0))])
+    # Проводки на внешний счёт: NULL в ключах не нарушает внешних ключей
+    await LedgerService(session).record_payments([(None, None, None, Decimal(0))])
+    # Пакетное подтверждение
+    await payments._apply_balance_deltas({_MISSING_USER_ID: Decimal(0)})
+    stats = PaymentStatsService(session)
+    await stats.record_created([payment_id])
+    await stats.record_transition([payment_id], PaymentStatus.CREATED, PaymentStatus.PAID)
+    await stats.record_transition([payment_id], PaymentStatus.CREATED, PaymentStatus.CANCELLED)
+    await OutboxService(session).record(
+        [
+            Payment(
+                id=payment_id,
+                sender_id=_MISSING_USER_ID,
+                amount=Decimal(0),
+                status=PaymentStatus.PAID,
+            )
+        ]
+    )
+    await session.rollback()
+
+
+async def warm_pool(engine: AsyncEngine, connections: int) -> int:
+    """Открытие до ``connections`` соединений пула с прогревом запросов на каждом.
+
+    Соединения удерживаются до открытия последнего, иначе пул отдал бы одно
+    и то же соединение повторно. Больше размера пула не открывается: лишние
+    соединения закрылись бы при возврате. Возвращает число прогретых соединений.
+    """
+    pool = engine.pool
+    # Без настоящего пула (in-memory SQLite) соединение одно на всех
+    connections = min(connections, pool.size()) if isinstance(pool, InstrumentedPool) else 1
+    if connections <= 0:
+        return 0
+
+    barrier = asyncio.Barrier(connections)
+
+    async def warm_connection() -> None:
+        try:
+            async with engine.connect() as connection:
+                async with AsyncSession(bind=connection) as session:
+                    await warm_statements(session)
+                await barrier.wait()
+        except BaseException:
+            await barrier.abort()
+            raise
+
+    await asyncio.gather(*(warm_connection() for _ in range(connections)))
+    return connections
@@ -0,0 +1,221 @@
+"""Пул воркеров, отправляющий webhook-доставки.
+
+Питатель захватывает готовые доставки пачками и кладёт их в очередь в
+памяти; воркеры отправляют их через один ``httpx.AsyncClient`` с пулом
+keep-alive соединений. На один endpoint одновременно идёт не больше
+``endpoint_concurrency`` запросов: лишние доставки откладываются до
+завершения текущих и не занимают воркеров, поэтому медленный получатель
+не задерживает остальных. Результаты записываются в БД пачками.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List, Optional
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.database import async_session_maker
+from ..core.metrics import registry
+from ..core.webhooks import Delivery, PublicHTTPTransport, delivery_headers
+from .webhook_service import Outcome, WebhookService
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_DELIVERED = registry.counter(
+    "webhook_deliveries_succeeded_total", "Успешные webhook-доставки"
+).labels()
+WEBHOOK_FAILED = registry.counter(
+    "webhook_deliveries_failed_total", "Неудачные попытки webhook-доставки"
+).labels()
+WEBHOOK_DURATION = registry.histogram(
+    "webhook_delivery_duration_seconds", "Время отправки webhook-запроса"
+).labels()
+
+
+class WebhookEngine:
+    def __init__(
+        self,
+        workers: int,
+        endpoint_concurrency: int,
+        batch_size: int,
+        lease_seconds: float,
+        poll_interval: float,
+        max_connections: int,
+        timeout: float,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        session_maker: Callable[[], AsyncSession] = async_session_maker,
+    ) -> None:
+        self.workers = workers
+        self.endpoint_concurrency = endpoint_concurrency
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.transport = transport
+        self.session_maker = session_maker
+        self._client: Optional[httpx.AsyncClient] = None
+        self._queue: "asyncio.Queue[Delivery]" = asyncio.Queue()
+        self._in_flight: Dict[int, int] = defaultdict(int)
+        self._parked: Dict[int, Deque[Delivery]] = defaultdict(deque)
+        self._outcomes: List[Outcome] = []
+        # Захваченные доставки, результат которых ещё не записан
+        self._outstanding = 0
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._feeder: Optional["asyncio.Task[None]"] = None
+        self._stopping = asyncio.Event()
+
+    def start(self, feed: bool = True) -> None:
+        """Запуск воркеров и, если ``feed``, фонового захвата доставок"""
+        if self._tasks:
+            return
+        self._stopping.clear()
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            transport=self.transport or PublicHTTPTransport(limits),
+            # Перенаправление на внутренний адрес обошло бы проверку: 3xx — ошибка доставки.
+            # Прокси из окружения разрешал бы имена сам, мимо проверки
+            follow_redirects=False,
+            trust_env=False,
+        )
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"webhook-worker-{i}")
+            for i in range(self.workers)
+        ]
+        if feed:
+            self._feeder = asyncio.create_task(self._feed(), name="webhook-feeder")
+        logger.info("Webhook-доставка запущена: воркеров %d", self.workers)
+
+    async def stop(self) -> None:
+        """Остановка; незавершённые доставки вернутся в очередь по истечении аренды"""
+        if not self._tasks:
+            return
+        # Питатель завершает текущую итерацию сам: отмена посреди запроса к БД
+        # оставила бы соединение в неопределённом состоянии
+        self._stopping.set()
+        if self._feeder is not None:
+            await self._feeder
+            self._feeder = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._flush()
+        self._queue = asyncio.Queue()
+        self._in_flight.clear()
+        self._parked.clear()
+        self._outstanding = 0
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def run_once(self) -> int:
+        """Захват одной пачки, ожидание её отправки и запись результатов"""
+        claimed = await self._claim(self.batch_size)
+        await self._queue.join()
+        await self._flush()
+        return claimed
+
+    async def _feed(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                flushed = await self._flush()
+                claimed = 0
+                if self._outstanding < self.batch_size:
+                    claimed = await self._claim(self.batch_size - self._outstanding)
+            except Exception:
+                logger.exception("Ошибка захвата webhook-доставок")
+                flushed = claimed = 0
+            if not flushed and not claimed:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _claim(self, limit: int) -> int:
+        async with self.session_maker() as session:
+            deliveries = await WebhookService(session).claim(limit, self.lease_seconds)
+        self._outstanding += len(deliveries)
+        for delivery in deliveries:
+            self._queue.put_nowait(delivery)
+        return len(deliveries)
+
+    async def _flush(self) -> int:
+        outcomes, self._outcomes = self._outcomes, []
+        if not outcomes:
+            return 0
+        self._outstanding -= len(outcomes)
+        try:
+            async with self.session_maker() as session:
+                await WebhookService(session).record_outcomes(outcomes)
+        except Exception:
+            # Доставки останутся с арендой и будут отправлены повторно
+            logger.exception("Не удалось записать результаты %d webhook-доставок", len(outcomes))
+        return len(outcomes)
+
+    async def _worker(self) -> None:
+        while True:
+            delivery = await self._queue.get()
+            endpoint_id = delivery.endpoint_id
+            if self._in_flight[endpoint_id] >= self.endpoint_concurrency:
+                # Вернётся в очередь, когда завершится один из текущих запросов
+                self._parked[endpoint_id].append(delivery)
+                self._queue.task_done()
+                continue
+
+            self._in_flight[endpoint_id] += 1
+            try:
+                error = await self._send(delivery)
+                # Список читается после await: _flush мог заменить его во время отправки
+                self._outcomes.append((delivery, error))
+            finally:
+                self._in_flight[endpoint_id] -= 1
+                parked = self._parked.get(endpoint_id)
+                if parked:
+                    # До task_done, чтобы join() не завершился раньше отложенных
+                    self._queue.put_nowait(parked.popleft())
+                    if not parked:
+                        del self._parked[endpoint_id]
+                if not self._in_flight[endpoint_id]:
+                    del self._in_flight[endpoint_id]
+                self._queue.task_done()
+
+    async def _send(self, delivery: Delivery) -> Optional[str]:
+        assert self._client is not None
+        started = time.perf_counter()
+        try:
+            response = await self._client.post(
+                delivery.url,
+                content=delivery.body,
+                headers=delivery_headers(delivery, int(time.time())),
+            )
+        except Exception as e:
+            # Любая ошибка — неудачная попытка: воркер не должен завершаться
+            WEBHOOK_FAILED.inc()
+            return f"{type(e).__name__}: {e}"
+        finally:
+            WEBHOOK_DURATION.observe(time.perf_counter() - started)
+        if not response.is_success:
+            WEBHOOK_FAILED.inc()
+            return f"HTTP {response.status_code}"
+        WEBHOOK_DELIVERED.inc()
+        return None
+
+
+webhook_engine = WebhookEngine(
+    workers=settings.webhook_workers,
+    endpoint_concurrency=settings.webhook_endpoint_concurrency,
+    batch_size=settings.webhook_batch_size,
+    lease_seconds=settings.webhook_lease_seconds,
+    poll_interval=settings.webhook_poll_interval_seconds,
+    max_connections=settings.webhook_max_connections,
+    timeout=settings.webhook_timeout_seconds,
+)
@@ -0,0 +1,236 @@
+import json
+import logging
+import random
+import secrets
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.outbox import Event
+from ..core.webhooks import Delivery, check_url, retry_delay
+from ..models.webhook import WebhookDeadLetter, WebhookDelivery, WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+# Результат доставки: доставка и текст ошибки (None — успех)
+Outcome = Tuple[Delivery, Optional[str]]
+
+
+class WebhookService:
+    """Регистрации webhook и очередь доставок в БД"""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def create_endpoint(
+        self, user_id: int, url: str, event_types: Optional[Sequence[str]]
+    ) -> WebhookEndpoint:
+        """Регистрация endpoint с новым секретом подписи"""
+        await check_url(url)
+        result = await self.db.execute(
+            select(func.count())
+            .select_from(WebhookEndpoint)
+            .where(WebhookEndpoint.user_id == user_id, WebhookEndpoint.is_active.is_(True))
+        )
+        if result.scalar_one() >= settings.webhook_max_endpoints_per_user:
+            raise ValueError("Достигнуто максимальное число webhook")
+
+        endpoint = WebhookEndpoint(
+            user_id=user_id,
+            url=url,
+            secret=secrets.token_hex(32),
+            event_types=list(event_types) if event_types is not None else None,
+            is_active=True,
+        )
+        self.db.add(endpoint)
+        await self.db.commit()
+        await self.db.refresh(endpoint)
+
+        logger.info("Зарегистрирован webhook %s пользователя %s", endpoint.id, user_id)
+        return endpoint
+
+    async def list_endpoints(self, user_id: int) -> Sequence[WebhookEndpoint]:
+        result = await self.db.execute(
+            select(WebhookEndpoint)
+            .where(WebhookEndpoint.user_id == user_id, WebhookEndpoint.is_active.is_(True))
+            .order_by(WebhookEndpoint.id)
+        )
+        return result.scalars().all()
+
+    async def deactivate_endpoint(self, endpoint_id: int, user_id: int) -> None:
+        """Отключение endpoint; его недоставленные события отбрасываются"""
+        result = await self.db.execute(
+            update(WebhookEndpoint)
+            .where(
+                WebhookEndpoint.id == endpoint_id,
+                WebhookEndpoint.user_id == user_id,
+                WebhookEndpoint.is_active.is_(True),
+            )
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            raise ValueError(f"Webhook с ID {endpoint_id} не найден")
+        await self.db.execute(
+            delete(WebhookDelivery).where(WebhookDelivery.endpoint_id == endpoint_id)
+        )
+        await self.db.commit()
+
+    async def enqueue(self, events: Iterable[Event]) -> int:
+        """Доставки событий на endpoint отправителя и получателя платежа.
+
+        Вызывается диспетчером outbox в транзакции, которая удаляет
+        опубликованные события, поэтому каждое событие ставится в очередь
+        ровно один раз. Возвращает число созданных доставок.
+        """
+        events = list(events)
+        owners = {
+            user_id
+            for event in events
+            for user_id in (event["data"].get("sender_id"), event["data"].get("receiver_id"))
+            if user_id is not None
+        }
+        if not owners:
+            return 0
+
+        result = await self.db.execute(
+            select(WebhookEndpoint.id, WebhookEndpoint.user_id, WebhookEndpoint.event_types).where(
+                WebhookEndpoint.user_id.in_(owners), WebhookEndpoint.is_active.is_(True)
+            )
+        )
+        endpoints: Dict[int, List[Tuple[int, Optional[List[str]]]]] = defaultdict(list)
+        for endpoint_id, user_id, event_types in result:
+            endpoints[user_id].append((endpoint_id, event_types))
+
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "endpoint_id": endpoint_id,
+                "event_id": event["id"],
+                "event_type": event["type"],
+                "payload": event,
+                "attempts": 0,
+                "next_attempt_at": now,
+            }
+            for event in events
+            for user_id in dict.fromkeys(
+                (event["data"].get("sender_id"), event["data"].get("receiver_id"))
+            )
+            for endpoint_id, event_types in endpoints.get(user_id, ())
+            if event_types is None or event["type"] in event_types
+        ]
+        if rows:
+            await self.db.execute(insert(WebhookDelivery), rows)
+        return len(rows)
+
+    async def claim(self, limit: int, lease_seconds: float) -> List[Delivery]:
+        """Захват готовых доставок с арендой на ``lease_seconds``.
+
+        Строки выбираются ``FOR UPDATE SKIP LOCKED`` и сдвигаются на срок
+        аренды, поэтому другие процессы их не возьмут, пока идёт отправка.
+        Если процесс упал, доставки вернутся в очередь после аренды.
+        """
+        now = datetime.now(timezone.utc)
+        result = await self.db.execute(
+            select(
+                WebhookDelivery.id,
+                WebhookDelivery.endpoint_id,
+                WebhookDelivery.event_id,
+                WebhookDelivery.event_type,
+                WebhookDelivery.payload,
+                WebhookDelivery.attempts,
+                WebhookEndpoint.url,
+                WebhookEndpoint.secret,
+                WebhookEndpoint.is_active,
+            )
+            .join(WebhookEndpoint, WebhookEndpoint.id == WebhookDelivery.endpoint_id)
+            .where(WebhookDelivery.next_attempt_at <= now)
+            .order_by(WebhookDelivery.next_attempt_at, WebhookDelivery.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True, of=WebhookDelivery)
+        )
+        rows = result.all()
+        if not rows:
+            await self.db.rollback()
+            return []
+
+        inactive = [row.id for row in rows if not row.is_active]
+        claimed = [
+            Delivery(
+                id=row.id,
+                endpoint_id=row.endpoint_id,
+                url=row.url,
+                secret=row.secret,
+                event_id=row.event_id,
+                event_type=row.event_type,
+                body=json.dumps(row.payload, separators=(",", ":")).encode(),
+                attempts=row.attempts,
+            )
+            for row in rows
+            if row.is_active
+        ]
+        if inactive:
+            await self.db.execute(delete(WebhookDelivery).where(WebhookDelivery.id.in_(inactive)))
+        if claimed:
+            await self.db.execute(
+                update(WebhookDelivery)
+                .where(WebhookDelivery.id.in_([delivery.id for delivery in claimed]))
+                .values(next_attempt_at=now + timedelta(seconds=lease_seconds))
+                .execution_options(synchronize_session=False)
+            )
+        await self.db.commit()
+        return claimed
+
+    async def record_outcomes(
+        self, outcomes: Sequence[Outcome], rng: Optional[random.Random] = None
+    ) -> None:
+        """Удаление доставленных, перенос повторов и перевод исчерпавших попытки в dead letter"""
+        now = datetime.now(timezone.utc)
+        finished: List[int] = []
+        retries = []
+        dead_letters = []
+        for delivery, error in outcomes:
+            if error is None:
+                finished.append(delivery.id)
+                continue
+            attempts = delivery.attempts + 1
+            if attempts >= settings.webhook_max_attempts:
+                finished.append(delivery.id)
+                dead_letters.append(
+                    {
+                        "endpoint_id": delivery.endpoint_id,
+                        "event_id": delivery.event_id,
+                        "event_type": delivery.event_type,
+                        "payload": json.loads(delivery.body),
+                        "attempts": attempts,
+                        "last_error": error[:500],
+                    }
+                )
+                continue
+            delay = retry_delay(
+                attempts,
+                settings.webhook_retry_base_seconds,
+                settings.webhook_retry_max_seconds,
+                rng,
+            )
+            retries.append(
+                {
+                    "id": delivery.id,
+                    "attempts": attempts,
+                    "next_attempt_at": now + timedelta(seconds=delay),
+                    "last_error": error[:500],
+                }
+            )
+
+        if dead_letters:
+            await self.db.execute(insert(WebhookDeadLetter), dead_letters)
+            logger.warning("Webhook-доставки исчерпали попытки: %d", len(dead_letters))
+        if finished:
+            await self.db.execute(delete(WebhookDelivery).where(WebhookDelivery.id.in_(finished)))
+        if retries:
+            await self.db.execute(update(WebhookDelivery), retries)
+        await self.db.commit()
@@ -0,0 +1,130 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+MISSING: Any = object()
+
+
+def approximate_size(value: Any) -> int:
+    """Грубая оценка занимаемой памяти для простых структур"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item) for item in value)
+    return size
+
+
+class TTLCache(Generic[K, V]):
+    """LRU-кеш с временем жизни записей и ограничением по памяти.
+
+    Записи вытесняются по давности использования, когда превышено число
+    записей ``max_entries`` или оценка занятой памяти ``max_bytes``.
+    Время жизни задаётся на запись (``ttl`` в секундах) или по умолчанию.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        default_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = approximate_size,
+    ) -> None:
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[K, Tuple[V, Optional[float], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, MISSING, count=False) is not MISSING  # type: ignore[arg-type]
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: K, default: Any = None, count: bool = True) -> Any:
+        """Значение по ключу или ``default``, если записи нет или она истекла"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at, _ = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    if count:
+                        self.hits += 1
+                    return value
+                self._remove(key)
+                self.expirations += 1
+            if count:
+                self.misses += 1
+            return default
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        """Сохранение значения; ``ttl`` переопределяет время жизни по умолчанию"""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            self.pop(key)
+            return
+
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = self._sizeof(key) + self._sizeof(value) if self.max_bytes is not None else 0
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key: K, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key][0]
+            self._remove(key)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Счётчики попаданий, промахов и вытеснений"""
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: K) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, _, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
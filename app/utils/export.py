@@ -0,0 +1,46 @@
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Iterable, List, Sequence
+
+from pydantic import TypeAdapter
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def encode_ndjson(
+    batches: AsyncIterator[Sequence[Any]], adapter: TypeAdapter[Any]
+) -> AsyncIterator[bytes]:
+    """Строки результата в NDJSON: по одному JSON-объекту на строку, кусок на пачку"""
+    async for rows in batches:
+        yield b"".join(
+            adapter.dump_json(adapter.validate_python(row._asdict())) + b"\n" for row in rows
+        )
+
+
+async def encode_csv(
+    batches: AsyncIterator[Sequence[Any]], columns: Iterable[str]
+) -> AsyncIterator[bytes]:
+    """Строки результата в CSV с заголовком, кусок на пачку"""
+    header: List[str] = list(columns)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    async for rows in batches:
+        writer.writerows([_csv_value(row._mapping[name]) for name in header] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -1,19 +1,145 @@
+import atexit
+import itertools
+import json
 import logging
+import queue
 import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Mapping, Optional, TextIO
 
+from ..core.config import settings
+from ..core.metrics import Counter
 
-def setup_logging() -> None:
-    """Настройка логирования для приложения"""
+TEXT_FORMAT = "[%(asctime)s] %(levelname)s in %(name)s: %(message)s"
 
-    log_format = "[%(asctime)s] %(levelname)s in %(name)s: %(message)s"
+# Атрибуты LogRecord, которые не попадают в JSON как дополнительные поля
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format=log_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-        ],
-    )
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирование записи в одну строку JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS:
+                payload[name] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Обработчик, складывающий записи в ограниченную очередь.
+
+    Форматирование откладывается до потока ``QueueListener``. Если очередь
+    переполнена, запись отбрасывается и учитывается в счётчике ``dropped``.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = Counter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped.inc()
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self.queue.qsize(), "dropped": self.dropped.value}  # type: ignore
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю INFO/DEBUG записей выбранных логгеров.
+
+    ``rates`` сопоставляет имя логгера (или префикс пакета) доле записей
+    от 0 до 1. Предупреждения и ошибки проходят всегда.
+    """
+
+    def __init__(self, rates: Mapping[str, float]) -> None:
+        super().__init__()
+        self.rates = dict(rates)
+        self._counters: Dict[str, Iterator[int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        name = self._match(record.name)
+        if name is None:
+            return True
+        rate = self.rates[name]
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        counter = self._counters.setdefault(name, itertools.count())
+        return next(counter) % round(1 / rate) == 0
+
+    def _match(self, logger_name: str) -> Optional[str]:
+        while logger_name:
+            if logger_name in self.rates:
+                return logger_name
+            logger_name = logger_name.rpartition(".")[0]
+        return None
+
+
+def logging_stats() -> Dict[str, int]:
+    """Размер очереди логов и число отброшенных записей"""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return _queue_handler.stats()
+
+
+def shutdown_logging() -> None:
+    """Остановка фонового потока с записью оставшихся сообщений"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(output: Optional[TextIO] = None) -> None:
+    """Настройка логирования для приложения.
+
+    Записи попадают в ограниченную очередь и выводятся фоновым потоком
+    в ``output`` (по умолчанию stdout), поэтому event loop не блокируется
+    на записи.
+    """
+    global _listener, _queue_handler
+
+    shutdown_logging()
+
+    stream = logging.StreamHandler(output or sys.stdout)
+    if settings.log_format == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    if _queue_handler is not None:
+        root.removeHandler(_queue_handler)
+
+    _queue_handler = DroppingQueueHandler(settings.log_queue_size)
+    if settings.log_sampling:
+        _queue_handler.addFilter(SamplingFilter(settings.log_sampling))
+    _listener = QueueListener(_queue_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+    root.addHandler(_queue_handler)
+    root.setLevel(settings.log_level.upper())
 
     logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
     logging.getLogger("uvicorn.access").setLevel(logging.INFO)
@@ -22,3 +148,6 @@ def setup_logging() -> None:
     logger.setLevel(logging.INFO)
 
     logger.info("Система логирования инициализирована")
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,23 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+from uuid import UUID
+
+Cursor = Tuple[datetime, UUID]
+
+
+def encode_cursor(created_at: datetime, payment_id: UUID) -> str:
+    """Непрозрачный курсор на позицию (created_at, id)"""
+    raw = f"{created_at.isoformat()}|{payment_id.hex}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Разбор курсора, полученного от клиента"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, payment_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(hex=payment_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Некорректный курсор пагинации")
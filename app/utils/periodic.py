@@ -0,0 +1,26 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(
+    name: str, interval: float, job: Callable[[], Awaitable[object]]
+) -> None:
+    """Выполнение фоновой задачи с паузой ``interval`` секунд между запусками"""
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Фоновая задача %s завершилась с ошибкой", name)
+        await asyncio.sleep(interval)
+
+
+def start_periodic(
+    name: str, interval: float, job: Callable[[], Awaitable[object]]
+) -> "asyncio.Task[None]":
+    """Запуск периодической задачи в текущем event loop"""
+    return asyncio.create_task(run_periodically(name, interval, job), name=name)
@@ -0,0 +1,28 @@
+from typing import Any, Mapping, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+class PydanticJSONResponse(JSONResponse):
+    """JSON-ответ, который кодирует pydantic-core.
+
+    Модели, списки моделей, Decimal, UUID и datetime сериализуются за один
+    проход без ``jsonable_encoder``. Готовые байты передаются как есть.
+    Обработчик, возвращающий такой ответ, минует повторную валидацию
+    ``response_model`` в FastAPI.
+    """
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(content, status_code=status_code, headers=headers, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return to_json(content)
@@ -0,0 +1,59 @@
+"""Стоимость создания платежа: по одному против POST /payments/batch.
+
+Запуск::
+
+    python -m benchmarks.batch_create --payments 500 --batch-size 100
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict
+
+from .common import fund_users, local_database, make_client, register_users
+
+
+async def run(payments: int, batch_size: int) -> Dict[str, Any]:
+    async with local_database() as engine:
+        async with make_client() as client:
+            sender, receiver = await register_users(client, 2)
+            await fund_users(engine)
+            headers = {"Authorization": f"Bearer {sender['token']}"}
+            item = {"amount": "1.00", "receiver_id": int(receiver["id"])}
+
+            started = time.perf_counter()
+            for _ in range(payments):
+                response = await client.post("/payments/", json=item, headers=headers)
+                response.raise_for_status()
+            single = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for _ in range(0, payments, batch_size):
+                response = await client.post(
+                    "/payments/batch", json={"items": [item] * batch_size}, headers=headers
+                )
+                response.raise_for_status()
+            batched = time.perf_counter() - started
+
+    return {
+        "payments": payments,
+        "batch_size": batch_size,
+        "single_ms_per_payment": single / payments * 1000,
+        "batch_ms_per_payment": batched / payments * 1000,
+        "speedup": single / batched if batched else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.payments, args.batch_size))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
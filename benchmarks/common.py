@@ -0,0 +1,110 @@
+"""Общие помощники для бенчмарков: локальная БД и статистика задержек"""
+
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Dict, List, Optional, Sequence
+
+import httpx
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.config import Settings, settings
+from app.core.database import Base, build_engine, get_async_session
+from app.main import app
+from app.models.user import User
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Перцентиль по методу ближайшего ранга"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Сводка задержек в миллисекундах"""
+    return {
+        "count": float(len(samples)),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": (max(samples) if samples else 0.0) * 1000,
+    }
+
+
+@asynccontextmanager
+async def local_database(
+    url: Optional[str] = None, config: Optional[Settings] = None
+) -> AsyncGenerator[AsyncEngine, None]:
+    """Поднимает схему на локальной БД и подменяет сессию приложения.
+
+    Без ``url`` используется временный файл SQLite, ``config`` задаёт параметры пула.
+    """
+    tmp_path = None
+    if url is None:
+        fd, tmp_path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        url = f"sqlite+aiosqlite:///{tmp_path}"
+
+    engine = build_engine(url, config) if config is not None else build_engine(url)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
+        async with session_maker() as session:
+            yield session
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    app.dependency_overrides[get_async_session] = override_get_async_session
+    # Все виртуальные пользователи приходят с одного адреса
+    rate_limit_enabled, settings.rate_limit_enabled = settings.rate_limit_enabled, False
+    try:
+        yield engine
+    finally:
+        settings.rate_limit_enabled = rate_limit_enabled
+        app.dependency_overrides.pop(get_async_session, None)
+        await engine.dispose()
+        if tmp_path is not None:
+            os.unlink(tmp_path)
+
+
+def make_client(base_url: str = "http://bench") -> httpx.AsyncClient:
+    """Клиент, который ходит в приложение напрямую через ASGI"""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=base_url)
+
+
+async def register_users(
+    client: httpx.AsyncClient, count: int, prefix: str = "bench"
+) -> List[Dict[str, str]]:
+    """Регистрирует пользователей и возвращает их учетные данные и токены"""
+    users = []
+    for i in range(count):
+        credentials = {
+            "email": f"{prefix}{i}@example.com",
+            "username": f"{prefix}user{i}",
+            "password": "password123",
+            "full_name": f"Bench User {i}",
+        }
+        response = await client.post("/auth/register", json=credentials)
+        response.raise_for_status()
+        body = response.json()
+        users.append(
+            {
+                "id": str(body["user"]["id"]),
+                "username": credentials["username"],
+                "password": credentials["password"],
+                "token": body["access_token"],
+            }
+        )
+    return users
+
+
+async def fund_users(engine: AsyncEngine, amount: float = 1_000_000.00) -> None:
+    """Пополняет баланс всех пользователей"""
+    async with engine.begin() as conn:
+        await conn.execute(update(User).values(balance=amount))
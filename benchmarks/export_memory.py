@@ -0,0 +1,118 @@
+"""Пиковая память потоковой выгрузки истории платежей в зависимости от её размера.
+
+Для каждого размера истории приложение вызывается напрямую по ASGI, а куски
+ответа отбрасываются по мере отправки (httpx.ASGITransport собирает тело
+целиком и исказил бы замер). Пик памяти считается через ``tracemalloc``;
+при потоковой выгрузке он не должен расти вместе с числом платежей.
+
+Запуск::
+
+    python -m benchmarks.export_memory --sizes 1000,10000,50000 --format csv
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy import insert
+
+from app.main import app
+from app.models.payment import Payment, PaymentStatus
+
+from .common import local_database, make_client, register_users
+
+
+async def stream_export(token: str, export_format: str) -> Tuple[int, int]:
+    """Вызов выгрузки по ASGI; возвращает статус и число байт тела"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/payments/export",
+        "raw_path": b"/payments/export",
+        "query_string": f"format={export_format}".encode(),
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    finished = asyncio.Event()
+    status = 0
+    received = 0
+
+    async def receive() -> Dict[str, Any]:
+        if finished.is_set():
+            return {"type": "http.disconnect"}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status, received
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    return status, received
+
+
+async def run_size(rows: int, export_format: str) -> Dict[str, Any]:
+    async with local_database() as engine:
+        async with make_client() as client:
+            (user,) = await register_users(client, 1, prefix=f"export{rows}_")
+            async with engine.begin() as conn:
+                for start in range(0, rows, 5000):
+                    await conn.execute(
+                        insert(Payment),
+                        [
+                            {
+                                "sender_id": int(user["id"]),
+                                "amount": "1.00",
+                                "status": PaymentStatus.CREATED,
+                            }
+                            for _ in range(start, min(rows, start + 5000))
+                        ],
+                    )
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            status, received = await stream_export(user["token"], export_format)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    return {
+        "rows": rows,
+        "format": export_format,
+        "status": status,
+        "bytes": received,
+        "seconds": elapsed,
+        "peak_memory_kib": peak / 1024,
+    }
+
+
+async def run(sizes: Sequence[int], export_format: str) -> List[Dict[str, Any]]:
+    return [await run_size(size, export_format) for size in sizes]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    result = asyncio.run(run(sizes, args.format))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Пропускная способность подтверждений платежей на один горячий счёт.
+
+Отправители параллельно подтверждают платежи одному получателю: сначала
+с зачислением в ``users.balance``, затем с шардированным балансом
+получателя. Эффект заметен на PostgreSQL, где зачисления ждут блокировку
+строки; SQLite сериализует все записи целиком.
+
+Запуск::
+
+    python -m benchmarks.hot_account --database-url postgresql+asyncpg://... --senders 32
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.config import settings
+from app.models.user import User
+from app.services.balance_shard_service import BalanceShardService
+
+from .common import fund_users, local_database, make_client, register_users, summarize
+
+
+async def _confirm_all(
+    client: httpx.AsyncClient, sender: Dict[str, str], receiver_id: int, payments: int
+) -> List[float]:
+    headers = {"Authorization": f"Bearer {sender['token']}"}
+    item = {"amount": "1.00", "receiver_id": receiver_id}
+    response = await client.post(
+        "/payments/batch", json={"items": [item] * payments}, headers=headers
+    )
+    response.raise_for_status()
+
+    latencies = []
+    for result in response.json()["results"]:
+        started = time.perf_counter()
+        confirmed = await client.put(
+            f"/payments/{result['payment']['id']}/confirm", headers=headers
+        )
+        confirmed.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def _round(engine: AsyncEngine, senders: int, payments: int, shards: int) -> Dict[str, Any]:
+    async with make_client() as client:
+        users = await register_users(client, senders + 1, prefix=f"hot{shards}")
+        await fund_users(engine)
+        receiver_id = int(users[0]["id"])
+
+        settings.balance_shard_accounts = {receiver_id} if shards else set()
+        if shards:
+            async with AsyncSession(engine) as session:
+                await BalanceShardService(session, shard_count=shards).compact(receiver_id)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(_confirm_all(client, sender, receiver_id, payments) for sender in users[1:])
+        )
+        elapsed = time.perf_counter() - started
+
+        async with AsyncSession(engine) as session:
+            receiver = await session.get(User, receiver_id)
+            assert receiver is not None
+            received = await BalanceShardService(session).available_balance(receiver)
+
+    latencies = [latency for sender_latencies in results for latency in sender_latencies]
+    return {
+        "shards": shards,
+        "confirms": len(latencies),
+        "receiver_balance_matches": received == 1_000_000 + len(latencies),
+        "throughput_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        **summarize(latencies),
+    }
+
+
+async def run(senders: int, payments: int, shards: int, url: Optional[str]) -> Dict[str, Any]:
+    previous = settings.balance_shard_accounts, settings.balance_shard_count
+    settings.balance_shard_count = shards
+    try:
+        async with local_database(url) as engine:
+            before = await _round(engine, senders, payments, 0)
+        async with local_database(url) as engine:
+            after = await _round(engine, senders, payments, shards)
+    finally:
+        settings.balance_shard_accounts, settings.balance_shard_count = previous
+
+    return {
+        "senders": senders,
+        "payments_per_sender": payments,
+        "database": url,
+        "single_row": before,
+        "sharded": after,
+        "speedup": (
+            after["throughput_per_s"] / before["throughput_per_s"]
+            if before["throughput_per_s"]
+            else 0.0
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--senders", type=int, default=16)
+    parser.add_argument("--payments", type=int, default=20, help="Платежей на отправителя")
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.senders, args.payments, args.shards, args.database_url))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Нагрузочный прогон API смешанными сценариями.
+
+Виртуальные пользователи (``--concurrency``) в течение ``--duration`` секунд
+выбирают сценарии по весам: вход, создание и подтверждение платежа,
+создание и отмена, постраничный список, получение платежа по ID. Для каждого
+эндпоинта считаются пропускная способность и p50/p95/p99. Отчёт
+сохраняется в JSON; с ``--baseline`` он сравнивается с прошлым прогоном,
+и при регрессии больше ``--max-regression`` команда завершается с кодом 1.
+
+Запуск::
+
+    python -m benchmarks.load --concurrency 16 --duration 30 --output load.json
+    python -m benchmarks.load --baseline load.json --output load-new.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from .common import fund_users, local_database, make_client, register_users, summarize
+
+SCENARIO_WEIGHTS: Dict[str, int] = {
+    "login": 1,
+    "create_confirm": 3,
+    "create_cancel": 1,
+    "list_paginated": 3,
+    "get_by_id": 2,
+}
+
+
+class Recorder:
+    """Задержки и ошибки по эндпоинтам"""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(
+        self, endpoint: str, request: Callable[[], Awaitable[httpx.Response]]
+    ) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await request()
+        except httpx.HTTPError:
+            self.errors[endpoint] += 1
+            return None
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(elapsed)
+        return response
+
+
+class VirtualUser:
+    """Пользователь, выполняющий сценарии от своего имени"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        recorder: Recorder,
+        credentials: Dict[str, str],
+        receiver_id: int,
+        rng: random.Random,
+    ) -> None:
+        self.client = client
+        self.recorder = recorder
+        self.credentials = credentials
+        self.receiver_id = receiver_id
+        self.rng = rng
+        self.headers = {"Authorization": f"Bearer {credentials['token']}"}
+        self.payment_ids: List[str] = []
+
+    async def run(self, deadline: float) -> None:
+        names = list(SCENARIO_WEIGHTS)
+        weights = list(SCENARIO_WEIGHTS.values())
+        while time.perf_counter() < deadline:
+            scenario = self.rng.choices(names, weights)[0]
+            await getattr(self, scenario)()
+
+    async def login(self) -> None:
+        response = await self.recorder.call(
+            "POST /auth/login",
+            lambda: self.client.post(
+                "/auth/login",
+                json={
+                    "username": self.credentials["username"],
+                    "password": self.credentials["password"],
+                },
+            ),
+        )
+        if response is not None:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def _create(self) -> Optional[str]:
+        item = {"amount": "1.00", "receiver_id": self.receiver_id}
+        response = await self.recorder.call(
+            "POST /payments/",
+            lambda: self.client.post("/payments/", json=item, headers=self.headers),
+        )
+        if response is None:
+            return None
+        payment_id: str = response.json()["id"]
+        self.payment_ids.append(payment_id)
+        return payment_id
+
+    async def create_confirm(self) -> None:
+        payment_id = await self._create()
+        if payment_id is not None:
+            await self.recorder.call(
+                "PUT /payments/{id}/confirm",
+                lambda: self.client.put(f"/payments/{payment_id}/confirm", headers=self.headers),
+            )
+
+    async def create_cancel(self) -> None:
+        payment_id = await self._create()
+        if payment_id is not None:
+            await self.recorder.call(
+                "PUT /payments/{id}/cancel",
+                lambda: self.client.put(f"/payments/{payment_id}/cancel", headers=self.headers),
+            )
+
+    async def list_paginated(self, pages: int = 3, limit: int = 20) -> None:
+        cursor: Optional[str] = None
+        for _ in range(pages):
+            params: Dict[str, Any] = {"limit": limit}
+            if cursor is not None:
+                params["cursor"] = cursor
+            response = await self.recorder.call(
+                "GET /payments/",
+                lambda: self.client.get("/payments/", params=params, headers=self.headers),
+            )
+            if response is None:
+                return
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return
+
+    async def get_by_id(self) -> None:
+        if not self.payment_ids:
+            await self._create()
+            return
+        payment_id = self.rng.choice(self.payment_ids)
+        await self.recorder.call(
+            "GET /payments/{id}",
+            lambda: self.client.get(f"/payments/{payment_id}", headers=self.headers),
+        )
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def build_report(recorder: Recorder, elapsed: float, config: Dict[str, Any]) -> Dict[str, Any]:
+    endpoints: Dict[str, Any] = {}
+    for endpoint in sorted(set(recorder.latencies) | set(recorder.errors)):
+        samples = recorder.latencies[endpoint]
+        endpoints[endpoint] = {
+            **summarize(samples),
+            "throughput_per_s": len(samples) / elapsed if elapsed else 0.0,
+            "errors": recorder.errors[endpoint],
+        }
+
+    total = sum(len(samples) for samples in recorder.latencies.values())
+    return {
+        "meta": {
+            **config,
+            "revision": _git_revision(),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "elapsed_s": elapsed,
+        },
+        "total": {
+            "requests": total,
+            "errors": sum(recorder.errors.values()),
+            "throughput_per_s": total / elapsed if elapsed else 0.0,
+        },
+        "endpoints": endpoints,
+    }
+
+
+def compare_reports(
+    baseline: Dict[str, Any], current: Dict[str, Any], max_regression: float
+) -> List[str]:
+    """Регрессии текущего прогона относительно базового.
+
+    Регрессией считается рост p95 или падение пропускной способности
+    эндпоинта больше чем на долю ``max_regression``.
+    """
+    regressions = []
+    for endpoint, before in baseline.get("endpoints", {}).items():
+        after = current.get("endpoints", {}).get(endpoint)
+        if after is None:
+            regressions.append(f"{endpoint}: нет данных в текущем прогоне")
+            continue
+
+        if before["p95_ms"] and after["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(
+                f"{endpoint}: p95 {before['p95_ms']:.1f} -> {after['p95_ms']:.1f} мс"
+            )
+        if after["throughput_per_s"] < before["throughput_per_s"] * (1 - max_regression):
+            regressions.append(
+                f"{endpoint}: пропускная способность "
+                f"{before['throughput_per_s']:.1f} -> {after['throughput_per_s']:.1f} в секунду"
+            )
+    return regressions
+
+
+async def run(concurrency: int, duration: float, url: Optional[str], seed: int) -> Dict[str, Any]:
+    recorder = Recorder()
+    async with local_database(url) as engine:
+        async with make_client() as client:
+            users = await register_users(client, concurrency + 1, prefix="load")
+            await fund_users(engine)
+
+            receiver_id = int(users[0]["id"])
+            virtual_users = [
+                VirtualUser(client, recorder, user, receiver_id, random.Random(seed + i))
+                for i, user in enumerate(users[1:])
+            ]
+
+            started = time.perf_counter()
+            deadline = started + duration
+            await asyncio.gather(*(user.run(deadline) for user in virtual_users))
+            elapsed = time.perf_counter() - started
+
+    config = {"concurrency": concurrency, "duration_s": duration, "seed": seed, "database": url}
+    return build_report(recorder, elapsed, config)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Файл для JSON-отчёта")
+    parser.add_argument("--baseline", default=None, help="Отчёт прошлого прогона")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.concurrency, args.duration, args.database_url, args.seed))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text)
+    print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_reports(baseline, report, args.max_regression)
+        for regression in regressions:
+            print(f"РЕГРЕССИЯ {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Пропускная способность создания платежей при разных режимах логирования.
+
+Режимы: ``off`` — логирование отключено, ``sync`` — синхронный
+``StreamHandler`` в event loop, ``queue`` — очередь с фоновым потоком.
+Логи пишутся в ``--output`` (по умолчанию /dev/null; укажите файл или
+именованный канал, чтобы увидеть влияние медленного вывода).
+
+Запуск::
+
+    python -m benchmarks.logging_overhead --requests 300
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Sequence, TextIO
+
+from app.utils.logger import TEXT_FORMAT, setup_logging, shutdown_logging
+
+from .common import fund_users, local_database, make_client, register_users, summarize
+
+MODES = ("off", "sync", "queue")
+
+
+def configure(mode: str, output: TextIO) -> None:
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    shutdown_logging()
+    logging.disable(logging.NOTSET)
+
+    if mode == "off":
+        logging.disable(logging.CRITICAL)
+    elif mode == "sync":
+        handler = logging.StreamHandler(output)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    else:
+        setup_logging(output)
+
+
+async def run_mode(mode: str, requests: int, output: TextIO) -> Dict[str, Any]:
+    async with local_database() as engine:
+        async with make_client() as client:
+            sender, receiver = await register_users(client, 2, prefix=f"log_{mode}_")
+            await fund_users(engine)
+            headers = {"Authorization": f"Bearer {sender['token']}"}
+            item = {"amount": "1.00", "receiver_id": int(receiver["id"])}
+
+            configure(mode, output)
+            latencies: List[float] = []
+            started = time.perf_counter()
+            for _ in range(requests):
+                request_started = time.perf_counter()
+                response = await client.post("/payments/", json=item, headers=headers)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - request_started)
+            elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "requests": requests,
+        "throughput_per_s": requests / elapsed if elapsed else 0.0,
+        "latency": summarize(latencies),
+    }
+
+
+async def run(modes: Sequence[str], requests: int, output_path: str) -> List[Dict[str, Any]]:
+    results = []
+    with open(output_path, "a", encoding="utf-8") as output:
+        try:
+            for mode in modes:
+                results.append(await run_mode(mode, requests, output))
+        finally:
+            configure("off", output)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--output", default=os.devnull)
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(",") if mode in MODES]
+    result = asyncio.run(run(modes, args.requests, args.output))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
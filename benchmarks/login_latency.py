@@ -0,0 +1,101 @@
+"""Задержка GET /payments/ во время параллельных логинов.
+
+Запуск::
+
+    python -m benchmarks.login_latency --logins 8 --duration 10
+    python -m benchmarks.login_latency --inline   # bcrypt прямо в event loop, как раньше
+
+Сравнивает p99 списка платежей без нагрузки и при параллельных ``/auth/login``.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List, TypeVar
+
+import httpx
+
+from app.core.security import PasswordHasher, password_hasher
+from app.services import auth_service
+
+from .common import local_database, make_client, register_users, summarize
+
+T = TypeVar("T")
+
+
+class InlinePasswordHasher(PasswordHasher):
+    """Хеширование прямо в event loop — поведение до выноса в пул"""
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        return func(*args)
+
+
+async def _poll_payments(
+    client: httpx.AsyncClient, token: str, deadline: float, samples: List[float]
+) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/payments/", headers=headers)
+        samples.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+
+async def _login_loop(
+    client: httpx.AsyncClient, user: Dict[str, str], deadline: float, counter: List[int]
+) -> None:
+    body = {"username": user["username"], "password": user["password"]}
+    while time.perf_counter() < deadline:
+        response = await client.post("/auth/login", json=body)
+        if response.status_code == 200:
+            counter[0] += 1
+
+
+async def _measure(
+    client: httpx.AsyncClient, users: List[Dict[str, str]], logins: int, duration: float
+) -> Dict[str, Any]:
+    samples: List[float] = []
+    counter = [0]
+    deadline = time.perf_counter() + duration
+
+    tasks = [_poll_payments(client, users[0]["token"], deadline, samples)]
+    tasks += [
+        _login_loop(client, users[1 + i % (len(users) - 1)], deadline, counter)
+        for i in range(logins)
+    ]
+    await asyncio.gather(*tasks)
+
+    return {"logins": logins, "logins_done": counter[0], "payments_list": summarize(samples)}
+
+
+async def run(logins: int, duration: float, inline: bool) -> Dict[str, Any]:
+    if inline:
+        auth_service.password_hasher = InlinePasswordHasher("thread", 1, 0)  # type: ignore
+
+    try:
+        async with local_database():
+            async with make_client() as client:
+                users = await register_users(client, max(2, logins + 1))
+                idle = await _measure(client, users, 0, duration)
+                loaded = await _measure(client, users, logins, duration)
+    finally:
+        auth_service.password_hasher = password_hasher
+        password_hasher.shutdown()
+
+    return {"mode": "inline" if inline else "executor", "idle": idle, "under_logins": loaded}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=8, help="параллельных циклов логина")
+    parser.add_argument("--duration", type=float, default=5.0, help="секунд на замер")
+    parser.add_argument("--inline", action="store_true", help="bcrypt в event loop")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.logins, args.duration, args.inline))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Пропускная способность API в зависимости от размера пула соединений.
+
+Для каждого размера пула поднимается чистая БД, после чего ``--concurrency``
+клиентов в течение ``--duration`` секунд создают платежи и читают список
+платежей. По умолчанию используется временный файл SQLite; для реалистичных
+цифр укажите ``--database-url`` на отдельную базу PostgreSQL.
+
+Запуск::
+
+    python -m benchmarks.pool_sweep --sizes 1,2,5,10,20 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from sqlalchemy import exc
+
+from app.core.config import settings
+from app.core.database import pool_status
+
+from .common import fund_users, local_database, make_client, register_users, summarize
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    headers: Dict[str, str],
+    receiver_id: int,
+    deadline: float,
+    latencies: List[float],
+    errors: List[str],
+) -> None:
+    item = {"amount": "1.00", "receiver_id": receiver_id}
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.post("/payments/", json=item, headers=headers)
+            response.raise_for_status()
+            response = await client.get("/payments/?limit=20", headers=headers)
+            response.raise_for_status()
+        except (httpx.HTTPError, exc.TimeoutError) as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_size(
+    pool_size: int, concurrency: int, duration: float, url: Optional[str]
+) -> Dict[str, Any]:
+    config = settings.model_copy(
+        update={"db_pool_size": pool_size, "db_max_overflow": 0, "db_echo": False}
+    )
+    async with local_database(url, config) as engine:
+        async with make_client() as client:
+            users = await register_users(client, concurrency + 1, prefix=f"pool{pool_size}_")
+            await fund_users(engine)
+            receiver_id = int(users[0]["id"])
+
+            latencies: List[float] = []
+            errors: List[str] = []
+            started = time.perf_counter()
+            deadline = started + duration
+            await asyncio.gather(
+                *(
+                    _worker(
+                        client,
+                        {"Authorization": f"Bearer {user['token']}"},
+                        receiver_id,
+                        deadline,
+                        latencies,
+                        errors,
+                    )
+                    for user in users[1:]
+                )
+            )
+            elapsed = time.perf_counter() - started
+            pool = pool_status(engine)
+
+    wait = pool.get("wait_seconds", {})
+    return {
+        "pool_size": pool_size,
+        "iterations": len(latencies),
+        "errors": len(errors),
+        "throughput_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": summarize(latencies),
+        "pool_wait_mean_ms": (
+            wait["sum"] / wait["count"] * 1000 if wait.get("count") else 0.0  # type: ignore
+        ),
+        "pool_timeouts": pool.get("timeouts", 0),
+    }
+
+
+async def run(
+    sizes: Sequence[int], concurrency: int, duration: float, url: Optional[str]
+) -> List[Dict[str, Any]]:
+    return [await run_size(size, concurrency, duration, url) for size in sizes]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1,2,5,10,20")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    result = asyncio.run(run(sizes, args.concurrency, args.duration, args.database_url))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Сериализация страницы списка платежей: прежний путь против быстрого.
+
+Прежний путь: ORM-объекты -> ``PaymentResponse.model_validate`` для каждого
+-> повторная валидация ``response_model`` в FastAPI -> ``json.dumps``.
+Быстрый путь: строки без ORM -> одна валидация кешированным ``TypeAdapter``
+-> ``dump_json`` в pydantic-core. Замеряется только сериализация готовой
+страницы и вместе с выборкой из БД.
+
+Запуск::
+
+    python -m benchmarks.serialization --rows 100 --repeat 500
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.payment import Payment, PaymentStatus
+from app.models.user import User
+from app.schemas.payment import PaymentResponse, dump_payment_rows
+from app.services.payment_service import PaymentService
+from app.utils.serialization import PydanticJSONResponse
+
+from .common import local_database
+
+response_field = create_model_field(
+    name="Response", type_=List[PaymentResponse], mode="serialization"
+)
+
+
+async def legacy_path(payments: List[Payment]) -> bytes:
+    content = [PaymentResponse.model_validate(payment) for payment in payments]
+    serialized = await serialize_response(field=response_field, response_content=content)
+    return JSONResponse(serialized).body
+
+
+async def fast_path(rows: List[Any]) -> bytes:
+    return PydanticJSONResponse(dump_payment_rows(rows)).body
+
+
+async def legacy_fetch(service: PaymentService, user_id: int, rows: int) -> List[Payment]:
+    result = await service.db.execute(service.user_payments_query(user_id, rows))
+    return list(result.scalars())
+
+
+async def measure(repeat: int, call: Callable[[], Awaitable[bytes]]) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await call()
+    return (time.perf_counter() - started) / repeat
+
+
+async def run(rows: int, repeat: int) -> Dict[str, Any]:
+    async with local_database() as engine:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            user = User(email="bench@example.com", username="bench", hashed_password="x")
+            session.add(user)
+            await session.commit()
+            await session.execute(
+                insert(Payment),
+                [
+                    {
+                        "sender_id": user.id,
+                        "amount": f"{i}.50",
+                        "description": f"Платеж {i}",
+                        "card_last_four": "1234",
+                        "status": PaymentStatus.CREATED,
+                    }
+                    for i in range(rows)
+                ],
+            )
+            await session.commit()
+
+            service = PaymentService(session)
+            payments = await legacy_fetch(service, user.id, rows)
+            page = await service.get_user_payments(user.id, limit=rows)
+            assert json.loads(await legacy_path(payments)) == json.loads(await fast_path(page))
+
+            async def legacy_end_to_end() -> bytes:
+                session.expunge_all()
+                return await legacy_path(await legacy_fetch(service, user.id, rows))
+
+            async def fast_end_to_end() -> bytes:
+                return await fast_path(await service.get_user_payments(user.id, limit=rows))
+
+            timings = {
+                "serialize_legacy_ms": await measure(repeat, lambda: legacy_path(payments)),
+                "serialize_fast_ms": await measure(repeat, lambda: fast_path(page)),
+                "end_to_end_legacy_ms": await measure(repeat, legacy_end_to_end),
+                "end_to_end_fast_ms": await measure(repeat, fast_end_to_end),
+            }
+
+    result: Dict[str, Any] = {"rows": rows, "repeat": repeat}
+    result.update({name: value * 1000 for name, value in timings.items()})
+    result["serialize_speedup"] = timings["serialize_legacy_ms"] / timings["serialize_fast_ms"]
+    result["end_to_end_speedup"] = timings["end_to_end_legacy_ms"] / timings["end_to_end_fast_ms"]
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.rows, args.repeat))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Пропускная способность webhook-доставки на локальный mock-получатель.
+
+В очередь ставятся доставки на несколько endpoint, получатель отвечает с
+задержкой ``--latency-ms``. Замеряется время до отправки всех доставок
+запущенным движком: захват пачками, пул воркеров и запись результатов.
+
+Запуск::
+
+    python -m benchmarks.webhooks --deliveries 20000 --endpoints 50 --workers 64
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.webhooks import SIGNATURE_HEADER
+from app.models.webhook import WebhookDelivery
+from app.services.webhook_engine import WebhookEngine
+
+from .common import local_database, make_client, register_users, summarize
+
+
+async def run(
+    deliveries: int,
+    endpoints: int,
+    workers: int,
+    endpoint_concurrency: int,
+    latency_ms: float,
+    url: Optional[str],
+) -> Dict[str, Any]:
+    async with local_database(url) as engine:
+        async with make_client() as client:
+            users = await register_users(client, endpoints, prefix="hook")
+            endpoint_ids = []
+            for user in users:
+                response = await client.post(
+                    "/webhooks/",
+                    json={"url": f"http://merchant-{user['id']}.local/hooks"},
+                    headers={"Authorization": f"Bearer {user['token']}"},
+                )
+                response.raise_for_status()
+                endpoint_ids.append(response.json()["id"])
+
+        now = datetime.now(timezone.utc)
+        async with engine.begin() as conn:
+            await conn.execute(
+                insert(WebhookDelivery),
+                [
+                    {
+                        "endpoint_id": endpoint_ids[i % endpoints],
+                        "event_id": i,
+                        "event_type": "payment.paid",
+                        "payload": {"id": i, "type": "payment.paid", "data": {"amount": "1.00"}},
+                        "attempts": 0,
+                        "next_attempt_at": now,
+                    }
+                    for i in range(deliveries)
+                ],
+            )
+
+        latencies: List[float] = []
+
+        async def receiver(request: httpx.Request) -> httpx.Response:
+            assert SIGNATURE_HEADER in request.headers
+            started = time.perf_counter()
+            await asyncio.sleep(latency_ms / 1000)
+            latencies.append(time.perf_counter() - started)
+            return httpx.Response(204)
+
+        webhooks = WebhookEngine(
+            workers=workers,
+            endpoint_concurrency=endpoint_concurrency,
+            batch_size=max(workers * 4, 100),
+            lease_seconds=60.0,
+            poll_interval=0.01,
+            max_connections=workers,
+            timeout=10.0,
+            transport=httpx.MockTransport(receiver),
+            session_maker=async_sessionmaker(engine, expire_on_commit=False),
+        )
+
+        started = time.perf_counter()
+        webhooks.start()
+        try:
+            while True:
+                async with engine.connect() as conn:
+                    remaining = await conn.scalar(select(func.count()).select_from(WebhookDelivery))
+                if not remaining:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            elapsed = time.perf_counter() - started
+            await webhooks.stop()
+
+    return {
+        "deliveries": deliveries,
+        "endpoints": endpoints,
+        "workers": workers,
+        "endpoint_concurrency": endpoint_concurrency,
+        "database": url,
+        "elapsed_s": elapsed,
+        "throughput_per_s": deliveries / elapsed if elapsed else 0.0,
+        "receiver": summarize(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deliveries", type=int, default=5000)
+    parser.add_argument("--endpoints", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--endpoint-concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    result = asyncio.run(
+        run(
+            args.deliveries,
+            args.endpoints,
+            args.workers,
+            args.endpoint_concurrency,
+            args.latency_ms,
+            args.database_url,
+        )
+    )
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
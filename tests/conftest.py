@@ -1,4 +1,5 @@
 import asyncio
+from typing import Callable, Optional
 
 import pytest
 import pytest_asyncio
@@ -6,11 +7,27 @@ from fastapi.testclient import TestClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.pool import StaticPool
 
-from app.core.database import Base, get_async_session
-from app.main import app
+from app import main
+from app.core.config import settings
+from app.core.database import Base, get_async_session, instrument_engine, replicas
+from app.core.http_cache import payment_response_cache
+from app.core.idempotency import idempotency_cache
+from app.core.principal import principal_cache
+from app.core.rate_limit import rate_limiter
+from app.core.security import token_cache
 from app.models.payment import Payment
 from app.models.user import User
 
+# Служебные эндпоинты выключены по умолчанию; приложение тестов собирается с ними
+settings.internal_api_enabled = True
+settings.metrics_enabled = True
+# Адреса webhook в тестах не разрешаются в DNS
+settings.webhook_allow_private_urls = True
+app = main.app
+
+# Внешний платеж на карту: не требует второго пользователя
+EXTERNAL_PAYMENT = {"amount": 10.00, "card_last_four": "1234", "card_holder_name": "John Doe"}
+
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
 test_engine = create_async_engine(
@@ -19,6 +36,8 @@ test_engine = create_async_engine(
     connect_args={"check_same_thread": False},
 )
 
+instrument_engine(test_engine)
+
 TestAsyncSessionLocal = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -55,6 +74,18 @@ async def setup_database():
         await conn.run_sync(Base.metadata.drop_all)
 
 
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Сбрасывает внутрипроцессные кеши: ID пользователей повторяются между тестами"""
+    yield
+    principal_cache.clear()
+    token_cache.clear()
+    idempotency_cache.clear()
+    replicas.clear()
+    rate_limiter.clear()
+    payment_response_cache.clear()
+
+
 @pytest.fixture
 def client():
     """FastAPI тест клиент"""
@@ -151,7 +182,12 @@ def funded_user(client: TestClient, test_user_data: dict):
         loop = asyncio.get_running_loop()
         loop.create_task(add_balance())
     except RuntimeError:
-        asyncio.run(add_balance())
+        # asyncio.run() сбрасывает текущий event loop и ломает последующие async-тесты
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(add_balance())
+        finally:
+            loop.close()
 
     return {
         "token": token,
@@ -159,3 +195,15 @@ def funded_user(client: TestClient, test_user_data: dict):
         "user": {**user_info, "balance": "1000.00"},
         "data": test_user_data,
     }
+
+
+@pytest.fixture
+def create_payment(client: TestClient) -> Callable[..., str]:
+    """Создает платеж пользователя (по умолчанию внешний) и возвращает его ID"""
+
+    def create(user: dict, item: Optional[dict] = None) -> str:
+        response = client.post("/payments/", json=item or EXTERNAL_PAYMENT, headers=user["headers"])
+        assert response.status_code == 200
+        return response.json()["id"]
+
+    return create
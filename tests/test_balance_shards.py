@@ -0,0 +1,144 @@
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.models.balance_shard import BalanceShard
+from app.models.user import User
+from app.services.balance_shard_service import BalanceShardService
+from tests.conftest import TestAsyncSessionLocal
+
+
+async def _shards(user_id: int) -> dict:
+    async with TestAsyncSessionLocal() as session:
+        result = await session.execute(
+            select(BalanceShard.shard, BalanceShard.balance).where(BalanceShard.user_id == user_id)
+        )
+        return dict(result.all())
+
+
+async def _cached_balance(user_id: int) -> Decimal:
+    async with TestAsyncSessionLocal() as session:
+        return await session.scalar(select(User.balance).where(User.id == user_id))
+
+
+async def _compact(user_id: int, shard_count: int = 4) -> None:
+    async with TestAsyncSessionLocal() as session:
+        await BalanceShardService(session, shard_count=shard_count).compact(user_id)
+
+
+@pytest.fixture
+def hot_receiver(second_user: dict, monkeypatch: pytest.MonkeyPatch) -> dict:
+    """Второй пользователь как горячий счёт с четырьмя шардами"""
+    monkeypatch.setattr(settings, "balance_shard_accounts", {second_user["user"]["id"]})
+    monkeypatch.setattr(settings, "balance_shard_count", 4)
+    return second_user
+
+
+class TestBalanceShards:
+    """Тесты шардированных балансов горячих счетов"""
+
+    def _pay(self, client: TestClient, sender: dict, receiver_id: int, amount: float) -> str:
+        item = {"amount": amount, "receiver_id": receiver_id}
+        payment_id = client.post("/payments/", json=item, headers=sender["headers"]).json()["id"]
+        response = client.put(f"/payments/{payment_id}/confirm", headers=sender["headers"])
+        assert response.status_code == 200
+        return payment_id
+
+    async def test_credit_goes_to_shard(
+        self, client: TestClient, funded_user: dict, hot_receiver: dict
+    ):
+        """Тест зачисления в шард без изменения строки получателя"""
+        receiver_id = hot_receiver["user"]["id"]
+        await _compact(receiver_id)
+
+        for _ in range(5):
+            self._pay(client, funded_user, receiver_id, 10.00)
+
+        shards = await _shards(receiver_id)
+        assert set(shards) == {0, 1, 2, 3}
+        assert sum(shards.values()) == Decimal("50.00")
+        assert await _cached_balance(receiver_id) == 0
+        assert await _cached_balance(funded_user["user"]["id"]) == Decimal("950.00")
+
+        me = client.get("/auth/me", headers=hot_receiver["headers"])
+        assert Decimal(me.json()["balance"]) == Decimal("50.00")
+
+    async def test_credit_without_shard_rows_falls_back(
+        self, client: TestClient, funded_user: dict, hot_receiver: dict
+    ):
+        """Тест зачисления в users.balance, пока шарды не созданы"""
+        receiver_id = hot_receiver["user"]["id"]
+        self._pay(client, funded_user, receiver_id, 25.00)
+
+        assert await _shards(receiver_id) == {}
+        assert await _cached_balance(receiver_id) == Decimal("25.00")
+
+    async def test_batch_confirm_credits_shards(
+        self, client: TestClient, funded_user: dict, hot_receiver: dict
+    ):
+        """Тест пакетного подтверждения на горячий счёт"""
+        receiver_id = hot_receiver["user"]["id"]
+        await _compact(receiver_id)
+        item = {"amount": 10.00, "receiver_id": receiver_id}
+        created = client.post(
+            "/payments/batch", json={"items": [item] * 4}, headers=funded_user["headers"]
+        ).json()
+        ids = [result["payment"]["id"] for result in created["results"]]
+
+        response = client.put(
+            "/payments/confirm-batch", json={"payment_ids": ids}, headers=funded_user["headers"]
+        )
+
+        assert response.json()["succeeded"] == 4
+        assert sum((await _shards(receiver_id)).values()) == Decimal("40.00")
+        assert await _cached_balance(funded_user["user"]["id"]) == Decimal("960.00")
+
+    async def test_hot_sender_spends_shards(
+        self, client: TestClient, funded_user: dict, hot_receiver: dict
+    ):
+        """Тест списания с горячего счёта: шарды сворачиваются перед проверкой средств"""
+        receiver_id = hot_receiver["user"]["id"]
+        await _compact(receiver_id)
+        for _ in range(3):
+            self._pay(client, funded_user, receiver_id, 20.00)
+
+        self._pay(client, hot_receiver, funded_user["user"]["id"], 45.00)
+
+        assert await _cached_balance(receiver_id) == Decimal("15.00")
+        assert sum((await _shards(receiver_id)).values()) == 0
+
+        item = {"amount": 20.00, "receiver_id": funded_user["user"]["id"]}
+        response = client.post("/payments/", json=item, headers=hot_receiver["headers"])
+        assert response.status_code == 400
+
+    async def test_compact_folds_and_resizes(self, authenticated_user: dict, hot_receiver: dict):
+        """Тест сворачивания шардов и изменения их числа"""
+        receiver_id = hot_receiver["user"]["id"]
+        async with TestAsyncSessionLocal() as session:
+            await session.execute(
+                insert(BalanceShard),
+                [{"user_id": receiver_id, "shard": shard, "balance": 5} for shard in range(6)],
+            )
+            await session.commit()
+
+        await _compact(receiver_id, shard_count=2)
+
+        assert await _shards(receiver_id) == {0: 0, 1: 0}
+        assert await _cached_balance(receiver_id) == Decimal("30.00")
+
+    async def test_compact_removes_shards_of_cold_account(self, authenticated_user: dict):
+        """Тест удаления шардов у счёта, исключённого из горячих"""
+        user_id = authenticated_user["user"]["id"]
+        async with TestAsyncSessionLocal() as session:
+            await session.execute(
+                insert(BalanceShard), [{"user_id": user_id, "shard": 0, "balance": 7}]
+            )
+            await session.commit()
+
+        await _compact(user_id)
+
+        assert await _shards(user_id) == {}
+        assert await _cached_balance(user_id) == Decimal("7.00")
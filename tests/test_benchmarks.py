@@ -0,0 +1,24 @@
+from benchmarks.load import compare_reports
+
+
+def report(p95_ms: float, throughput: float) -> dict:
+    return {"endpoints": {"GET /payments/": {"p95_ms": p95_ms, "throughput_per_s": throughput}}}
+
+
+class TestCompareReports:
+    """Тесты сравнения отчётов нагрузочного прогона"""
+
+    def test_no_regression_within_threshold(self):
+        """Тест отсутствия регрессии в пределах допуска"""
+        assert compare_reports(report(10, 100), report(11, 95), max_regression=0.2) == []
+
+    def test_latency_and_throughput_regressions(self):
+        """Тест регрессии по p95 и по пропускной способности"""
+        regressions = compare_reports(report(10, 100), report(15, 70), max_regression=0.2)
+
+        assert len(regressions) == 2
+        assert all(regression.startswith("GET /payments/") for regression in regressions)
+
+    def test_missing_endpoint(self):
+        """Тест эндпоинта, пропавшего из нового отчёта"""
+        assert compare_reports(report(10, 100), {"endpoints": {}}, max_regression=0.2)
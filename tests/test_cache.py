@@ -0,0 +1,57 @@
+import time
+
+from app.utils.cache import TTLCache
+
+
+class TestTTLCache:
+    """Тесты LRU/TTL кеша"""
+
+    def test_hit_and_miss_counters(self):
+        """Тест счётчиков попаданий и промахов"""
+        cache: TTLCache[str, int] = TTLCache(max_entries=10)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_lru_eviction(self):
+        """Тест вытеснения давно не использованных записей"""
+        cache: TTLCache[str, int] = TTLCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert cache.evictions == 1
+
+    def test_ttl_expiration(self):
+        """Тест истечения времени жизни записи"""
+        cache: TTLCache[str, int] = TTLCache(max_entries=10, default_ttl=0.01)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=60)
+        time.sleep(0.02)
+
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+        assert cache.expirations == 1
+
+    def test_non_positive_ttl_is_not_stored(self):
+        """Тест того, что уже истёкшие значения не сохраняются"""
+        cache: TTLCache[str, int] = TTLCache(max_entries=10)
+        cache.set("a", 1, ttl=-1)
+
+        assert len(cache) == 0
+
+    def test_memory_cap(self):
+        """Тест вытеснения по ограничению памяти"""
+        cache: TTLCache[str, str] = TTLCache(max_entries=100, max_bytes=500)
+        for i in range(20):
+            cache.set(f"key{i}", "x" * 50)
+
+        assert cache.size_bytes <= 500
+        assert len(cache) < 20
+        assert "key19" in cache
@@ -0,0 +1,115 @@
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+from sqlalchemy import exc, text
+
+from app.core.config import Settings, settings
+from app.core.database import InstrumentedPool, build_engine, engine_options, pool_status
+from app.main import app, create_app
+
+
+class TestDatabaseSettings:
+    """Тесты профилей пула соединений"""
+
+    def test_profile_defaults(self):
+        """Тест значений пула из профиля окружения"""
+        config = Settings(environment="production")
+
+        assert config.db_pool_size == 20
+        assert config.db_pool_pre_ping is True
+        assert config.db_echo is False
+
+    def test_explicit_value_overrides_profile(self):
+        """Тест приоритета явно заданного значения над профилем"""
+        config = Settings(environment="production", db_pool_size=7)
+
+        assert config.db_pool_size == 7
+        assert config.db_max_overflow == 10
+
+    def test_unknown_environment(self):
+        """Тест неизвестного окружения"""
+        with pytest.raises(ValidationError):
+            Settings(environment="staging-42")
+
+    def test_asyncpg_options(self):
+        """Тест параметров кеша подготовленных выражений asyncpg"""
+        config = Settings(environment="production", db_statement_cache_size=0)
+        options = engine_options(config, "postgresql+asyncpg://user:password@db/payments")
+
+        assert options["poolclass"] is InstrumentedPool
+        assert options["pool_recycle"] == 1800
+        assert options["connect_args"]["prepared_statement_cache_size"] == 0
+
+    def test_memory_sqlite_has_no_pool_options(self):
+        """Тест того, что in-memory SQLite не получает параметры пула"""
+        options = engine_options(Settings(), "sqlite+aiosqlite:///:memory:")
+
+        assert "poolclass" not in options
+
+
+class TestInstrumentedPool:
+    """Тесты метрик пула соединений"""
+
+    async def test_wait_time_and_timeouts(self, tmp_path):
+        """Тест учёта ожидания соединения и таймаутов"""
+        config = Settings(environment="test", db_pool_size=1, db_pool_timeout=0.05)
+        engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", config)
+
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                assert pool_status(engine)["checked_out"] == 1
+
+                with pytest.raises(exc.TimeoutError):
+                    async with engine.connect():
+                        pass
+
+            status = pool_status(engine)
+            assert status["checked_out"] == 0
+            assert status["timeouts"] == 1
+            assert status["connections_created"] == 1
+            assert status["wait_seconds"]["count"] == 2
+        finally:
+            await engine.dispose()
+
+    async def test_connect_errors(self, tmp_path):
+        """Тест учёта ошибок подключения"""
+        url = f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'pool.db'}"
+        engine = build_engine(url, Settings(environment="test"))
+
+        try:
+            with pytest.raises(exc.OperationalError):
+                async with engine.connect():
+                    pass
+
+            assert pool_status(engine)["connect_errors"] == 1
+        finally:
+            await engine.dispose()
+
+
+def test_internal_pool_endpoint():
+    """Тест внутреннего эндпоинта метрик пула"""
+    response = TestClient(app).get("/internal/pool")
+
+    assert response.status_code == 200
+    assert "pool_class" in response.json()
+
+
+def test_internal_api_disabled_by_default(monkeypatch: pytest.MonkeyPatch):
+    """Тест: без INTERNAL_API_ENABLED служебные эндпоинты не подключаются"""
+    assert Settings().internal_api_enabled is False
+    monkeypatch.setattr(settings, "internal_api_enabled", False)
+
+    assert TestClient(create_app()).get("/internal/pool").status_code == 404
+
+
+def test_internal_api_requires_token(monkeypatch: pytest.MonkeyPatch):
+    """Тест: при заданном INTERNAL_API_TOKEN без верного токена отвечает 401"""
+    monkeypatch.setattr(settings, "internal_api_token", "secret")
+    client = TestClient(app)
+
+    assert client.get("/internal/replicas").status_code == 401
+    wrong = {"Authorization": "Bearer other"}
+    assert client.get("/internal/replicas", headers=wrong).status_code == 401
+    response = client.get("/internal/replicas", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
@@ -0,0 +1,130 @@
+from typing import Callable
+from uuid import UUID
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.core.http_cache import etag_matches, payment_response_cache
+from tests.conftest import test_engine
+
+
+class TestEtagMatching:
+    """Тесты сравнения If-None-Match"""
+
+    def test_weak_comparison(self):
+        """Тест совпадения по списку, слабым тегам и звёздочке"""
+        assert etag_matches('"a"', '"a"')
+        assert etag_matches('W/"a"', '"a"')
+        assert etag_matches('"b", W/"a"', 'W/"a"')
+        assert etag_matches("*", '"a"')
+        assert not etag_matches('"b"', '"a"')
+        assert not etag_matches(None, '"a"')
+
+
+class TestConditionalPaymentGet:
+    """Тесты условного получения платежа"""
+
+    def test_not_modified_until_status_changes(
+        self, client: TestClient, funded_user: dict, create_payment: Callable[..., str]
+    ):
+        """Тест 304 по ETag и смены ETag при подтверждении"""
+        payment_id = create_payment(funded_user)
+        headers = funded_user["headers"]
+
+        first = client.get(f"/payments/{payment_id}", headers=headers)
+        etag = first.headers["ETag"]
+        assert first.headers["Cache-Control"] == "private, no-cache"
+        assert UUID(payment_id) not in payment_response_cache
+
+        repeated = client.get(f"/payments/{payment_id}", headers={**headers, "If-None-Match": etag})
+        assert repeated.status_code == 304
+        assert repeated.headers["ETag"] == etag
+        assert repeated.content == b""
+
+        client.put(f"/payments/{payment_id}/confirm", headers=headers)
+        changed = client.get(f"/payments/{payment_id}", headers={**headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert changed.json()["status"] == "paid"
+
+    def test_terminal_payment_served_from_cache(
+        self,
+        client: TestClient,
+        funded_user: dict,
+        second_user: dict,
+        create_payment: Callable[..., str],
+    ):
+        """Тест ответа на завершённый платеж без запросов к БД"""
+        payment_id = create_payment(funded_user)
+        client.put(f"/payments/{payment_id}/cancel", headers=funded_user["headers"])
+        first = client.get(f"/payments/{payment_id}", headers=funded_user["headers"])
+        client.get("/auth/me", headers=second_user["headers"])
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            cached = client.get(f"/payments/{payment_id}", headers=funded_user["headers"])
+            revalidated = client.get(
+                f"/payments/{payment_id}",
+                headers={**funded_user["headers"], "If-None-Match": first.headers["ETag"]},
+            )
+            foreign = client.get(f"/payments/{payment_id}", headers=second_user["headers"])
+        finally:
+            event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+        assert statements == []
+        assert first.headers["Cache-Control"] == "private, max-age=31536000, immutable"
+        assert cached.content == first.content
+        assert cached.headers["ETag"] == first.headers["ETag"]
+        assert revalidated.status_code == 304
+        assert foreign.status_code == 403
+
+    def test_cache_evicts_by_size(
+        self, client: TestClient, funded_user: dict, monkeypatch, create_payment: Callable[..., str]
+    ):
+        """Тест вытеснения ответов при превышении объёма кеша"""
+        payment_ids = [create_payment(funded_user) for _ in range(3)]
+        for payment_id in payment_ids:
+            client.put(f"/payments/{payment_id}/cancel", headers=funded_user["headers"])
+
+        client.get(f"/payments/{payment_ids[0]}", headers=funded_user["headers"])
+        entry_size, evictions = payment_response_cache.size_bytes, payment_response_cache.evictions
+        monkeypatch.setattr(payment_response_cache, "max_bytes", 2 * entry_size + entry_size // 2)
+        for payment_id in payment_ids[1:]:
+            client.get(f"/payments/{payment_id}", headers=funded_user["headers"])
+
+        assert len(payment_response_cache) == 2
+        assert payment_response_cache.evictions == evictions + 1
+
+
+class TestConditionalPaymentList:
+    """Тесты условного получения списка платежей"""
+
+    def test_weak_etag_follows_changes(
+        self, client: TestClient, funded_user: dict, create_payment: Callable[..., str]
+    ):
+        """Тест 304 для неизменной страницы и нового ETag после изменений"""
+        headers = funded_user["headers"]
+        payment_id = create_payment(funded_user)
+
+        first = client.get("/payments/", headers=headers)
+        etag = first.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        repeated = client.get("/payments/", headers={**headers, "If-None-Match": etag})
+        assert repeated.status_code == 304
+
+        create_payment(funded_user)
+        grown = client.get("/payments/", headers={**headers, "If-None-Match": etag})
+        assert grown.status_code == 200
+        assert len(grown.json()) == 2
+
+        client.put(f"/payments/{payment_id}/cancel", headers=headers)
+        cancelled = client.get(
+            "/payments/", headers={**headers, "If-None-Match": grown.headers["ETag"]}
+        )
+        assert cancelled.status_code == 200
@@ -0,0 +1,164 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.idempotency import idempotency_cache, purge_expired_keys, run_idempotent
+from app.main import app
+from app.models.idempotency import IdempotencyKey
+from app.models.payment import Payment
+from app.models.user import User
+from app.schemas.payment import PaymentCreate, PaymentResponse
+from app.services.payment_service import PaymentService
+from tests.conftest import EXTERNAL_PAYMENT, TestAsyncSessionLocal
+
+
+class TestIdempotency:
+    """Тесты заголовка Idempotency-Key"""
+
+    def _headers(self, user: dict, key: str) -> dict:
+        return {**user["headers"], "Idempotency-Key": key}
+
+    def test_create_is_replayed(self, client: TestClient, funded_user: dict):
+        """Тест повтора создания платежа с тем же ключом"""
+        headers = self._headers(funded_user, "create-1")
+
+        first = client.post("/payments/", json=EXTERNAL_PAYMENT, headers=headers)
+        second = client.post("/payments/", json=EXTERNAL_PAYMENT, headers=headers)
+
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert second.json() == first.json()
+        assert second.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        assert len(client.get("/payments/", headers=funded_user["headers"]).json()) == 1
+
+    def test_replay_from_database(self, client: TestClient, funded_user: dict):
+        """Тест повтора после вытеснения ключа из кеша процесса"""
+        headers = self._headers(funded_user, "create-2")
+
+        first = client.post("/payments/", json=EXTERNAL_PAYMENT, headers=headers)
+        idempotency_cache.clear()
+        second = client.post("/payments/", json=EXTERNAL_PAYMENT, headers=headers)
+
+        assert second.json()["id"] == first.json()["id"]
+        assert second.headers["Idempotent-Replayed"] == "true"
+
+    def test_key_reused_for_other_request(self, client: TestClient, funded_user: dict):
+        """Тест использования ключа для другого запроса"""
+        headers = self._headers(funded_user, "create-3")
+
+        client.post("/payments/", json=EXTERNAL_PAYMENT, headers=headers)
+        response = client.post(
+            "/payments/", json={**EXTERNAL_PAYMENT, "amount": 5.00}, headers=headers
+        )
+
+        assert response.status_code == 422
+
+    def test_confirm_retry_is_replayed(self, client: TestClient, funded_user: dict):
+        """Тест повтора подтверждения вместо ошибки «уже обработан»"""
+        payment_id = client.post(
+            "/payments/", json=EXTERNAL_PAYMENT, headers=funded_user["headers"]
+        ).json()["id"]
+        headers = self._headers(funded_user, "confirm-1")
+
+        first = client.put(f"/payments/{payment_id}/confirm", headers=headers)
+        second = client.put(f"/payments/{payment_id}/confirm", headers=headers)
+
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert second.json()["status"] == "paid"
+        me = client.get("/auth/me", headers=funded_user["headers"]).json()
+        assert float(me["balance"]) == 990.00
+
+    def test_errors_are_replayed(self, client: TestClient, funded_user: dict):
+        """Тест сохранения ответа с ошибкой"""
+        headers = self._headers(funded_user, "create-4")
+        payment = {**EXTERNAL_PAYMENT, "amount": 5000.00}
+
+        first = client.post("/payments/", json=payment, headers=headers)
+        second = client.post("/payments/", json=payment, headers=headers)
+
+        assert first.status_code == 400
+        assert second.status_code == 400
+        assert second.json() == first.json()
+
+    async def test_concurrent_duplicates_coalesce(self, test_user_data: dict):
+        """Тест объединения одновременных дубликатов в одно выполнение"""
+        transport = httpx.ASGITransport(app=app)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            registered = await client.post("/auth/register", json=test_user_data)
+            user_id = registered.json()["user"]["id"]
+            async with TestAsyncSessionLocal() as session:
+                await session.execute(
+                    update(User).where(User.id == user_id).values(balance=1000.00)
+                )
+                await session.commit()
+
+            auth = {"Authorization": f"Bearer {registered.json()['access_token']}"}
+            headers = {**auth, "Idempotency-Key": "create-5"}
+            responses = await asyncio.gather(
+                *(
+                    client.post("/payments/", json=EXTERNAL_PAYMENT, headers=headers)
+                    for _ in range(3)
+                )
+            )
+            listed = await client.get("/payments/", headers=auth)
+
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert len({r.json()["id"] for r in responses}) == 1
+        assert len(listed.json()) == 1
+
+    async def test_crash_before_response_leaves_nothing(self, funded_user: dict):
+        """Тест: сбой после записи платежа откатывает и платеж, и ключ; повтор выполняется"""
+        user_id = funded_user["user"]["id"]
+        payment_data = PaymentCreate(**EXTERNAL_PAYMENT)
+
+        async def crashing(session: AsyncSession) -> PaymentResponse:
+            await PaymentService(session).create_payment(payment_data, user_id)
+            raise RuntimeError("процесс упал до записи ответа")
+
+        async def handler(session: AsyncSession) -> PaymentResponse:
+            payment = await PaymentService(session).create_payment(payment_data, user_id)
+            return PaymentResponse.model_validate(payment)
+
+        async with TestAsyncSessionLocal() as session:
+            with pytest.raises(RuntimeError):
+                await run_idempotent(session, user_id, "crash-1", "hash", crashing)
+
+        async with TestAsyncSessionLocal() as session:
+            assert await session.get(IdempotencyKey, (user_id, "crash-1")) is None
+            assert (await session.execute(select(func.count(Payment.id)))).scalar_one() == 0
+
+            response = await run_idempotent(session, user_id, "crash-1", "hash", handler)
+            assert response.status_code == 200
+            assert (await session.execute(select(func.count(Payment.id)))).scalar_one() == 1
+            assert await session.get(IdempotencyKey, (user_id, "crash-1")) is not None
+
+    async def test_purge_expired_keys_in_batches(self, authenticated_user: dict):
+        """Тест удаления истёкших ключей пачками"""
+        now = datetime.now(timezone.utc)
+        user_id = authenticated_user["user"]["id"]
+
+        async with TestAsyncSessionLocal() as session:
+            for i in range(5):
+                session.add(
+                    IdempotencyKey(
+                        user_id=user_id,
+                        key=f"key-{i}",
+                        request_hash="x",
+                        status_code=200,
+                        response_body="{}",
+                        expires_at=now + timedelta(hours=-1 if i < 4 else 1),
+                    )
+                )
+            await session.commit()
+
+            assert await purge_expired_keys(session, batch_size=3) == 4
+            remaining = await session.get(IdempotencyKey, (user_id, "key-4"))
+            assert remaining is not None
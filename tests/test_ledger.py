@@ -0,0 +1,208 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from uuid import UUID
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, insert, select
+
+from app.models.ledger import CREDIT, DEBIT, BalanceSnapshot, LedgerEntry
+from app.models.user import User
+from app.services.ledger_service import LedgerService
+from tests.conftest import TestAsyncSessionLocal
+
+T0 = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+async def _entries(payment_id: str) -> list:
+    async with TestAsyncSessionLocal() as session:
+        result = await session.execute(
+            select(LedgerEntry.account_id, LedgerEntry.side, LedgerEntry.amount)
+            .where(LedgerEntry.payment_id == UUID(payment_id))
+            .order_by(LedgerEntry.side)
+        )
+        return [tuple(row) for row in result]
+
+
+async def _seed(account_id: int, amounts_by_minute: dict) -> None:
+    async with TestAsyncSessionLocal() as session:
+        await session.execute(
+            insert(LedgerEntry),
+            [
+                {
+                    "account_id": account_id,
+                    "side": DEBIT if amount.startswith("-") else CREDIT,
+                    "amount": Decimal(amount),
+                    "created_at": T0 + timedelta(minutes=minute),
+                }
+                for minute, amount in amounts_by_minute.items()
+            ],
+        )
+        await session.commit()
+
+
+class TestLedgerEntries:
+    """Тесты проводок при подтверждении платежей"""
+
+    async def _create(self, client: TestClient, user: dict, item: dict) -> str:
+        response = client.post("/payments/", json=item, headers=user["headers"])
+        assert response.status_code == 200
+        return response.json()["id"]
+
+    async def test_confirm_writes_debit_and_credit(
+        self, client: TestClient, funded_user: dict, second_user: dict
+    ):
+        """Тест пары проводок на внутренний перевод"""
+        sender_id, receiver_id = funded_user["user"]["id"], second_user["user"]["id"]
+        payment_id = await self._create(
+            client, funded_user, {"amount": 100.00, "receiver_id": receiver_id}
+        )
+        client.put(f"/payments/{payment_id}/confirm", headers=funded_user["headers"])
+
+        entries = await _entries(payment_id)
+        assert entries == [
+            (receiver_id, CREDIT, Decimal("100.00")),
+            (sender_id, DEBIT, Decimal("-100.00")),
+        ]
+
+    async def test_external_payment_credits_clearing_account(
+        self, client: TestClient, funded_user: dict
+    ):
+        """Тест зачисления внешнего платежа на клиринговый счёт"""
+        payment_id = await self._create(
+            client,
+            funded_user,
+            {"amount": 50.00, "card_last_four": "1234", "card_holder_name": "John Doe"},
+        )
+        client.put(f"/payments/{payment_id}/confirm", headers=funded_user["headers"])
+
+        entries = await _entries(payment_id)
+        assert entries == [
+            (None, CREDIT, Decimal("50.00")),
+            (funded_user["user"]["id"], DEBIT, Decimal("-50.00")),
+        ]
+
+    async def test_batch_confirm_writes_entries_in_bulk(
+        self, client: TestClient, funded_user: dict, second_user: dict
+    ):
+        """Тест проводок пакетного подтверждения"""
+        item = {"amount": 10.00, "receiver_id": second_user["user"]["id"]}
+        ids = [await self._create(client, funded_user, item) for _ in range(3)]
+
+        response = client.put(
+            "/payments/confirm-batch", json={"payment_ids": ids}, headers=funded_user["headers"]
+        )
+        assert response.status_code == 200
+
+        async with TestAsyncSessionLocal() as session:
+            count, total = (
+                await session.execute(select(func.count(), func.sum(LedgerEntry.amount)))
+            ).one()
+        assert count == 6
+        assert total == 0
+
+    async def test_cancel_writes_nothing(self, client: TestClient, funded_user: dict):
+        """Тест отсутствия проводок у отменённого платежа"""
+        payment_id = await self._create(
+            client,
+            funded_user,
+            {"amount": 50.00, "card_last_four": "1234", "card_holder_name": "John Doe"},
+        )
+        client.put(f"/payments/{payment_id}/cancel", headers=funded_user["headers"])
+
+        assert await _entries(payment_id) == []
+
+
+class TestBalanceAsOf:
+    """Тесты баланса на момент времени по снимкам и хвосту проводок"""
+
+    async def test_matches_sum_of_entries_around_snapshots(self, authenticated_user: dict):
+        """Тест совпадения со скан-суммой до, на и после снимков"""
+        account_id = authenticated_user["user"]["id"]
+        amounts = {0: "100.00", 5: "-30.00", 10: "20.00", 15: "-5.50", 20: "40.00"}
+        await _seed(account_id, amounts)
+
+        async with TestAsyncSessionLocal() as session:
+            ledger = LedgerService(session)
+            assert await ledger.take_snapshots(T0 + timedelta(minutes=7)) == 1
+            assert await ledger.take_snapshots(T0 + timedelta(minutes=7)) == 0
+            assert await ledger.take_snapshots(T0 + timedelta(minutes=15)) == 1
+
+            for minute in (-1, 0, 3, 7, 9, 15, 17, 30):
+                at = T0 + timedelta(minutes=minute)
+                expected = sum(
+                    (Decimal(amount) for m, amount in amounts.items() if m <= minute), Decimal(0)
+                )
+                assert await ledger.balance_as_of(account_id, at) == expected
+
+            snapshots = await session.execute(
+                select(BalanceSnapshot.balance).order_by(BalanceSnapshot.taken_at)
+            )
+            assert snapshots.scalars().all() == [Decimal("70.00"), Decimal("84.50")]
+
+    def test_endpoint(self, client: TestClient, funded_user: dict, second_user: dict):
+        """Тест эндпоинта баланса на момент времени"""
+        item = {"amount": 100.00, "receiver_id": second_user["user"]["id"]}
+        payment_id = client.post("/payments/", json=item, headers=funded_user["headers"]).json()[
+            "id"
+        ]
+        client.put(f"/payments/{payment_id}/confirm", headers=funded_user["headers"])
+
+        now = client.get("/auth/me/balance", headers=second_user["headers"])
+        before = client.get(
+            "/auth/me/balance",
+            params={"at": "2020-01-01T00:00:00Z"},
+            headers=second_user["headers"],
+        )
+
+        assert now.status_code == 200
+        assert Decimal(now.json()["balance"]) == Decimal("100.00")
+        assert now.json()["user_id"] == second_user["user"]["id"]
+        assert Decimal(before.json()["balance"]) == 0
+
+
+class TestLedgerRebuild:
+    """Тесты пересчёта кеша балансов по журналу"""
+
+    async def test_rebuild_in_chunks(self, authenticated_user: dict, second_user: dict):
+        """Тест воспроизведения журнала пачками через границы счетов"""
+        first, second = authenticated_user["user"]["id"], second_user["user"]["id"]
+        await _seed(first, {0: "100.00", 1: "-40.00", 2: "15.00"})
+        await _seed(second, {0: "10.00", 3: "5.00"})
+
+        async with TestAsyncSessionLocal() as session:
+            ledger = LedgerService(session)
+            cutoff = T0 + timedelta(minutes=2)
+
+            dry = await ledger.rebuild(chunk_size=2, cutoff=cutoff, dry_run=True)
+            assert dry == {"entries": 5, "accounts": 2, "mismatched": 2}
+            assert await session.scalar(select(func.count()).select_from(BalanceSnapshot)) == 0
+
+            stats = await ledger.rebuild(chunk_size=2, cutoff=cutoff)
+            assert stats == {"entries": 5, "accounts": 2, "mismatched": 2}
+
+            balances = dict((await session.execute(select(User.id, User.balance))).all())
+            assert balances == {first: Decimal("75.00"), second: Decimal("15.00")}
+
+            snapshots = dict(
+                (
+                    await session.execute(
+                        select(BalanceSnapshot.account_id, BalanceSnapshot.balance)
+                    )
+                ).all()
+            )
+            assert snapshots == {first: Decimal("75.00"), second: Decimal("10.00")}
+            assert await ledger.balance_as_of(second, T0 + timedelta(minutes=5)) == 15
+
+            again = await ledger.rebuild(chunk_size=2, cutoff=cutoff)
+            assert again["mismatched"] == 0
+
+    async def test_rebuild_resets_balances_missing_from_ledger(self, funded_user: dict):
+        """Тест обнуления кеша у пользователя без проводок"""
+        async with TestAsyncSessionLocal() as session:
+            stats = await LedgerService(session).rebuild(chunk_size=100, cutoff=T0)
+            balance = await session.scalar(
+                select(User.balance).where(User.id == funded_user["user"]["id"])
+            )
+
+        assert stats == {"entries": 0, "accounts": 0, "mismatched": 1}
+        assert balance == 0
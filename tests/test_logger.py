@@ -0,0 +1,68 @@
+import json
+import logging
+
+from app.utils.logger import DroppingQueueHandler, JsonFormatter, SamplingFilter
+
+
+def make_record(name: str = "app.test", level: int = logging.INFO, msg: str = "message %s"):
+    return logging.LogRecord(name, level, __file__, 1, msg, ("arg",), None)
+
+
+class TestJsonFormatter:
+    """Тесты JSON-форматирования логов"""
+
+    def test_format(self):
+        """Тест полей JSON-записи и отложенной подстановки аргументов"""
+        record = make_record()
+        record.payment_id = 42
+
+        payload = json.loads(JsonFormatter().format(record))
+
+        assert payload["level"] == "INFO"
+        assert payload["logger"] == "app.test"
+        assert payload["message"] == "message arg"
+        assert payload["payment_id"] == 42
+
+
+class TestDroppingQueueHandler:
+    """Тесты ограниченной очереди логов"""
+
+    def test_drops_when_full(self):
+        """Тест отбрасывания записей при переполнении очереди"""
+        handler = DroppingQueueHandler(maxsize=2)
+
+        for _ in range(5):
+            handler.handle(make_record())
+
+        assert handler.stats() == {"queued": 2, "dropped": 3}
+
+    def test_formatting_is_deferred(self):
+        """Тест того, что запись попадает в очередь без форматирования"""
+        handler = DroppingQueueHandler(maxsize=1)
+        record = make_record()
+
+        handler.handle(record)
+
+        queued = handler.queue.get_nowait()
+        assert queued is record
+        assert queued.args == ("arg",)
+
+
+class TestSamplingFilter:
+    """Тесты выборочного логирования"""
+
+    def test_samples_info_records(self):
+        """Тест пропуска доли INFO-записей логгера и его потомков"""
+        sampling = SamplingFilter({"app.services": 0.25})
+
+        passed = [sampling.filter(make_record("app.services.payment_service")) for _ in range(8)]
+
+        assert passed.count(True) == 2
+
+    def test_warnings_and_other_loggers_pass(self):
+        """Тест того, что предупреждения и другие логгеры не отбрасываются"""
+        sampling = SamplingFilter({"app.services": 0})
+
+        assert sampling.filter(make_record("app.services", logging.WARNING))
+        assert sampling.filter(make_record("app.routers"))
+        assert not sampling.filter(make_record("app.services"))
@@ -0,0 +1,114 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import Settings, settings
+from app.core.metrics import MetricsRegistry
+from app.main import create_app
+
+
+def sample(text: str, name: str, **labels: str) -> float:
+    """Значение метрики из текстового вывода Prometheus"""
+    for line in text.splitlines():
+        match = re.match(r"^([a-zA-Z_:][\w:]*)(?:\{(.*)\})? (\S+)$", line)
+        if match is None or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ""))
+        if all(found.get(key) == value for key, value in labels.items()):
+            return float(match.group(3))
+    return 0.0
+
+
+class TestMetricsRegistry:
+    """Тесты реестра метрик"""
+
+    def test_counter_render(self):
+        """Тест вывода счётчика с метками"""
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Запросы", ("route",))
+        requests.labels('/a"b').inc(2)
+
+        text = registry.render()
+
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{route="/a\\"b"} 2' in text
+
+    def test_histogram_render(self):
+        """Тест накопленных корзин гистограммы"""
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Задержка", buckets=(0.1, 1.0))
+        child = latency.labels()
+        child.observe(0.05)
+        child.observe(0.5)
+        child.observe(5)
+
+        text = registry.render()
+
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1.0"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert "latency_seconds_count 3" in text
+        assert "latency_seconds_sum 5.55" in text
+
+    def test_collector(self):
+        """Тест метрики, вычисляемой при выгрузке"""
+        registry = MetricsRegistry()
+        registry.collector("queue_depth", "Глубина очереди", "gauge", (), lambda: [((), 7)])
+
+        assert "queue_depth 7" in registry.render()
+
+    def test_labels_are_cached(self):
+        """Тест того, что дочерняя метрика создаётся один раз"""
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Запросы", ("route",))
+
+        assert requests.labels("/a") is requests.labels("/a")
+
+
+class TestMetricsEndpoint:
+    """Тесты эндпоинта /metrics"""
+
+    def test_route_sql_and_transition_metrics(self, client: TestClient, funded_user: dict):
+        """Тест метрик маршрутов, SQL и переходов платежей"""
+        before = client.get("/metrics").text
+
+        response = client.post(
+            "/payments/", json={"amount": "10.00"}, headers=funded_user["headers"]
+        )
+        payment_id = response.json()["id"]
+        client.put(f"/payments/{payment_id}/confirm", headers=funded_user["headers"])
+
+        response = client.get("/metrics")
+        text = response.text
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+
+        assert sample(text, "http_requests_total", router="auth", route="/auth/register") >= 1
+
+        confirm = {"router": "payments", "method": "PUT", "route": "/payments/{payment_id}/confirm"}
+        for name, labels in (
+            ("http_requests_total", dict(confirm, status="200")),
+            ("http_request_duration_seconds_count", confirm),
+            ("db_query_duration_seconds_count", {"operation": "UPDATE"}),
+            ("db_transaction_duration_seconds_count", {"outcome": "commit"}),
+            ("payment_transitions_total", {"from_status": "new", "to_status": "created"}),
+            ("payment_transitions_total", {"from_status": "created", "to_status": "paid"}),
+        ):
+            assert sample(text, name, **labels) > sample(before, name, **labels), name
+
+    def test_disabled_by_default(self, monkeypatch: pytest.MonkeyPatch):
+        """Тест: без METRICS_ENABLED эндпоинт не подключается"""
+        assert Settings().metrics_enabled is False
+        monkeypatch.setattr(settings, "metrics_enabled", False)
+
+        assert TestClient(create_app()).get("/metrics").status_code == 404
+
+    def test_requires_token(self, client: TestClient, monkeypatch: pytest.MonkeyPatch):
+        """Тест: при заданном METRICS_TOKEN метрики отдаются только с токеном"""
+        monkeypatch.setattr(settings, "metrics_token", "scrape")
+
+        assert client.get("/metrics").status_code == 401
+        response = client.get("/metrics", headers={"Authorization": "Bearer scrape"})
+        assert response.status_code == 200
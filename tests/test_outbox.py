@@ -0,0 +1,190 @@
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from uuid import UUID
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+from app.core.outbox import FileEventSink, HttpEventSink, LogEventSink, build_sink
+from app.models.outbox import OutboxEvent
+from app.services.outbox_service import OutboxService
+from tests.conftest import TestAsyncSessionLocal
+
+
+class ListSink:
+    """Получатель, запоминающий опубликованные пачки"""
+
+    def __init__(self, fail: bool = False) -> None:
+        self.batches: list = []
+        self.fail = fail
+
+    async def publish(self, events: list) -> None:
+        if self.fail:
+            raise ConnectionError("получатель недоступен")
+        self.batches.append(events)
+
+    async def close(self) -> None:
+        pass
+
+
+async def _outbox() -> list:
+    async with TestAsyncSessionLocal() as session:
+        result = await session.execute(select(OutboxEvent).order_by(OutboxEvent.id))
+        return list(result.scalars().all())
+
+
+async def _dispatch(sink, batch_size: int = 100) -> int:
+    async with TestAsyncSessionLocal() as session:
+        return await OutboxService(session).dispatch(sink, batch_size)
+
+
+class TestOutboxRecording:
+    """Тесты записи событий в транзакции изменения платежа"""
+
+    async def test_events_follow_status_changes(
+        self, client: TestClient, funded_user: dict, create_payment: Callable[..., str]
+    ):
+        """Тест событий создания, подтверждения и отмены"""
+        paid = create_payment(funded_user)
+        cancelled = create_payment(funded_user)
+        client.put(f"/payments/{paid}/confirm", headers=funded_user["headers"])
+        client.put(f"/payments/{cancelled}/cancel", headers=funded_user["headers"])
+
+        events = [(str(row.aggregate_id), row.event_type) for row in await _outbox()]
+
+        assert events == [
+            (paid, "payment.created"),
+            (cancelled, "payment.created"),
+            (paid, "payment.paid"),
+            (cancelled, "payment.cancelled"),
+        ]
+
+    async def test_rejected_change_writes_nothing(
+        self, client: TestClient, funded_user: dict, create_payment: Callable[..., str]
+    ):
+        """Тест отсутствия события при неудачном подтверждении"""
+        payment_id = create_payment(funded_user)
+        client.put(f"/payments/{payment_id}/cancel", headers=funded_user["headers"])
+        client.put(f"/payments/{payment_id}/confirm", headers=funded_user["headers"])
+
+        assert [row.event_type for row in await _outbox()] == [
+            "payment.created",
+            "payment.cancelled",
+        ]
+
+
+class TestOutboxDispatch:
+    """Тесты доставки событий"""
+
+    async def test_publishes_in_batches_and_deletes(
+        self, client: TestClient, funded_user: dict, create_payment: Callable[..., str]
+    ):
+        """Тест публикации пачками и удаления доставленных строк"""
+        first, second = create_payment(funded_user), create_payment(funded_user)
+        client.put(f"/payments/{first}/cancel", headers=funded_user["headers"])
+        sink = ListSink()
+
+        assert await _dispatch(sink, batch_size=10) == 2
+        assert await _dispatch(sink, batch_size=10) == 1
+        assert await _dispatch(sink, batch_size=10) == 0
+
+        batches = [[(event["aggregate_id"], event["type"]) for event in b] for b in sink.batches]
+        assert batches == [
+            [(first, "payment.created"), (second, "payment.created")],
+            [(first, "payment.cancelled")],
+        ]
+        assert sink.batches[0][0]["data"]["amount"] == "10.00"
+        assert await _outbox() == []
+
+    async def test_failure_postpones_batch(
+        self, client: TestClient, funded_user: dict, create_payment: Callable[..., str]
+    ):
+        """Тест отложенного повтора после ошибки получателя"""
+        create_payment(funded_user)
+
+        assert await _dispatch(ListSink(fail=True)) == 0
+        assert await _dispatch(ListSink()) == 0
+
+        [row] = await _outbox()
+        assert row.attempts == 1
+        assert row.available_at is not None
+
+    async def test_keeps_order_per_payment(
+        self, client: TestClient, funded_user: dict, create_payment: Callable[..., str]
+    ):
+        """Тест: событие не обгоняет отложенное предыдущее событие платежа"""
+        delayed, ready = create_payment(funded_user), create_payment(funded_user)
+        client.put(f"/payments/{delayed}/cancel", headers=funded_user["headers"])
+        async with TestAsyncSessionLocal() as session:
+            await session.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.aggregate_id == UUID(delayed))
+                .where(OutboxEvent.event_type == "payment.created")
+                .values(available_at=datetime.now(timezone.utc) + timedelta(minutes=5))
+            )
+            await session.commit()
+        sink = ListSink()
+
+        assert await _dispatch(sink) == 1
+        assert [event["aggregate_id"] for event in sink.batches[0]] == [ready]
+
+
+class TestEventSinks:
+    """Тесты получателей событий"""
+
+    async def test_file_sink_appends_ndjson(self, tmp_path):
+        """Тест дописывания событий в файл"""
+        path = tmp_path / "events.ndjson"
+        sink = FileEventSink(str(path))
+
+        await sink.publish([{"id": 1}, {"id": 2}])
+        await sink.publish([{"id": 3}])
+
+        assert [json.loads(line)["id"] for line in path.read_text().splitlines()] == [1, 2, 3]
+
+    async def test_file_sink_rotates(self, tmp_path):
+        """Тест ротации файла по размеру с ограниченным числом копий"""
+        path = tmp_path / "events.ndjson"
+        sink = FileEventSink(str(path), max_bytes=10, backups=2)
+
+        for event_id in range(1, 5):
+            await sink.publish([{"id": event_id}])
+
+        assert sorted(item.name for item in tmp_path.iterdir()) == [
+            "events.ndjson",
+            "events.ndjson.1",
+            "events.ndjson.2",
+        ]
+        assert json.loads(path.read_text())["id"] == 4
+        assert json.loads((tmp_path / "events.ndjson.2").read_text())["id"] == 2
+
+    async def test_log_sink_is_default(self, caplog: pytest.LogCaptureFixture):
+        """Тест: по умолчанию события пишутся в лог, а не в файл"""
+        sink = build_sink()
+        assert isinstance(sink, LogEventSink)
+
+        with caplog.at_level(logging.INFO, logger="app.outbox.events"):
+            await sink.publish([{"id": 7, "type": "payment.paid"}])
+
+        [record] = caplog.records
+        assert record.event == {"id": 7, "type": "payment.paid"}
+
+    async def test_http_sink_posts_batch(self):
+        """Тест отправки пачки и ошибки при ответе 5xx"""
+        received = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            received.append(json.loads(request.content))
+            return httpx.Response(503 if len(received) > 1 else 204)
+
+        sink = HttpEventSink("http://events.local/", 1.0, transport=httpx.MockTransport(handler))
+        await sink.publish([{"id": 1}])
+        with pytest.raises(httpx.HTTPStatusError):
+            await sink.publish([{"id": 2}])
+        await sink.close()
+
+        assert received == [[{"id": 1}], [{"id": 2}]]
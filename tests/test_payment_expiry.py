@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from uuid import UUID
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+from app.models.outbox import OutboxEvent
+from app.models.payment import Payment, PaymentStatus
+from app.services.payment_service import PAYMENTS_EXPIRED, PaymentService
+from tests.conftest import TestAsyncSessionLocal
+
+
+async def _backdate(payment_ids: list, hours: int) -> None:
+    async with TestAsyncSessionLocal() as session:
+        await session.execute(
+            update(Payment)
+            .where(Payment.id.in_([UUID(payment_id) for payment_id in payment_ids]))
+            .values(created_at=datetime.now(timezone.utc) - timedelta(hours=hours))
+        )
+        await session.commit()
+
+
+async def _expire(batch_size: int = 100) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=1)
+    async with TestAsyncSessionLocal() as session:
+        return await PaymentService(session).expire_stale_payments(cutoff, batch_size)
+
+
+async def _statuses() -> dict:
+    async with TestAsyncSessionLocal() as session:
+        result = await session.execute(select(Payment.id, Payment.status))
+        return {str(payment_id): status for payment_id, status in result}
+
+
+class TestPaymentExpiry:
+    """Тесты отмены просроченных неподтверждённых платежей"""
+
+    async def test_expires_only_stale_created(
+        self, client: TestClient, funded_user: dict, create_payment: Callable[..., str]
+    ):
+        """Тест: отменяются старые платежи в CREATED, свежие и оплаченные не меняются"""
+        stale = [create_payment(funded_user) for _ in range(5)]
+        paid, fresh = create_payment(funded_user), create_payment(funded_user)
+        client.put(f"/payments/{paid}/confirm", headers=funded_user["headers"])
+        await _backdate([*stale, paid], hours=2)
+        expired_before = PAYMENTS_EXPIRED.value
+
+        assert await _expire(batch_size=2) == 5
+
+        statuses = await _statuses()
+        assert {statuses[payment_id] for payment_id in stale} == {PaymentStatus.CANCELLED}
+        assert statuses[paid] == PaymentStatus.PAID
+        assert statuses[fresh] == PaymentStatus.CREATED
+        assert PAYMENTS_EXPIRED.value - expired_before == 5
+        assert await _expire() == 0
+
+    async def test_expiry_updates_stats_and_outbox(
+        self, client: TestClient, funded_user: dict, create_payment: Callable[..., str]
+    ):
+        """Тест: статистика и события такие же, как при ручной отмене"""
+        payment_id = create_payment(funded_user)
+        await _backdate([payment_id], hours=2)
+
+        assert await _expire() == 1
+
+        stats = client.get("/payments/stats", headers=funded_user["headers"]).json()
+        by_status = stats["sent"]["by_status"]
+        assert by_status["cancelled"]["count"] == 1
+        assert by_status.get("created", {"count": 0})["count"] == 0
+
+        async with TestAsyncSessionLocal() as session:
+            result = await session.execute(
+                select(OutboxEvent.event_type)
+                .where(OutboxEvent.aggregate_id == UUID(payment_id))
+                .order_by(OutboxEvent.id)
+            )
+            assert list(result.scalars()) == ["payment.created", "payment.cancelled"]
+
+        response = client.put(f"/payments/{payment_id}/confirm", headers=funded_user["headers"])
+        assert response.status_code == 400
+
+    async def test_cancel_after_expiry_changes_nothing(
+        self, client: TestClient, funded_user: dict, create_payment: Callable[..., str]
+    ):
+        """Тест: отмена по устаревшему объекту сессии не отменяет платеж второй раз"""
+        payment_id = create_payment(funded_user)
+        await _backdate([payment_id], hours=2)
+
+        async with TestAsyncSessionLocal() as session:
+            service = PaymentService(session)
+            stale = await service._get_payment_by_id(UUID(payment_id))
+            assert stale.status == PaymentStatus.CREATED
+            assert await _expire() == 1
+
+            with pytest.raises(ValueError, match="уже обработан"):
+                await service.cancel_payment(UUID(payment_id), funded_user["user"]["id"])
+
+        stats = client.get("/payments/stats", headers=funded_user["headers"]).json()
+        assert stats["sent"]["by_status"]["cancelled"]["count"] == 1
+        async with TestAsyncSessionLocal() as session:
+            result = await session.execute(
+                select(OutboxEvent.event_type).where(OutboxEvent.aggregate_id == UUID(payment_id))
+            )
+            assert list(result.scalars()).count("payment.cancelled") == 1
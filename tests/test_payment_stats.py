@@ -0,0 +1,173 @@
+from datetime import datetime, timezone
+from typing import Callable
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, func, insert, select
+
+from app.models.payment import PaymentStatus
+from app.models.payment_stats import PaymentStat, PaymentStatDelta
+from app.services.payment_stats_service import PaymentStatsService, recent_months
+from tests.conftest import TestAsyncSessionLocal
+
+
+async def _count(session, model) -> int:
+    return (await session.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+def _totals(stats: dict, direction: str, status: str) -> tuple:
+    totals = stats[direction]["by_status"][status]
+    return totals["count"], float(totals["amount"])
+
+
+class TestPaymentStats:
+    """Тесты статистики платежей пользователя"""
+
+    def test_follows_payment_lifecycle(
+        self,
+        client: TestClient,
+        funded_user: dict,
+        second_user: dict,
+        create_payment: Callable[..., str],
+    ):
+        """Тест обновления агрегатов при создании, подтверждении и отмене"""
+        receiver_id = second_user["user"]["id"]
+        paid = create_payment(funded_user, {"amount": 100.00, "receiver_id": receiver_id})
+        cancelled = create_payment(funded_user, {"amount": 30.00, "receiver_id": receiver_id})
+        create_payment(funded_user)
+        client.put(f"/payments/{paid}/confirm", headers=funded_user["headers"])
+        client.put(f"/payments/{cancelled}/cancel", headers=funded_user["headers"])
+
+        sent = client.get("/payments/stats", headers=funded_user["headers"]).json()
+        received = client.get("/payments/stats", headers=second_user["headers"]).json()
+
+        assert (sent["sent"]["count"], float(sent["sent"]["amount"])) == (3, 140.0)
+        assert _totals(sent, "sent", "created") == (1, 10.0)
+        assert _totals(sent, "sent", "paid") == (1, 100.0)
+        assert _totals(sent, "sent", "cancelled") == (1, 30.0)
+        assert sent["received"]["count"] == 0
+
+        assert _totals(received, "received", "paid") == (1, 100.0)
+        assert _totals(received, "received", "cancelled") == (1, 30.0)
+
+        month = datetime.now(timezone.utc).strftime("%Y-%m")
+        assert len(sent["monthly"]) == 12
+        assert sent["monthly"][0]["month"] == month
+        assert sent["monthly"][0]["sent"]["count"] == 1
+        assert float(received["monthly"][0]["received"]["amount"]) == 100.0
+
+    async def test_monthly_window_is_calendar(self, client: TestClient, funded_user: dict):
+        """Тест: окно — календарные месяцы, пустые заполнены нулями, старые не попадают"""
+        user_id = funded_user["user"]["id"]
+        months = recent_months(6)
+        async with TestAsyncSessionLocal() as session:
+            await session.execute(
+                insert(PaymentStat),
+                [
+                    {
+                        "user_id": user_id,
+                        "direction": "sent",
+                        "status": PaymentStatus.PAID,
+                        "month": month,
+                        "count": 1,
+                        "amount": amount,
+                    }
+                    for month, amount in ((months[0], 10), (months[2], 20), (months[5], 40))
+                ],
+            )
+            await session.commit()
+
+        stats = client.get(
+            "/payments/stats", params={"months": 3}, headers=funded_user["headers"]
+        ).json()
+
+        assert [item["month"] for item in stats["monthly"]] == months[:3]
+        assert [float(item["sent"]["amount"]) for item in stats["monthly"]] == [10.0, 0.0, 20.0]
+        assert stats["sent"]["count"] == 3
+
+    def test_recent_months_cross_year(self):
+        """Тест перехода через границу года"""
+        now = datetime(2026, 2, 15, tzinfo=timezone.utc)
+
+        assert recent_months(3, now) == ["2026-02", "2026-01", "2025-12"]
+
+    def test_batches(self, client: TestClient, funded_user: dict, second_user: dict):
+        """Тест агрегатов для пакетного создания и подтверждения"""
+        items = [{"amount": 5.00, "receiver_id": second_user["user"]["id"]}] * 3
+        created = client.post(
+            "/payments/batch", json={"items": items}, headers=funded_user["headers"]
+        ).json()
+        ids = [result["payment"]["id"] for result in created["results"]]
+        client.put(
+            "/payments/confirm-batch",
+            json={"payment_ids": ids[:2]},
+            headers=funded_user["headers"],
+        )
+
+        stats = client.get("/payments/stats", headers=funded_user["headers"]).json()
+
+        assert _totals(stats, "sent", "created") == (1, 5.0)
+        assert _totals(stats, "sent", "paid") == (2, 10.0)
+
+
+class TestPaymentStatsFold:
+    """Тесты переноса изменений статистики в агрегаты"""
+
+    async def test_writes_append_deltas_and_fold_merges_them(
+        self,
+        client: TestClient,
+        funded_user: dict,
+        second_user: dict,
+        create_payment: Callable[..., str],
+    ):
+        """Тест: платежи пишут только изменения, перенос пачками не меняет ответ"""
+        receiver_id = second_user["user"]["id"]
+        for _ in range(3):
+            paid = create_payment(funded_user, {"amount": 10.00, "receiver_id": receiver_id})
+            client.put(f"/payments/{paid}/confirm", headers=funded_user["headers"])
+        before = client.get("/payments/stats", headers=second_user["headers"]).json()
+
+        async with TestAsyncSessionLocal() as session:
+            assert await _count(session, PaymentStat) == 0
+            deltas = await _count(session, PaymentStatDelta)
+
+            assert await PaymentStatsService(session).fold(batch_size=4) == deltas
+            assert await _count(session, PaymentStatDelta) == 0
+            assert await _count(session, PaymentStat) > 0
+
+        after = client.get("/payments/stats", headers=second_user["headers"]).json()
+        assert after == before
+        assert _totals(after, "received", "paid") == (3, 30.0)
+
+
+class TestPaymentStatsBackfill:
+    """Тесты пересчёта и проверки статистики"""
+
+    async def test_backfill_restores_and_check_detects(
+        self,
+        client: TestClient,
+        funded_user: dict,
+        second_user: dict,
+        create_payment: Callable[..., str],
+    ):
+        """Тест пересчёта порциями после потери агрегатов"""
+        receiver_id = second_user["user"]["id"]
+        paid = create_payment(funded_user, {"amount": 20.00, "receiver_id": receiver_id})
+        create_payment(funded_user)
+        client.put(f"/payments/{paid}/confirm", headers=funded_user["headers"])
+        before = client.get("/payments/stats", headers=funded_user["headers"]).json()
+
+        async with TestAsyncSessionLocal() as session:
+            service = PaymentStatsService(session)
+            assert await service.check(chunk_size=1) == []
+            assert await service.fold(batch_size=100) > 0
+
+            await session.execute(delete(PaymentStat))
+            await session.commit()
+            assert await service.check(chunk_size=1) == [funded_user["user"]["id"], receiver_id]
+
+            result = await service.backfill(chunk_size=1)
+            assert result == {"users": 2, "rows": 3}
+            assert await service.check(chunk_size=1) == []
+
+        after = client.get("/payments/stats", headers=funded_user["headers"]).json()
+        assert after == before
@@ -1,4 +1,14 @@
+import csv
+import io
+import json
+from decimal import Decimal
+
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.services.payment_service import balance_deltas_update
 
 
 class TestPayments:
@@ -165,6 +175,21 @@ class TestPayments:
         for payment in data:
             assert payment["sender_id"] == funded_user["user"]["id"]
 
+    def test_list_matches_single_payment_format(self, client: TestClient, funded_user: dict):
+        """Тест одинакового формата платежа в списке и при получении по ID"""
+        created = client.post(
+            "/payments/",
+            json={"amount": "42.10", "card_last_four": "4242"},
+            headers=funded_user["headers"],
+        ).json()
+
+        listed = client.get("/payments/", headers=funded_user["headers"]).json()
+        single = client.get(f"/payments/{created['id']}", headers=funded_user["headers"]).json()
+
+        assert listed == [single]
+        assert single["amount"] == "42.10"
+        assert single["sender_username"] is None
+
     def test_get_payment_by_id_success(self, client: TestClient, funded_user: dict):
         """Тест получения платежа по ID"""
         payment_data = {
@@ -242,3 +267,416 @@ class TestPayments:
 
         assert response.status_code == 403
         assert "нет доступа" in response.json()["detail"]
+
+
+class TestPaymentPagination:
+    """Тесты курсорной пагинации списка платежей"""
+
+    def _create_payments(self, client: TestClient, funded_user: dict, receiver_id: int):
+        for i in range(5):
+            payment_data = {"amount": 10.00 + i, "description": f"Payment {i}"}
+            if i % 2:
+                payment_data["receiver_id"] = receiver_id
+            else:
+                payment_data.update({"card_last_four": "1234", "card_holder_name": "John Doe"})
+            response = client.post("/payments/", json=payment_data, headers=funded_user["headers"])
+            assert response.status_code == 200
+
+    def test_cursor_walks_all_pages(self, client: TestClient, funded_user: dict, second_user: dict):
+        """Тест обхода всех страниц по курсору"""
+        self._create_payments(client, funded_user, second_user["user"]["id"])
+
+        seen = []
+        params = {"limit": 2}
+        while True:
+            response = client.get("/payments/", params=params, headers=funded_user["headers"])
+            assert response.status_code == 200
+            seen.extend(payment["id"] for payment in response.json())
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if next_cursor is None:
+                break
+            params = {"limit": 2, "cursor": next_cursor}
+
+        full = client.get("/payments/", headers=funded_user["headers"]).json()
+        assert seen == [payment["id"] for payment in full]
+        assert len(set(seen)) == 5
+
+    def test_receiver_sees_incoming_payments(
+        self, client: TestClient, funded_user: dict, second_user: dict
+    ):
+        """Тест выдачи входящих платежей получателю"""
+        self._create_payments(client, funded_user, second_user["user"]["id"])
+
+        response = client.get("/payments/", headers=second_user["headers"])
+
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+        assert all(p["receiver_id"] == second_user["user"]["id"] for p in response.json())
+
+    def test_offset_still_supported(self, client: TestClient, funded_user: dict, second_user: dict):
+        """Тест обратной совместимости с offset"""
+        self._create_payments(client, funded_user, second_user["user"]["id"])
+
+        full = client.get("/payments/", headers=funded_user["headers"]).json()
+        response = client.get("/payments/?offset=3", headers=funded_user["headers"])
+
+        assert [p["id"] for p in response.json()] == [p["id"] for p in full[3:]]
+
+    def test_invalid_cursor(self, client: TestClient, funded_user: dict):
+        """Тест некорректного курсора"""
+        response = client.get("/payments/?cursor=not-a-cursor", headers=funded_user["headers"])
+
+        assert response.status_code == 400
+
+
+class TestConfirmPayment:
+    """Тесты атомарного подтверждения платежа"""
+
+    def test_internal_transfer_moves_balance(
+        self, client: TestClient, funded_user: dict, second_user: dict
+    ):
+        """Тест списания у отправителя и зачисления получателю"""
+        payment_data = {"amount": 250.00, "receiver_id": second_user["user"]["id"]}
+        payment_id = client.post(
+            "/payments/", json=payment_data, headers=funded_user["headers"]
+        ).json()["id"]
+
+        response = client.put(f"/payments/{payment_id}/confirm", headers=funded_user["headers"])
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "paid"
+        assert response.json()["paid_at"] is not None
+        sender = client.get("/auth/me", headers=funded_user["headers"]).json()
+        receiver = client.get("/auth/me", headers=second_user["headers"]).json()
+        assert float(sender["balance"]) == 750.00
+        assert float(receiver["balance"]) == 250.00
+
+    def test_second_confirm_fails_without_funds(self, client: TestClient, funded_user: dict):
+        """Тест отказа в подтверждении, когда средства уже списаны другим платежом"""
+        payment_data = {"amount": 600.00, "card_last_four": "1234", "card_holder_name": "John"}
+        first = client.post("/payments/", json=payment_data, headers=funded_user["headers"])
+        second = client.post("/payments/", json=payment_data, headers=funded_user["headers"])
+
+        response1 = client.put(
+            f"/payments/{first.json()['id']}/confirm", headers=funded_user["headers"]
+        )
+        response2 = client.put(
+            f"/payments/{second.json()['id']}/confirm", headers=funded_user["headers"]
+        )
+
+        assert response1.status_code == 200
+        assert response2.status_code == 400
+        assert "Недостаточно средств" in response2.json()["detail"]
+        payment = client.get(f"/payments/{second.json()['id']}", headers=funded_user["headers"])
+        assert payment.json()["status"] == "created"
+        me = client.get("/auth/me", headers=funded_user["headers"]).json()
+        assert float(me["balance"]) == 400.00
+
+    def test_confirm_foreign_payment(
+        self, client: TestClient, funded_user: dict, second_user: dict
+    ):
+        """Тест подтверждения чужого платежа"""
+        payment_data = {"amount": 10.00, "card_last_four": "1234", "card_holder_name": "John"}
+        payment_id = client.post(
+            "/payments/", json=payment_data, headers=funded_user["headers"]
+        ).json()["id"]
+
+        response = client.put(f"/payments/{payment_id}/confirm", headers=second_user["headers"])
+
+        assert response.status_code == 400
+        assert "только свои платежи" in response.json()["detail"]
+
+    def test_confirm_uses_few_statements(
+        self, client: TestClient, funded_user: dict, second_user: dict
+    ):
+        """Тест числа запросов к БД при подтверждении"""
+        from sqlalchemy import event
+
+        from tests.conftest import test_engine
+
+        payment_data = {"amount": 10.00, "receiver_id": second_user["user"]["id"]}
+        payment_id = client.post(
+            "/payments/", json=payment_data, headers=funded_user["headers"]
+        ).json()["id"]
+        client.get("/payments/", headers=funded_user["headers"])
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            response = client.put(f"/payments/{payment_id}/confirm", headers=funded_user["headers"])
+        finally:
+            event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        # Само подтверждение — два запроса (на PostgreSQL ещё SELECT ... FOR UPDATE
+        # строк пользователей). Проводки журнала, статистика и событие outbox пишутся
+        # в той же транзакции по одному INSERT, иначе они разошлись бы с платежом
+        assert [" ".join(statement.split()[:3]) for statement in statements] == [
+            "UPDATE payments SET",
+            "UPDATE users SET",
+            "INSERT INTO ledger_entries",
+            "INSERT INTO payment_stat_deltas",
+            "INSERT INTO outbox",
+        ]
+
+
+class TestPaymentBatch:
+    """Тесты пакетного создания платежей"""
+
+    def test_batch_create_success(self, client: TestClient, funded_user: dict, second_user: dict):
+        """Тест создания пачки платежей"""
+        items = [
+            {"amount": 10.00, "receiver_id": second_user["user"]["id"]},
+            {"amount": 20.00, "card_last_four": "1234", "card_holder_name": "John Doe"},
+            {"amount": 30.00, "receiver_id": second_user["user"]["id"], "description": "Third"},
+        ]
+
+        response = client.post(
+            "/payments/batch", json={"items": items}, headers=funded_user["headers"]
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 3
+        assert data["failed"] == 0
+        assert [r["payment"]["amount"] for r in data["results"]] == ["10.00", "20.00", "30.00"]
+        assert all(r["payment"]["status"] == "created" for r in data["results"])
+
+        listed = client.get("/payments/", headers=funded_user["headers"]).json()
+        assert len(listed) == 3
+
+    def test_batch_atomic_rejects_everything(
+        self, client: TestClient, funded_user: dict, second_user: dict
+    ):
+        """Тест отказа всей пачки в режиме «все или ничего»"""
+        items = [
+            {"amount": 10.00, "receiver_id": second_user["user"]["id"]},
+            {"amount": 10.00, "receiver_id": 999999},
+        ]
+
+        response = client.post(
+            "/payments/batch", json={"items": items}, headers=funded_user["headers"]
+        )
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == [{"index": 1, "error": "Получатель не найден"}]
+        assert client.get("/payments/", headers=funded_user["headers"]).json() == []
+
+    def test_batch_partial_success(self, client: TestClient, funded_user: dict, second_user: dict):
+        """Тест частичного успеха пачки"""
+        items = [
+            {"amount": 10.00, "receiver_id": second_user["user"]["id"]},
+            {"amount": 5000.00, "receiver_id": second_user["user"]["id"]},
+            {"amount": 10.00, "receiver_id": funded_user["user"]["id"]},
+        ]
+
+        response = client.post(
+            "/payments/batch",
+            json={"items": items, "atomic": False},
+            headers=funded_user["headers"],
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 1
+        assert data["failed"] == 2
+        assert data["results"][0]["payment"] is not None
+        assert "Недостаточно средств" in data["results"][1]["error"]
+        assert "самому себе" in data["results"][2]["error"]
+
+    def test_batch_size_limit(self, client: TestClient, funded_user: dict, monkeypatch):
+        """Тест ограничения размера пачки"""
+        from app.core.config import settings
+
+        monkeypatch.setattr(settings, "payment_batch_max_items", 2)
+        items = [{"amount": 1.00, "card_last_four": "1234"}] * 3
+
+        response = client.post(
+            "/payments/batch", json={"items": items}, headers=funded_user["headers"]
+        )
+
+        assert response.status_code == 422
+
+
+class TestConfirmBatch:
+    """Тесты пакетного подтверждения платежей"""
+
+    def _create(self, client: TestClient, user: dict, amount: float, receiver_id=None) -> str:
+        payment_data = {"amount": amount}
+        if receiver_id is None:
+            payment_data.update({"card_last_four": "1234", "card_holder_name": "John Doe"})
+        else:
+            payment_data["receiver_id"] = receiver_id
+        response = client.post("/payments/", json=payment_data, headers=user["headers"])
+        assert response.status_code == 200
+        return response.json()["id"]
+
+    def test_confirm_batch_nets_balances(
+        self, client: TestClient, funded_user: dict, second_user: dict
+    ):
+        """Тест подтверждения пачки с итоговым изменением балансов"""
+        receiver_id = second_user["user"]["id"]
+        ids = [
+            self._create(client, funded_user, 100.00, receiver_id),
+            self._create(client, funded_user, 50.00, receiver_id),
+            self._create(client, funded_user, 25.00),
+        ]
+
+        response = client.put(
+            "/payments/confirm-batch", json={"payment_ids": ids}, headers=funded_user["headers"]
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 3
+        assert all(r["payment"]["status"] == "paid" for r in data["results"])
+        sender = client.get("/auth/me", headers=funded_user["headers"]).json()
+        receiver = client.get("/auth/me", headers=second_user["headers"]).json()
+        assert float(sender["balance"]) == 825.00
+        assert float(receiver["balance"]) == 150.00
+
+    def test_confirm_batch_reports_ineligible(self, client: TestClient, funded_user: dict):
+        """Тест отчёта по платежам, которые нельзя подтвердить"""
+        paid_id = self._create(client, funded_user, 10.00)
+        client.put(f"/payments/{paid_id}/confirm", headers=funded_user["headers"])
+        fresh_id = self._create(client, funded_user, 10.00)
+        missing_id = "550e8400-e29b-41d4-a716-446655440000"
+
+        response = client.put(
+            "/payments/confirm-batch",
+            json={"payment_ids": [paid_id, fresh_id, missing_id]},
+            headers=funded_user["headers"],
+        )
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert "уже обработан" in results[0]["error"]
+        assert results[1]["payment"]["status"] == "paid"
+        assert "не найден" in results[2]["error"]
+
+    def test_confirm_batch_is_all_or_nothing_on_funds(self, client: TestClient, funded_user: dict):
+        """Тест отката всей пачки при нехватке средств"""
+        ids = [self._create(client, funded_user, 600.00) for _ in range(2)]
+
+        response = client.put(
+            "/payments/confirm-batch", json={"payment_ids": ids}, headers=funded_user["headers"]
+        )
+
+        assert response.status_code == 400
+        assert "Недостаточно средств" in response.json()["detail"]
+        statuses = {
+            client.get(f"/payments/{pid}", headers=funded_user["headers"]).json()["status"]
+            for pid in ids
+        }
+        assert statuses == {"created"}
+        me = client.get("/auth/me", headers=funded_user["headers"]).json()
+        assert float(me["balance"]) == 1000.00
+
+    def test_postgres_balance_update_text_is_stable(self):
+        """Тест: на PostgreSQL текст UPDATE балансов не зависит от размера пачки"""
+        dialect = postgresql.asyncpg.dialect()
+        small = balance_deltas_update({1: Decimal("-5.00"), 2: Decimal("5.00")}, "postgresql")
+        large = balance_deltas_update(
+            {user_id: Decimal("1.00") for user_id in range(1, 50)}, "postgresql"
+        )
+
+        compiled = small.compile(dialect=dialect)
+        assert str(compiled) == str(large.compile(dialect=dialect))
+        assert "unnest" in str(compiled)
+        assert [Decimal("-5.00"), Decimal("5.00")] in compiled.params.values()
+
+
+class TestPaymentExport:
+    """Тесты потоковой выгрузки истории платежей"""
+
+    def create_payments(self, client: TestClient, funded_user: dict, second_user: dict):
+        for amount in ("10.00", "20.00"):
+            client.post("/payments/", json={"amount": amount}, headers=funded_user["headers"])
+        client.post(
+            "/payments/",
+            json={"amount": "30.00", "receiver_id": second_user["user"]["id"]},
+            headers=funded_user["headers"],
+        )
+
+    def test_ndjson(self, client: TestClient, funded_user: dict, second_user: dict):
+        """Тест выгрузки в NDJSON"""
+        self.create_payments(client, funded_user, second_user)
+
+        response = client.get("/payments/export", headers=funded_user["headers"])
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert 'filename="payments.ndjson"' in response.headers["content-disposition"]
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(line["amount"] for line in lines) == ["10.00", "20.00", "30.00"]
+        assert lines == sorted(lines, key=lambda line: (line["created_at"], line["id"]))
+
+    def test_receiver_sees_incoming(self, client: TestClient, funded_user: dict, second_user: dict):
+        """Тест выгрузки входящих платежей получателя"""
+        self.create_payments(client, funded_user, second_user)
+
+        response = client.get("/payments/export", headers=second_user["headers"])
+
+        lines = response.text.splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0])["receiver_id"] == second_user["user"]["id"]
+
+    def test_csv(self, client: TestClient, funded_user: dict, second_user: dict):
+        """Тест выгрузки в CSV с заголовком"""
+        self.create_payments(client, funded_user, second_user)
+
+        response = client.get("/payments/export?format=csv", headers=funded_user["headers"])
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert sorted(row["amount"] for row in rows) == ["10.00", "20.00", "30.00"]
+        assert {row["status"] for row in rows} == {"created"}
+        assert sorted(row["receiver_id"] for row in rows)[0] == ""
+
+    def test_period_filter(self, client: TestClient, funded_user: dict, second_user: dict):
+        """Тест фильтра по периоду"""
+        self.create_payments(client, funded_user, second_user)
+
+        future = client.get(
+            "/payments/export",
+            params={"from": "2999-01-01T00:00:00"},
+            headers=funded_user["headers"],
+        )
+        past = client.get(
+            "/payments/export",
+            params={"from": "2000-01-01T00:00:00", "to": "2999-01-01T00:00:00"},
+            headers=funded_user["headers"],
+        )
+
+        assert future.text == ""
+        assert len(past.text.splitlines()) == 3
+
+    def test_invalid_period(self, client: TestClient, funded_user: dict):
+        """Тест некорректного периода"""
+        response = client.get(
+            "/payments/export",
+            params={"from": "2025-01-02T00:00:00", "to": "2025-01-01T00:00:00"},
+            headers=funded_user["headers"],
+        )
+
+        assert response.status_code == 400
+
+    def test_streams_in_batches(
+        self,
+        client: TestClient,
+        funded_user: dict,
+        second_user: dict,
+        monkeypatch: pytest.MonkeyPatch,
+    ):
+        """Тест выгрузки пачками меньше размера истории"""
+        monkeypatch.setattr(settings, "payment_export_batch_size", 2)
+        self.create_payments(client, funded_user, second_user)
+
+        response = client.get("/payments/export?format=csv", headers=funded_user["headers"])
+
+        assert len(response.text.splitlines()) == 4
@@ -0,0 +1,65 @@
+from fastapi.testclient import TestClient
+
+from app.core.principal import LocalInvalidationBroker, Principal, PrincipalCache, principal_cache
+
+
+class TestPrincipalCache:
+    """Тесты кеша снимков пользователей"""
+
+    def test_principal_is_cached_after_request(self, client: TestClient, authenticated_user: dict):
+        """Тест заполнения кеша при аутентифицированном запросе"""
+        user_id = authenticated_user["user"]["id"]
+
+        response = client.get("/payments/", headers=authenticated_user["headers"])
+
+        assert response.status_code == 200
+        cached = principal_cache._cache.get(user_id)
+        assert isinstance(cached, Principal)
+        assert cached.username == authenticated_user["data"]["username"]
+
+    def test_confirm_invalidates_sender(self, client: TestClient, funded_user: dict):
+        """Тест сброса снимка отправителя после подтверждения платежа"""
+        payment_data = {
+            "amount": 10.00,
+            "card_last_four": "1234",
+            "card_holder_name": "John Doe",
+        }
+        create_response = client.post(
+            "/payments/", json=payment_data, headers=funded_user["headers"]
+        )
+        payment_id = create_response.json()["id"]
+        assert funded_user["user"]["id"] in principal_cache._cache
+
+        response = client.put(f"/payments/{payment_id}/confirm", headers=funded_user["headers"])
+
+        assert response.status_code == 200
+        assert funded_user["user"]["id"] not in principal_cache._cache
+
+    def test_principal_has_no_dict(self):
+        """Тест компактности снимка"""
+        principal = Principal(id=1, username="user", balance_version=None)
+
+        assert not hasattr(principal, "__dict__")
+
+
+class TestInvalidationBroker:
+    """Тесты рассылки инвалидаций между воркерами"""
+
+    async def test_invalidation_reaches_other_workers(self):
+        """Тест доставки инвалидации во все подписанные кеши"""
+        broker = LocalInvalidationBroker()
+        first = PrincipalCache(ttl=60, max_entries=10, broker=broker)
+        second = PrincipalCache(ttl=60, max_entries=10, broker=broker)
+        await first.start()
+        await second.start()
+
+        for cache in (first, second):
+            cache._cache.set(1, Principal(id=1, username="user", balance_version=None))
+            cache._cache.set(2, Principal(id=2, username="other", balance_version=None))
+
+        await first.invalidate([1, None])
+
+        assert 1 not in first._cache
+        assert 1 not in second._cache
+        assert 2 in second._cache
+        await first.stop()
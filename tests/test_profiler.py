@@ -0,0 +1,76 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.core.profiler import QueryProfile, statement_shape
+from app.middleware.profiler import QueryProfilerMiddleware
+from app.models.user import User
+from tests.conftest import TestAsyncSessionLocal
+
+
+def make_app(queries: int, threshold: int = 3) -> FastAPI:
+    profiled = FastAPI()
+    profiled.add_middleware(QueryProfilerMiddleware, threshold=threshold)
+
+    @profiled.get("/users")
+    async def users() -> dict:
+        async with TestAsyncSessionLocal() as session:
+            for user_id in range(queries):
+                await session.execute(select(User.username).where(User.id == user_id))
+        return {"ok": True}
+
+    return profiled
+
+
+class TestStatementShape:
+    """Тесты нормализации SQL-выражений"""
+
+    def test_in_lists_collapse(self):
+        """Тест схлопывания списков параметров разной длины"""
+        first = statement_shape("SELECT id FROM users WHERE id IN (?, ?)")
+        second = statement_shape("SELECT id\n  FROM users WHERE id IN (?,?,?)")
+
+        assert first == second == "SELECT id FROM users WHERE id IN (?)"
+
+    def test_repeated_shapes(self):
+        """Тест поиска повторяющихся форм выражений"""
+        profile = QueryProfile()
+        for _ in range(4):
+            profile.record("SELECT * FROM payments WHERE id = $1", 0.001)
+        profile.record("UPDATE users SET balance = $1", 0.001)
+
+        repeated = profile.repeated(threshold=3)
+
+        assert [(shape, count) for shape, count, _ in repeated] == [
+            ("SELECT * FROM payments WHERE id = $1", 4)
+        ]
+
+
+class TestQueryProfilerMiddleware:
+    """Тесты профилировщика SQL-выражений запроса"""
+
+    def test_headers(self):
+        """Тест заголовков X-DB-Queries и Server-Timing"""
+        response = TestClient(make_app(queries=2)).get("/users")
+
+        assert response.headers["X-DB-Queries"] == "2"
+        assert response.headers["Server-Timing"].startswith("db;dur=")
+        assert 'desc="2 queries"' in response.headers["Server-Timing"]
+
+    def test_n_plus_one_warning(self, caplog: pytest.LogCaptureFixture):
+        """Тест предупреждения о повторяющихся запросах"""
+        with caplog.at_level(logging.WARNING, logger="app.middleware.profiler"):
+            TestClient(make_app(queries=4)).get("/users")
+
+        messages = [record.getMessage() for record in caplog.records]
+        assert any("Возможный N+1: GET /users выполнил 4" in message for message in messages)
+
+    def test_no_warning_below_threshold(self, caplog: pytest.LogCaptureFixture):
+        """Тест отсутствия предупреждения при малом числе повторов"""
+        with caplog.at_level(logging.WARNING, logger="app.middleware.profiler"):
+            TestClient(make_app(queries=3)).get("/users")
+
+        assert not caplog.records
@@ -0,0 +1,129 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.rate_limit import (
+    MemoryRateLimitBackend,
+    RateRule,
+    SQLiteRateLimitBackend,
+    rate_limiter,
+    refill,
+)
+from app.services.auth_service import AuthService
+
+LOGIN = {"username": "someone", "password": "password123"}
+
+
+@pytest.fixture
+def strict_rules(monkeypatch: pytest.MonkeyPatch):
+    """Маленькие корзины: 3 запроса с IP и 2 на имя пользователя"""
+    monkeypatch.setattr(rate_limiter, "ip_rule", RateRule("ip", 1.0, 3))
+    monkeypatch.setattr(rate_limiter, "username_rule", RateRule("username", 1.0, 2))
+
+
+class TestTokenBucket:
+    """Тесты корзин токенов"""
+
+    def test_refill(self):
+        """Тест пополнения корзины со временем и ограничения ёмкостью"""
+        rule = RateRule("ip", per_minute=60, burst=2)
+
+        assert refill(0.0, 0.0, 0.5, rule) == (0.5, 0.5)
+        assert refill(0.5, 0.5, 1.0, rule) == (0.0, 0.0)
+        assert refill(0.0, 0.0, 100.0, rule) == (1.0, 0.0)
+
+    async def test_memory_backend_evicts_least_recent(self):
+        """Тест вытеснения давно не использованных ключей"""
+        rule = RateRule("ip", per_minute=1, burst=1)
+        backend = MemoryRateLimitBackend(max_keys=2)
+
+        assert await backend.take("a", rule) == 0
+        assert await backend.take("b", rule) == 0
+        assert await backend.take("a", rule) > 0
+        assert await backend.take("c", rule) == 0
+
+        assert len(backend) == 2
+        assert await backend.take("a", rule) > 0
+        assert await backend.take("b", rule) == 0
+
+    async def test_sqlite_backend_is_shared(self, tmp_path):
+        """Тест общей корзины у двух воркеров с одним файлом"""
+        rule = RateRule("username", per_minute=1, burst=2)
+        path = str(tmp_path / "buckets.sqlite3")
+        first, second = SQLiteRateLimitBackend(path), SQLiteRateLimitBackend(path)
+
+        assert await first.take("user:alice", rule) == 0
+        assert await second.take("user:alice", rule) == 0
+        retry_after = await first.take("user:alice", rule)
+
+        assert 0 < retry_after <= 60
+        assert await second.take("user:bob", rule) == 0
+
+
+class TestRateLimitMiddleware:
+    """Тесты ограничения частоты запросов к эндпоинтам аутентификации"""
+
+    def test_username_limit_rejects_before_bcrypt(
+        self, client: TestClient, strict_rules, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Тест отказа по имени пользователя без обращения к сервису"""
+        calls = []
+        original = AuthService.authenticate_user
+
+        async def counting(self, username: str, password: str):
+            calls.append(username)
+            return await original(self, username, password)
+
+        monkeypatch.setattr(AuthService, "authenticate_user", counting)
+
+        statuses = [client.post("/auth/login", json=LOGIN).status_code for _ in range(3)]
+        rejected = client.post("/auth/login", json={**LOGIN, "username": "SomeOne"})
+
+        assert statuses == [401, 401, 429]
+        assert rejected.status_code == 429
+        assert int(rejected.headers["Retry-After"]) >= 1
+        assert rejected.json()["detail"]
+        assert len(calls) == 2
+
+    def test_ip_limit(self, client: TestClient, strict_rules):
+        """Тест отказа по IP при разных именах пользователей"""
+        statuses = [
+            client.post("/auth/login", json={**LOGIN, "username": f"user{i}"}).status_code
+            for i in range(4)
+        ]
+
+        assert statuses == [401, 401, 401, 429]
+
+    def test_rejection_keeps_cors_headers(self, client: TestClient, strict_rules):
+        """Тест: браузер видит 429, а не ошибку CORS"""
+        origin = {"Origin": "http://localhost:3000"}
+        preflight = client.options(
+            "/auth/login", headers={**origin, "Access-Control-Request-Method": "POST"}
+        )
+        responses = [
+            client.post("/auth/login", json={**LOGIN, "username": f"user{i}"}, headers=origin)
+            for i in range(4)
+        ]
+
+        assert preflight.status_code == 200
+        assert responses[-1].status_code == 429
+        assert responses[-1].headers["Access-Control-Allow-Origin"] == origin["Origin"]
+        assert responses[-1].headers["Access-Control-Allow-Credentials"] == "true"
+
+    def test_register_body_reaches_handler(self, client: TestClient, test_user_data: dict):
+        """Тест передачи прочитанного тела обработчику"""
+        response = client.post("/auth/register", json=test_user_data)
+
+        assert response.status_code == 200
+        assert response.json()["user"]["username"] == test_user_data["username"]
+
+    def test_other_paths_and_disabled(
+        self, client: TestClient, strict_rules, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Тест запросов вне ограничения и отключённого ограничения"""
+        assert all(client.get("/health").status_code == 200 for _ in range(5))
+
+        monkeypatch.setattr(settings, "rate_limit_enabled", False)
+        statuses = {client.post("/auth/login", json=LOGIN).status_code for _ in range(5)}
+
+        assert statuses == {401}
@@ -0,0 +1,155 @@
+import time
+
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base, replicas
+from app.core.replicas import Replica, ReplicaSet
+from app.models.user import User
+from tests.conftest import EXTERNAL_PAYMENT, TestAsyncSessionLocal
+
+
+@pytest_asyncio.fixture
+async def replica_engine():
+    """Вторая база в памяти в роли реплики"""
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def replica(replica_engine, monkeypatch: pytest.MonkeyPatch):
+    """Проверенная реплика, подключённая к маршрутизации приложения"""
+    replica = Replica(replica_engine)
+    await replica.check(timeout=1)
+    monkeypatch.setattr(replicas, "replicas", [replica])
+    monkeypatch.setattr(replicas, "max_lag", 5.0)
+    monkeypatch.setattr(replicas, "sticky_seconds", 60.0)
+    yield replica
+    replicas.clear()
+
+
+async def _copy_user(replica_engine, user_id: int) -> None:
+    async with TestAsyncSessionLocal() as session:
+        row = (await session.execute(select(User.__table__).where(User.id == user_id))).one()
+    async with replica_engine.begin() as conn:
+        await conn.execute(insert(User.__table__).values(**row._asdict()))
+
+
+class TestReplicaSet:
+    """Тесты выбора реплики"""
+
+    def _healthy(self, replica_engine, lag: float = 0.0) -> ReplicaSet:
+        replica_set = ReplicaSet([replica_engine], max_lag=5.0, sticky_seconds=1.0)
+        replica_set.replicas[0].healthy = True
+        replica_set.replicas[0].lag = lag
+        return replica_set
+
+    def test_no_replicas(self):
+        """Тест чтения с основной базы без реплик"""
+        assert ReplicaSet([], max_lag=5.0, sticky_seconds=1.0).choose(1) is None
+
+    def test_unhealthy_and_lagging(self, replica_engine):
+        """Тест исключения недоступной и отстающей реплики"""
+        replica_set = self._healthy(replica_engine)
+        assert replica_set.choose(1) is replica_set.replicas[0]
+
+        replica_set.replicas[0].lag = 10.0
+        assert replica_set.choose(1) is None
+
+        replica_set.replicas[0].lag, replica_set.replicas[0].healthy = 0.0, False
+        assert replica_set.choose(1) is None
+
+    def test_read_your_writes(self, replica_engine):
+        """Тест чтения с основной базы, пока реплика не догнала запись"""
+        replica_set = self._healthy(replica_engine, lag=3.0)
+        replica_set.mark_write(1)
+
+        assert replica_set.choose(1) is None
+        assert replica_set.choose(2) is replica_set.replicas[0]
+
+        replica_set._writes.set(1, time.monotonic() - 2.0)
+        assert replica_set.choose(1) is None
+
+        replica_set._writes.set(1, time.monotonic() - 4.0)
+        assert replica_set.choose(1) is replica_set.replicas[0]
+
+    async def test_health_check(self, replica_engine, tmp_path):
+        """Тест проверки здоровья реплики"""
+        healthy = Replica(replica_engine)
+        await healthy.check(timeout=1)
+        assert healthy.status() == {
+            "name": "sqlite+aiosqlite:///:memory:",
+            "healthy": True,
+            "lag_seconds": 0.0,
+            "error": None,
+        }
+
+        broken_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/db.sqlite3")
+        broken = Replica(broken_engine)
+        await broken.check(timeout=1)
+        await broken_engine.dispose()
+        assert not broken.healthy
+        assert "OperationalError" in broken.error
+
+
+class TestReadRouting:
+    """Тесты маршрутизации чтений между основной базой и репликой"""
+
+    async def test_reads_after_write_stick_to_primary(
+        self, client: TestClient, funded_user: dict, replica, replica_engine
+    ):
+        """Тест чтения своей записи и перехода на реплику после окна"""
+        created = client.post("/payments/", json=EXTERNAL_PAYMENT, headers=funded_user["headers"])
+        payment_id = created.json()["id"]
+
+        listed = client.get("/payments/", headers=funded_user["headers"])
+        fetched = client.get(f"/payments/{payment_id}", headers=funded_user["headers"])
+        assert [payment["id"] for payment in listed.json()] == [payment_id]
+        assert fetched.status_code == 200
+
+        replicas.clear()
+        from_replica = client.get("/payments/", headers=funded_user["headers"])
+        missing = client.get(f"/payments/{payment_id}", headers=funded_user["headers"])
+        assert from_replica.json() == []
+        assert missing.status_code == 404
+
+    async def test_me_reads_from_replica(
+        self, client: TestClient, authenticated_user: dict, replica, replica_engine
+    ):
+        """Тест чтения профиля с реплики"""
+        user_id = authenticated_user["user"]["id"]
+        await _copy_user(replica_engine, user_id)
+        async with replica_engine.begin() as conn:
+            await conn.execute(
+                User.__table__.update().where(User.id == user_id).values(full_name="Replica")
+            )
+
+        sticky = client.get("/auth/me", headers=authenticated_user["headers"])
+        replicas.clear()
+        routed = client.get("/auth/me", headers=authenticated_user["headers"])
+
+        assert sticky.json()["full_name"] == "Test User"
+        assert routed.json()["full_name"] == "Replica"
+
+    async def test_unhealthy_replica_falls_back(
+        self, client: TestClient, funded_user: dict, replica
+    ):
+        """Тест чтения с основной базы при недоступной реплике"""
+        client.post("/payments/", json=EXTERNAL_PAYMENT, headers=funded_user["headers"])
+        replicas.clear()
+        replica.healthy = False
+
+        listed = client.get("/payments/", headers=funded_user["headers"])
+
+        assert len(listed.json()) == 1
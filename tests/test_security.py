@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import threading
+from datetime import timedelta
+
+import pytest
+from passlib.context import CryptContext
+
+from app.core import security
+from app.core.security import PasswordHasher, PasswordHasherOverloaded
+
+
+class TestPasswordHasher:
+    """Тесты асинхронного хеширования паролей"""
+
+    async def test_hash_and_verify(self):
+        """Тест хеширования и проверки пароля в пуле"""
+        hasher = PasswordHasher(executor_kind="thread", workers=2, max_queue=2)
+        try:
+            hashed = await hasher.hash("password123")
+
+            assert await hasher.verify("password123", hashed) == (True, None)
+            valid, _ = await hasher.verify("wrongpassword", hashed)
+            assert valid is False
+        finally:
+            hasher.shutdown()
+
+    async def test_rehash_when_cost_changes(self, monkeypatch: pytest.MonkeyPatch):
+        """Тест перехеширования пароля при смене стоимости bcrypt"""
+        old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("password123")
+        monkeypatch.setattr(
+            security,
+            "pwd_context",
+            CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5),
+        )
+
+        hasher = PasswordHasher(executor_kind="thread", workers=1, max_queue=0)
+        try:
+            valid, new_hash = await hasher.verify("password123", old_hash)
+        finally:
+            hasher.shutdown()
+
+        assert valid is True
+        assert new_hash is not None
+        assert new_hash.startswith("$2b$05$")
+
+    async def test_rejects_when_queue_is_full(self, monkeypatch: pytest.MonkeyPatch):
+        """Тест отказа при переполнении очереди"""
+        release = threading.Event()
+
+        def slow_hash(password: str) -> str:
+            release.wait(timeout=5)
+            return password
+
+        monkeypatch.setattr(security, "get_password_hash", slow_hash)
+        hasher = PasswordHasher(executor_kind="thread", workers=1, max_queue=1)
+
+        try:
+            running = [asyncio.ensure_future(hasher.hash(str(i))) for i in range(2)]
+            await asyncio.sleep(0.05)
+            assert hasher.pending == 2
+
+            with pytest.raises(PasswordHasherOverloaded):
+                await hasher.hash("overflow")
+
+            release.set()
+            assert await asyncio.gather(*running) == ["0", "1"]
+            assert hasher.pending == 0
+        finally:
+            release.set()
+            hasher.shutdown()
+
+    def test_unknown_executor_kind(self):
+        """Тест неизвестного типа пула"""
+        with pytest.raises(ValueError):
+            PasswordHasher(executor_kind="fiber", workers=1, max_queue=0)
+
+
+class TestTokenCache:
+    """Тесты кеша проверенных токенов"""
+
+    def setup_method(self):
+        security.token_cache.clear()
+
+    def test_valid_token_is_cached(self, monkeypatch: pytest.MonkeyPatch):
+        """Тест повторной проверки токена из кеша"""
+        token = security.create_access_token({"sub": "1"})
+        calls = []
+        original = security.verify_token
+
+        def counting_verify(value: str):
+            calls.append(value)
+            return original(value)
+
+        monkeypatch.setattr(security, "verify_token", counting_verify)
+
+        first = security.verify_token_cached(token)
+        second = security.verify_token_cached(token)
+
+        assert first is not None and first["sub"] == "1"
+        assert second == first
+        assert len(calls) == 1
+
+    def test_invalid_token_is_cached_briefly(self, monkeypatch: pytest.MonkeyPatch):
+        """Тест кеширования отрицательного результата"""
+        monkeypatch.setattr(security.settings, "token_cache_negative_ttl_seconds", 60.0)
+        hits = security.token_cache.hits
+
+        assert security.verify_token_cached("invalid_token") is None
+        assert security.verify_token_cached("invalid_token") is None
+        assert security.token_cache.hits == hits + 1
+
+    def test_entry_expires_with_token(self):
+        """Тест того, что запись не переживает срок действия токена"""
+        token = security.create_access_token({"sub": "1"}, expires_delta=timedelta(seconds=-1))
+
+        assert security.verify_token_cached(token) is None
+        assert security.token_cache.get(hashlib.sha256(token.encode()).digest()) is None
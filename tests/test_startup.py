@@ -0,0 +1,130 @@
+import json
+import subprocess
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base, build_engine
+from app.main import create_app
+from app.models.payment import Payment, PaymentStatus
+from app.models.user import User
+from app.services.auth_service import AuthService
+from app.services.payment_service import PaymentService
+from app.services.warmup import warm_pool
+
+# Импорт и сборка приложения в чистом интерпретаторе, с запасом на медленный CI
+STARTUP_BUDGET_SECONDS = 5.0
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+lazy = not any(name.startswith("app.routers") for name in sys.modules)
+application = app.main.create_app()
+timings = {"lazy": lazy, "total": time.perf_counter() - started}
+print(json.dumps({**timings, **application.state.startup_timings}), file=sys.stderr)
+"""
+
+
+async def _create_tables(engine) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+class TestAppFactory:
+    """Тесты фабрики приложения"""
+
+    def test_startup_within_budget(self):
+        """Тест: импорт ленивый, импорт и сборка укладываются в бюджет"""
+        result = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            cwd=Path(__file__).resolve().parent.parent,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        assert result.returncode == 0, result.stderr
+        timings = json.loads(result.stderr.strip().splitlines()[-1])
+
+        assert timings["lazy"]
+        assert timings["import_seconds"] + timings["build_seconds"] <= timings["total"]
+        assert timings["total"] < STARTUP_BUDGET_SECONDS
+
+    def test_factory_builds_independent_apps(self):
+        """Тест: каждый вызов собирает отдельное приложение с замерами старта"""
+        first, second = create_app(), create_app()
+
+        assert first is not second
+        assert set(first.state.startup_timings) == {"import_seconds", "build_seconds"}
+        assert TestClient(first).get("/health").json()["status"] == "healthy"
+        response = TestClient(second).get("/internal/startup")
+        assert response.json() == second.state.startup_timings
+
+
+class TestWarmUp:
+    """Тесты прогрева пула и запросов"""
+
+    async def test_warm_pool_opens_connections(self, tmp_path: Path):
+        """Тест: заранее открываются разные соединения, не больше размера пула"""
+        engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'warmup.db'}")
+        try:
+            await _create_tables(engine)
+            pool = engine.pool
+            expected = min(3, pool.size())
+
+            assert await warm_pool(engine, 3) == expected
+            assert pool.checkedin() == expected
+            assert pool.metrics.connections_created.value == expected
+            assert await warm_pool(engine, 100) == pool.size()
+            assert pool.checkedout() == 0
+        finally:
+            await engine.dispose()
+
+    async def test_hot_statements_are_precompiled(self):
+        """Тест: после прогрева чтение и подтверждение платежей не компилируют новый SQL"""
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+        try:
+            await _create_tables(engine)
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                sender, receiver = (
+                    User(
+                        email=f"{name}@example.com", username=name, hashed_password="x", balance=100
+                    )
+                    for name in ("sender", "receiver")
+                )
+                session.add_all([sender, receiver])
+                await session.flush()
+                external, transfer = (
+                    Payment(
+                        sender_id=sender.id,
+                        receiver_id=receiver_id,
+                        amount=Decimal(10),
+                        status=PaymentStatus.CREATED,
+                    )
+                    for receiver_id in (None, receiver.id)
+                )
+                session.add_all([external, transfer])
+                await session.commit()
+
+            assert await warm_pool(engine, 4) == 1
+            cache = engine.sync_engine._compiled_cache
+            compiled = len(cache)
+
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                await AuthService(session).get_user_by_username("someone")
+                await AuthService(session).get_user_by_email("someone@example.com")
+                await PaymentService(session).get_user_payments(42)
+                for payment in (external, transfer):
+                    confirmed = await PaymentService(session).confirm_payment(
+                        payment.id, int(sender.id)
+                    )
+                    assert confirmed.status == PaymentStatus.PAID
+
+            assert compiled > 0
+            assert len(cache) == compiled
+        finally:
+            await engine.dispose()
@@ -0,0 +1,400 @@
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+import httpcore
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, update
+
+from app.core import webhooks
+from app.core.config import settings
+from app.core.webhooks import (
+    SIGNATURE_HEADER,
+    PublicHTTPTransport,
+    check_url,
+    retry_delay,
+    sign,
+    verify,
+)
+from app.models.webhook import WebhookDeadLetter, WebhookDelivery
+from app.services.outbox_service import OutboxService
+from app.services.webhook_engine import WebhookEngine
+from tests.conftest import EXTERNAL_PAYMENT, TestAsyncSessionLocal
+from tests.test_outbox import ListSink
+
+
+class RecordingBackend(httpcore.AsyncMockBackend):
+    """Сеть без сокетов: запоминает адреса соединений и отвечает 204"""
+
+    def __init__(self) -> None:
+        super().__init__([b"HTTP/1.1 204 No Content\r\n", b"\r\n"])
+        self.hosts: list = []
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.hosts.append(host)
+        return await super().connect_tcp(host, port, timeout, local_address, socket_options)
+
+
+def _engine(
+    handler, workers: int = 4, endpoint_concurrency: int = 8, transport=None
+) -> WebhookEngine:
+    return WebhookEngine(
+        workers=workers,
+        endpoint_concurrency=endpoint_concurrency,
+        batch_size=100,
+        lease_seconds=60.0,
+        poll_interval=0.01,
+        max_connections=10,
+        timeout=1.0,
+        transport=transport or httpx.MockTransport(handler),
+        session_maker=TestAsyncSessionLocal,
+    )
+
+
+async def _run_once(engine: WebhookEngine) -> int:
+    engine.start(feed=False)
+    try:
+        return await engine.run_once()
+    finally:
+        await engine.stop()
+
+
+def _register(client: TestClient, user: dict, **data) -> dict:
+    data.setdefault("url", "http://merchant.local/hooks")
+    response = client.post("/webhooks/", json=data, headers=user["headers"])
+    assert response.status_code == 201
+    return response.json()
+
+
+async def _rows(model) -> list:
+    async with TestAsyncSessionLocal() as session:
+        result = await session.execute(select(model).order_by(model.id))
+        return list(result.scalars().all())
+
+
+async def _deliver_outbox(client: TestClient, user: dict) -> str:
+    response = client.post("/payments/", json=EXTERNAL_PAYMENT, headers=user["headers"])
+    payment_id = response.json()["id"]
+    client.put(f"/payments/{payment_id}/confirm", headers=user["headers"])
+    # За одну пачку уходит одно событие платежа: порядок сохраняется
+    while True:
+        async with TestAsyncSessionLocal() as session:
+            if not await OutboxService(session).dispatch(ListSink(), 100):
+                return payment_id
+
+
+class TestSignature:
+    """Тесты подписи и расписания повторов"""
+
+    def test_verify_signed_body(self):
+        """Тест проверки подписи, подмены тела и устаревшей метки"""
+        header = sign("secret", 1_000, b'{"id":1}')
+
+        assert verify("secret", header, b'{"id":1}', now=1_010)
+        assert not verify("secret", header, b'{"id":2}', now=1_010)
+        assert not verify("other", header, b'{"id":1}', now=1_010)
+        assert not verify("secret", header, b'{"id":1}', now=2_000)
+        assert not verify("secret", "garbage", b'{"id":1}', now=1_010)
+
+    def test_retry_delay_grows_with_jitter(self):
+        """Тест экспоненциального роста задержки с разбросом и потолком"""
+        rng = random.Random(1)
+
+        for attempt, ceiling in [(1, 1.0), (2, 2.0), (4, 8.0), (20, 60.0)]:
+            delay = retry_delay(attempt, 1.0, 60.0, rng)
+            assert ceiling / 2 <= delay <= ceiling
+
+
+class TestWebhookRegistration:
+    """Тесты регистрации webhook"""
+
+    def test_create_list_delete(self, client: TestClient, authenticated_user: dict):
+        """Тест жизненного цикла регистрации; секрет виден только при создании"""
+        created = _register(client, authenticated_user, event_types=["payment.paid"])
+        assert len(created["secret"]) == 64
+
+        listed = client.get("/webhooks/", headers=authenticated_user["headers"]).json()
+        assert [item["id"] for item in listed] == [created["id"]]
+        assert "secret" not in listed[0]
+
+        path = f"/webhooks/{created['id']}"
+        assert client.delete(path, headers=authenticated_user["headers"]).status_code == 204
+        assert client.delete(path, headers=authenticated_user["headers"]).status_code == 404
+        assert client.get("/webhooks/", headers=authenticated_user["headers"]).json() == []
+
+    def test_validation_and_limit(
+        self, client: TestClient, authenticated_user: dict, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Тест отказа для неизвестного типа события и сверх лимита"""
+        monkeypatch.setattr(settings, "webhook_max_endpoints_per_user", 1)
+        headers = authenticated_user["headers"]
+
+        response = client.post(
+            "/webhooks/",
+            json={"url": "http://merchant.local/", "event_types": ["user.created"]},
+            headers=headers,
+        )
+        assert response.status_code == 422
+
+        _register(client, authenticated_user)
+        response = client.post("/webhooks/", json={"url": "http://b.local/"}, headers=headers)
+        assert response.status_code == 400
+
+
+class TestWebhookTargets:
+    """Тесты защиты от запросов во внутреннюю сеть"""
+
+    @pytest.fixture(autouse=True)
+    def checked(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(settings, "webhook_allow_private_urls", False)
+
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "http://127.0.0.1/hooks",
+            "http://localhost:8000/",
+            "http://10.0.0.5/",
+            "http://169.254.169.254/latest/meta-data/",
+            "http://[::1]/",
+            "http://[fd00::1]/",
+            "http://unresolvable.invalid/",
+        ],
+    )
+    async def test_private_targets_rejected(self, url: str):
+        """Тест отказа для loopback, частных, link-local и неразрешимых адресов"""
+        with pytest.raises(ValueError):
+            await check_url(url)
+
+    async def test_any_private_address_rejects_host(self, monkeypatch: pytest.MonkeyPatch):
+        """Тест: хватает одного внутреннего адреса среди разрешённых"""
+
+        async def resolve(host: str, port: int) -> list:
+            return {
+                "public.example": ["93.184.216.34"],
+                "mixed.example": ["93.184.216.34", "10.1.1.1"],
+            }[host]
+
+        monkeypatch.setattr(webhooks, "_resolve", resolve)
+
+        await check_url("https://public.example/hooks")
+        with pytest.raises(ValueError):
+            await check_url("https://mixed.example/hooks")
+
+    def test_registration_rejected(self, client: TestClient, authenticated_user: dict):
+        """Тест: адрес метаданных облака не регистрируется"""
+        response = client.post(
+            "/webhooks/",
+            json={"url": "http://169.254.169.254/"},
+            headers=authenticated_user["headers"],
+        )
+
+        assert response.status_code == 400
+        assert client.get("/webhooks/", headers=authenticated_user["headers"]).json() == []
+
+    async def test_send_rechecks_address(
+        self, client: TestClient, funded_user: dict, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Тест: адрес, сменивший IP на внутренний после регистрации, не вызывается"""
+        addresses = ["93.184.216.34"]
+
+        async def resolve(host: str, port: int) -> list:
+            return addresses
+
+        monkeypatch.setattr(webhooks, "_resolve", resolve)
+        _register(client, funded_user, event_types=["payment.created"])
+        await _deliver_outbox(client, funded_user)
+        addresses[:] = ["127.0.0.1"]
+        backend = RecordingBackend()
+
+        await _run_once(_engine(None, transport=PublicHTTPTransport(network_backend=backend)))
+
+        assert backend.hosts == []
+        [delivery] = await _rows(WebhookDelivery)
+        assert delivery.attempts == 1
+        assert "внутреннюю сеть" in delivery.last_error
+
+    async def test_connects_to_checked_address(self, monkeypatch: pytest.MonkeyPatch):
+        """Тест: соединение идёт на проверенный IP, повторное разрешение в внутренний — отказ"""
+        answers = [["93.184.216.34"], ["127.0.0.1"]]
+
+        async def resolve(host: str, port: int) -> list:
+            return answers.pop(0)
+
+        monkeypatch.setattr(webhooks, "_resolve", resolve)
+        backend = RecordingBackend()
+        transport = PublicHTTPTransport(
+            httpx.Limits(max_keepalive_connections=0), network_backend=backend
+        )
+
+        async with httpx.AsyncClient(transport=transport) as http:
+            response = await http.post("http://rebind.example/hooks", content=b"{}")
+            assert response.status_code == 204
+            assert response.request.headers["Host"] == "rebind.example"
+            with pytest.raises(httpx.ConnectError, match="внутреннюю сеть"):
+                await http.post("http://rebind.example/hooks", content=b"{}")
+
+        assert backend.hosts == ["93.184.216.34"]
+
+
+class TestWebhookDelivery:
+    """Тесты постановки в очередь и отправки"""
+
+    async def test_outbox_fans_out_signed_deliveries(self, client: TestClient, funded_user: dict):
+        """Тест доставки отфильтрованных событий с проверяемой подписью"""
+        endpoint = _register(client, funded_user, event_types=["payment.paid"])
+        payment_id = await _deliver_outbox(client, funded_user)
+        received = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            received.append(request)
+            return httpx.Response(204)
+
+        assert await _run_once(_engine(handler)) == 1
+
+        [request] = received
+        body = json.loads(request.content)
+        assert (body["type"], body["aggregate_id"]) == ("payment.paid", payment_id)
+        assert request.headers["X-Webhook-Event"] == "payment.paid"
+        assert verify(endpoint["secret"], request.headers[SIGNATURE_HEADER], request.content)
+        assert await _rows(WebhookDelivery) == []
+
+    async def test_separate_worker_delivers_api_deliveries(
+        self, client: TestClient, funded_user: dict, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Тест: API без отправки ставит доставки, отдельный воркер их отправляет"""
+        monkeypatch.setattr(settings, "webhook_delivery_enabled", False)
+        _register(client, funded_user)
+        await _deliver_outbox(client, funded_user)
+        assert len(await _rows(WebhookDelivery)) == 2
+
+        received = []
+        worker = _engine(lambda request: received.append(request) or httpx.Response(200))
+
+        assert await _run_once(worker) == 2
+        assert len(received) == 2
+        assert await _rows(WebhookDelivery) == []
+
+    async def test_enqueue_disabled(
+        self, client: TestClient, funded_user: dict, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Тест: без WEBHOOKS_ENABLED диспетчер outbox не ставит доставки"""
+        monkeypatch.setattr(settings, "webhooks_enabled", False)
+        _register(client, funded_user)
+        await _deliver_outbox(client, funded_user)
+
+        assert await _rows(WebhookDelivery) == []
+
+    async def test_feeder_delivers_in_background(self, client: TestClient, funded_user: dict):
+        """Тест фонового захвата доставок запущенным движком"""
+        _register(client, funded_user)
+        await _deliver_outbox(client, funded_user)
+        received = []
+        engine = _engine(lambda request: received.append(request) or httpx.Response(200))
+
+        engine.start()
+        try:
+            # БД не опрашивается, пока работает питатель: в тестах одно соединение на всех
+            for _ in range(200):
+                if len(received) == 2 and not engine._outstanding:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await engine.stop()
+
+        assert [request.headers["X-Webhook-Event"] for request in received] == [
+            "payment.created",
+            "payment.paid",
+        ]
+        assert await _rows(WebhookDelivery) == []
+
+    async def test_failures_back_off_then_dead_letter(
+        self, client: TestClient, funded_user: dict, monkeypatch: pytest.MonkeyPatch
+    ):
+        """Тест повтора с задержкой и перевода в dead letter после последней попытки"""
+        monkeypatch.setattr(settings, "webhook_max_attempts", 2)
+        _register(client, funded_user, event_types=["payment.created"])
+        await _deliver_outbox(client, funded_user)
+        engine = _engine(lambda request: httpx.Response(500))
+
+        await _run_once(engine)
+        [delivery] = await _rows(WebhookDelivery)
+        assert (delivery.attempts, delivery.last_error) == (1, "HTTP 500")
+        assert await _run_once(engine) == 0
+
+        async with TestAsyncSessionLocal() as session:
+            await session.execute(
+                update(WebhookDelivery).values(
+                    next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+                )
+            )
+            await session.commit()
+        assert await _run_once(engine) == 1
+
+        assert await _rows(WebhookDelivery) == []
+        [dead] = await _rows(WebhookDeadLetter)
+        assert (dead.attempts, dead.event_type) == (2, "payment.created")
+
+    async def test_endpoint_concurrency_limit(self, client: TestClient, authenticated_user: dict):
+        """Тест: на один endpoint не больше заданного числа одновременных запросов"""
+        endpoint = _register(client, authenticated_user)
+        async with TestAsyncSessionLocal() as session:
+            await session.execute(
+                insert(WebhookDelivery),
+                [
+                    {
+                        "endpoint_id": endpoint["id"],
+                        "event_id": i,
+                        "event_type": "payment.created",
+                        "payload": {"id": i},
+                        "attempts": 0,
+                        "next_attempt_at": datetime.now(timezone.utc),
+                    }
+                    for i in range(20)
+                ],
+            )
+            await session.commit()
+        in_flight = peak = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.005)
+            in_flight -= 1
+            return httpx.Response(200)
+
+        assert await _run_once(_engine(handler, workers=8, endpoint_concurrency=2)) == 20
+
+        assert peak == 2
+        assert await _rows(WebhookDelivery) == []
+
+    async def test_deactivated_endpoint_drops_deliveries(
+        self, client: TestClient, funded_user: dict
+    ):
+        """Тест отмены недоставленных событий при отключении webhook"""
+        endpoint = _register(client, funded_user)
+        await _deliver_outbox(client, funded_user)
+        assert len(await _rows(WebhookDelivery)) == 2
+
+        client.delete(f"/webhooks/{endpoint['id']}", headers=funded_user["headers"])
+
+        assert await _rows(WebhookDelivery) == []
+
+    async def test_redirect_is_not_followed(self, client: TestClient, funded_user: dict):
+        """Тест: перенаправление не выполняется и считается неудачной попыткой"""
+        _register(client, funded_user, event_types=["payment.created"])
+        await _deliver_outbox(client, funded_user)
+        received = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            received.append(request)
+            return httpx.Response(302, headers={"Location": "http://169.254.169.254/"})
+
+        await _run_once(_engine(handler))
+
+        assert len(received) == 1
+        [delivery] = await _rows(WebhookDelivery)
+        assert delivery.last_error == "HTTP 302"